@@ -1,4 +1,5 @@
 import subprocess
+import sys
 import time
 import threading
 import os
@@ -12,14 +13,10 @@ import queue
 import aiohttp
 from datetime import datetime, timedelta, timezone
 import uvicorn
-from subscribe import subscribe_channel, unsubscribe_channel
-from webhook_server import (
-    app, 
-    set_uploader_log_handler, 
-    video_id_queue, 
-    init_async_globals,
-    async_handler_task
-)
+from utils.subscription_engine import SubscriptionEngine
+from utils.renewal_scheduler import RenewalScheduler
+from utils.lease_store import lease_store
+from utils.config_loader import get_config, config_reloader, _set_main_thread_loop
 
 # ========== 配置区域 ==========
 CONFIG_FILE = "config/config.ini"
@@ -76,12 +73,7 @@ def load_config():
     return cfg
 
 def load_channels():
-    conf = configparser.ConfigParser(allow_no_value=True)
-    conf.optionxform = str
-    conf.read(CHANNELS_FILE, encoding="utf-8")
-    if "channels" in conf:
-        return [k for k in conf["channels"].keys()]
-    return []
+    return list(get_config().channels)
 
 def start_frpc():
     logging.info("正在启动 frpc...")
@@ -105,6 +97,38 @@ def health_check_frpc(get_frpc_proc, restart_callback, interval=60):
             continue
         time.sleep(interval)
 
+def start_service_process(role, host, port, workers=1):
+    """以子进程方式启动 webhook 服务，YSD_ROLE 指定进程角色（ingest / worker）"""
+    env = dict(os.environ, YSD_ROLE=role)
+    cmd = [
+        sys.executable, "-m", "uvicorn", "webhook_server:app",
+        "--host", host, "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    logging.info(f"正在启动 {role} 进程: http://{host}:{port} (workers={workers})")
+    return subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+def supervise_process(name, start_fn, interval=10):
+    """子进程退出后自动重启（如 worker 因浏览器崩溃退出，ingest 仍持续接收回调）"""
+    proc = start_fn()
+    def watch():
+        nonlocal proc
+        while True:
+            time.sleep(interval)
+            if proc.poll() is not None:
+                logging.warning(f"{name} 进程已退出 (code={proc.returncode})，重启中...")
+                proc = start_fn()
+    threading.Thread(target=watch, daemon=True).start()
+    return lambda: proc
+
+def start_config_watch_loop():
+    """拆分部署时主进程不运行 uvicorn，单独起一个事件循环线程接收配置热更新通知"""
+    async def bind_and_watch():
+        _set_main_thread_loop()
+        config_reloader.start_watching()
+        await asyncio.Event().wait()
+    threading.Thread(target=lambda: asyncio.run(bind_and_watch()), daemon=True).start()
+
 def load_previous_subscribed_channels():
     if os.path.exists(SUBSCRIBED_FILE):
         with open(SUBSCRIBED_FILE, "r", encoding="utf-8") as f:
@@ -124,24 +148,33 @@ def alarm_on_failure(action, channel_id, callback_url):
 async def async_sync_subscriptions(callback_url, channels):
     previous_channels = load_previous_subscribed_channels()
     current_channels = set(channels)
-    
-    # 订阅新频道
-    for cid in current_channels - previous_channels:
-        success, msg = await subscribe_channel(cid, callback_url)
-        logging.info(msg)
-        if not success:
+    to_subscribe = current_channels - previous_channels
+    to_unsubscribe = previous_channels - current_channels
+    if not to_subscribe and not to_unsubscribe:
+        logging.info("[✓] 订阅列表无变化，无需同步")
+        return
+
+    logging.info(f"[✓] 订阅同步: 新增 {len(to_subscribe)} 个频道，移除 {len(to_unsubscribe)} 个频道")
+    jobs = [("subscribe", cid) for cid in sorted(to_subscribe)]
+    jobs += [("unsubscribe", cid) for cid in sorted(to_unsubscribe)]
+    results = await SubscriptionEngine(callback_url).run(jobs)
+
+    # 失败的订阅不记入已订阅列表，失败的取消订阅保留在列表中，下次同步时重试
+    failed_subscribe = set()
+    failed_unsubscribe = set()
+    for (mode, cid), (success, _) in results.items():
+        if success:
+            if mode == "subscribe":
+                lease_store.record_request(cid)
+            continue
+        if mode == "subscribe":
+            failed_subscribe.add(cid)
             alarm_on_failure("订阅", cid, callback_url)
-        await asyncio.sleep(4)  # 异步等待，不阻塞主线程
-    
-    # 取消订阅移除的频道
-    for cid in previous_channels - current_channels:
-        success, msg = await unsubscribe_channel(cid, callback_url)
-        logging.info(msg)
-        if not success:
+        else:
+            failed_unsubscribe.add(cid)
             alarm_on_failure("取消订阅", cid, callback_url)
-        await asyncio.sleep(4)
-    
-    save_subscribed_channels(current_channels)
+
+    save_subscribed_channels((current_channels - failed_subscribe) | failed_unsubscribe)
 
 def sync_subscriptions(callback_url, channels):
     asyncio.run(async_sync_subscriptions(callback_url, channels))
@@ -160,37 +193,14 @@ def load_last_renew_time():
             return int(data.get("last_renew_time", 0))
     return 0
 
-def start_renew_subscription_loop(callback_url, interval_hours=24*3):
-    async def renew_loop():
-        while True:
-            try:
-                interval_seconds = interval_hours * 3600
-                now = int(time.time())
-                last_renew = load_last_renew_time()
-                elapsed = now - last_renew
-                if elapsed < interval_seconds and last_renew > 0:
-                    sleep_time = interval_seconds - elapsed
-                    logging.info(f"[✓] 距离下次自动续订还有 {sleep_time//3600} 小时 {sleep_time%3600//60} 分")
-                    await asyncio.sleep(sleep_time)
-                channel_ids = load_previous_subscribed_channels()
-                logging.info(f"[✓] 正在自动续订频道...")
-                renew_count = 0  # 新增：统计续订数量
-                for cid in channel_ids:
-                    try:
-                        success, msg = await subscribe_channel(cid, callback_url)
-                        logging.info(msg)
-                        if success:
-                            renew_count += 1
-                    except Exception as e:
-                        logging.exception(f"频道 {cid} 续订异常: {e}")
-                    await asyncio.sleep(4)
-                save_last_renew_time()
-                logging.info(f"[✓] 本轮共续订了 {renew_count} 个频道。")  # 新增：输出统计结果
-                await asyncio.sleep(interval_seconds)
-            except Exception as e:
-                logging.exception(f"自动续订主循环异常: {e}")
-                await asyncio.sleep(60)
-    threading.Thread(target=lambda: asyncio.run(renew_loop()), daemon=True).start()
+def start_renew_subscription_loop(callback_url):
+    """按各频道 hub.lease_seconds 在到期前续订，租约已过期的频道优先重新订阅"""
+    scheduler = RenewalScheduler(
+        callback_url,
+        channels_loader=load_previous_subscribed_channels,
+        on_batch_done=save_last_renew_time,
+    )
+    threading.Thread(target=lambda: asyncio.run(scheduler.run()), daemon=True).start()
 #===========================================================================================
 
 def print_startup_banner(public_url):
@@ -215,15 +225,17 @@ def status_monitor(start_time):
         except Exception as e:
             logging.exception(f"[status_monitor exception]: {e}")
 
-def wait_webhook_ready(url, timeout=20):
-    for _ in range(timeout):
+def wait_webhook_ready(url, timeout=20, interval=0.1):
+    """轮询存活检查直到服务开始接收回调（浏览器在服务内后台启动，不必等待）"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
         try:
-            r = requests.get(url)
+            r = requests.get(url, timeout=1)
             if r.status_code in (200, 400):
                 return True
         except Exception:
             pass
-        time.sleep(1)
+        time.sleep(interval)
     raise RuntimeError("Webhook 服务未准备好")
 
 def main():
@@ -254,24 +266,36 @@ def main():
         daemon=True
     ).start()
 
-    set_uploader_log_handler(lambda msg: logging.info(msg))
-
     # --------- 启动本地 Web 服务 ---------
-    uvicorn_started = threading.Event()
-    def start_uvicorn():
-        logging.info(f"Serving on http://0.0.0.0:{FRP_PORT}")
-        uvicorn_started.set()
-        uvicorn.run("webhook_server:app", host="0.0.0.0", port=FRP_PORT, workers=1, log_level="warning")
-
-    uvicorn_thread = threading.Thread(target=start_uvicorn)
-    uvicorn_thread.daemon = True
-    uvicorn_thread.start()
-
-    uvicorn_started.wait()
+    service_config = get_config()
+    if service_config.ingest_workers > 1:
+        # 拆分部署：多 worker 的 ingest 进程接收回调写入任务总线，独立 worker 进程负责下载和浏览器
+        state["worker_proc"] = supervise_process(
+            "worker", lambda: start_service_process("worker", "127.0.0.1", service_config.worker_port)
+        )
+        state["ingest_proc"] = supervise_process(
+            "ingest", lambda: start_service_process("ingest", "0.0.0.0", FRP_PORT, service_config.ingest_workers)
+        )
+        start_config_watch_loop()
+    else:
+        # 单进程模式才在本进程导入 webhook_server（拆分部署时由子进程各自导入）
+        from webhook_server import set_uploader_log_handler
+        set_uploader_log_handler(lambda msg: logging.info(msg))
+        uvicorn_started = threading.Event()
+        def start_uvicorn():
+            logging.info(f"Serving on http://0.0.0.0:{FRP_PORT}")
+            uvicorn_started.set()
+            uvicorn.run("webhook_server:app", host="0.0.0.0", port=FRP_PORT, workers=1, log_level="warning")
+
+        uvicorn_thread = threading.Thread(target=start_uvicorn)
+        uvicorn_thread.daemon = True
+        uvicorn_thread.start()
+
+        uvicorn_started.wait()
     print_startup_banner(public_url)
 
     # 新增：确保 webhook 服务 ready 再发起订阅
-    wait_webhook_ready(f"http://127.0.0.1:{FRP_PORT}/healthz")
+    wait_webhook_ready(f"http://127.0.0.1:{FRP_PORT}/livez")
 
     # 状态监控线程（防止睡眠）
     start_time = time.time()
@@ -289,13 +313,17 @@ def main():
     start_periodic_flush()
     # === 插入结束 ===
 
-    # 等待其他线程输出完初始化日志再执行订阅
-    time.sleep(3)
-
     sync_subscriptions(callback_url, channels)
 
     #启动续订线程
     start_renew_subscription_loop(callback_url)
+
+    # channels.ini 频道列表热更新后自动同步订阅（在服务事件循环中执行）
+    async def on_channels_changed(old, new):
+        if old.channels != new.channels:
+            logging.info("[!] 检测到频道列表变化，正在同步订阅...")
+            await async_sync_subscriptions(callback_url, new.channels)
+    config_reloader.add_listener(on_channels_changed)
     
     try:
         while True:
@@ -303,6 +331,9 @@ def main():
     except KeyboardInterrupt:
         print("[✓] 程序被中断，关闭 frpc...")
         state["frpc_proc"].terminate()
+        for key in ("ingest_proc", "worker_proc"):
+            if key in state:
+                state[key]().terminate()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,403 @@
+"""
+youtube_callback 压测
+在进程内直接驱动 ASGI 应用（不经过网络与 uvicorn），回放真实格式的 Atom 推送：
+- burst          大量不同频道的新视频同时到达（下载队列溢出、截止时间淘汰）
+- redelivery     Hub 重复投递同一视频（去重）
+- disabled       禁用频道（-1）的视频（推送C端）
+- rate_limited   少量频道连续发布（频道限流后推送C端）
+YouTube Data API、C端接口、下载器和上传平台都替换为本地桩，不产生任何外部请求或文件写入。
+
+输出每个场景的 RPS、p50/p99 延迟和队列表现；与基线（benchmarks/baselines/callbacks.json）比较，
+RPS 下降或 p99 上升超过容忍度（且超过 --p99-floor-ms 绝对值）时以退出码 1 失败。
+每个场景重复 --repeat 次取中位数，减小单次抖动。
+基线不存在时（首次运行）只检查不变量、不做性能比较，加 --require-baseline 时视为失败；
+--update-baseline 在不变量全部通过时才写入基线。
+
+用法（在项目根目录）：
+    python benchmarks/bench_callbacks.py
+    python benchmarks/bench_callbacks.py --scale 2 --tolerance 0.3
+    python benchmarks/bench_callbacks.py --update-baseline
+    python benchmarks/bench_callbacks.py --require-baseline   # CI：基线缺失时失败
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+import dataclasses
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.pop("YSD_ROLE", None)
+
+import webhook_server as ws  # noqa: E402
+from utils.config_loader import config_reloader  # noqa: E402
+from utils.feed_poller import SeenVideos  # noqa: E402
+from utils.fanout import upload_fanout  # noqa: E402
+from utils.freshness_tracker import freshness_tracker  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baselines", "callbacks.json")
+CALLBACK_PATH = "/youtube/callback"
+DISABLED_CHANNELS = [f"UCdisabled{i:03d}" for i in range(5)]
+
+ATOM_TEMPLATE = """<?xml version='1.0' encoding='UTF-8'?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="hub" href="https://pubsubhubbub.appspot.com"/>
+  <link rel="self" href="https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"/>
+  <title>YouTube video feed</title>
+  <updated>{updated}</updated>
+  <entry>
+    <id>yt:video:{video_id}</id>
+    <yt:videoId>{video_id}</yt:videoId>
+    <yt:channelId>{channel_id}</yt:channelId>
+    <title>bench video {video_id}</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>
+    <author>
+      <name>bench channel</name>
+      <uri>https://www.youtube.com/channel/{channel_id}</uri>
+    </author>
+    <published>{published}</published>
+    <updated>{updated}</updated>
+  </entry>
+</feed>
+"""
+
+
+# ---------------- 本地桩 ----------------
+class StubCounters:
+    def __init__(self):
+        self.forwarded_to_c = 0
+        self.api_lookups = 0
+        self.downloads = 0
+        self.uploads_queued = 0
+
+
+stubs = StubCounters()
+
+
+class FakeYoutubeMonitor:
+    """替代 YouTube Data API：返回刚发布的 Shorts"""
+    def __init__(self, latency):
+        self.latency = latency
+        self.checked_videos = {}
+
+    async def fetch_video_details(self, video_id):
+        stubs.api_lookups += 1
+        await asyncio.sleep(self.latency)
+        return {
+            "video_id": video_id,
+            "published_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration": 30,
+        }
+
+    async def get_video_info(self, video_id, published_hint=None, freshness_minutes=None):
+        return await self.fetch_video_details(video_id)
+
+    def is_recent(self, published_at, minutes=2):
+        return True
+
+
+def make_fake_downloader(latency):
+    class FakeDownloader:
+        async def download_video(self, channel_id, video_url, video_id):
+            stubs.downloads += 1
+            await asyncio.sleep(latency)
+            return os.path.join(tempfile.gettempdir(), f"{video_id}.mp4")
+    return FakeDownloader
+
+
+async def fake_forward_to_c(video_id, channel_id):
+    stubs.forwarded_to_c += 1
+
+
+async def fake_upload_submit(task):
+    stubs.uploads_queued += 1
+    upload_fanout.complete(task, True)
+
+
+async def noop_async():
+    return None
+
+
+def install_stubs(api_latency, download_latency):
+    ws.log_handler = lambda msg: None
+    ws.get_youtube_monitor = lambda: FakeYoutubeMonitor(api_latency)
+    ws.AsyncVideoDownloader = make_fake_downloader(download_latency)
+    ws.forward_xml_to_c_async = fake_forward_to_c
+    ws.async_save_last_processed_time = noop_async
+    ws.LAST_TIME_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_cb_"), "last_processed_time.json")
+    freshness_tracker.timeline_file = os.path.join(os.path.dirname(ws.LAST_TIME_FILE), "freshness_timeline.jsonl")
+    upload_fanout.log_handler = lambda msg: None
+    upload_fanout.register("douyin", fake_upload_submit)
+    # 禁用频道、默认 60 分钟频道限流，其余配置保持默认
+    custom = dict(config_reloader.snapshot.custom_channel_ids)
+    custom.update({cid: -1 for cid in DISABLED_CHANNELS})
+    config_reloader._snapshot = dataclasses.replace(
+        config_reloader.snapshot,
+        custom_channel_ids=MappingProxyType(custom),
+        no_push_c_ids=frozenset(),
+        upload_platforms=("douyin",),
+        feed_polling=False,
+    )
+
+
+def reset_state():
+    ws.seen_videos = SeenVideos()
+    ws.last_processed_time_per_channel.clear()
+    while not ws.video_id_queue.empty():
+        ws.video_id_queue.get_nowait()
+
+
+# ---------------- ASGI 驱动 ----------------
+async def asgi_post(app, body):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": CALLBACK_PATH,
+        "raw_path": CALLBACK_PATH.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"127.0.0.1:8001"),
+            (b"content-type", b"application/atom+xml"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8001),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    status = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status.get("code")
+
+
+def atom_payload(video_id, channel_id, published=None):
+    published = published or datetime.now(timezone.utc)
+    return ATOM_TEMPLATE.format(
+        video_id=video_id, channel_id=channel_id,
+        published=published.isoformat(timespec="seconds"),
+        updated=datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+    ).encode("utf-8")
+
+
+# ---------------- 场景 ----------------
+def build_scenarios(scale):
+    rng = random.Random(42)
+
+    def vid(prefix, i):
+        return f"{prefix}{i:07d}"[-11:]
+
+    burst = [(vid("b", i), f"UCburst{i:05d}") for i in range(int(300 * scale))]
+    unique = [(vid("r", i), f"UCredeliv{i:04d}") for i in range(int(50 * scale))]
+    redelivery = unique * 5
+    rng.shuffle(redelivery)
+    disabled = [(vid("d", i), DISABLED_CHANNELS[i % len(DISABLED_CHANNELS)]) for i in range(int(200 * scale))]
+    limited = [(vid("l", i), f"UClimited{i % 10:02d}") for i in range(int(200 * scale))]
+    return {
+        "burst": {"requests": burst, "concurrency": 50, "unique": len(burst)},
+        "redelivery": {"requests": redelivery, "concurrency": 20, "unique": len(unique)},
+        "disabled": {"requests": disabled, "concurrency": 20, "unique": len(disabled)},
+        "rate_limited": {"requests": limited, "concurrency": 20, "unique": len(limited)},
+    }
+
+
+def counter_total(metric):
+    return sum(child.value for child in metric._children.values())
+
+
+async def run_scenario(name, spec, drain_seconds):
+    reset_state()
+    before = {
+        "forwarded_to_c": stubs.forwarded_to_c,
+        "downloads": stubs.downloads,
+        "discovered": counter_total(ws.VIDEOS_DISCOVERED),
+        "dropped": counter_total(ws.TASKS_DROPPED),
+    }
+    queue_depths = []
+    stop = asyncio.Event()
+
+    async def sample_queue():
+        while not stop.is_set():
+            queue_depths.append(ws.video_id_queue.qsize())
+            await asyncio.sleep(0.002)
+
+    sampler = asyncio.create_task(sample_queue())
+    semaphore = asyncio.Semaphore(spec["concurrency"])
+    latencies = []
+    statuses = {}
+
+    async def one(video_id, channel_id):
+        body = atom_payload(video_id, channel_id)
+        async with semaphore:
+            start = time.perf_counter()
+            code = await asgi_post(ws.app, body)
+            latencies.append(time.perf_counter() - start)
+        statuses[code] = statuses.get(code, 0) + 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(v, c) for v, c in spec["requests"]))
+    wall = time.perf_counter() - wall_start
+    # 等待下载 worker 消化队列后再统计队列表现
+    await asyncio.sleep(drain_seconds)
+    stop.set()
+    await sampler
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "requests": n,
+        "unique_videos": spec["unique"],
+        "concurrency": spec["concurrency"],
+        "rps": n / wall if wall else None,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(0, min(n - 1, -(-99 * n // 100) - 1))] * 1000,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "queue": {
+            "max_depth": max(queue_depths, default=0),
+            "capacity": ws.video_id_queue.maxsize,
+            "accepted": int(counter_total(ws.VIDEOS_DISCOVERED) - before["discovered"]),
+            "downloads_started": stubs.downloads - before["downloads"],
+            "forwarded_to_c": stubs.forwarded_to_c - before["forwarded_to_c"],
+            "dropped": int(counter_total(ws.TASKS_DROPPED) - before["dropped"]),
+        },
+    }
+
+
+def check_invariants(results):
+    """与性能无关、必须始终成立的行为"""
+    errors = []
+    b = results.get("burst")
+    if b and not b["queue"]["downloads_started"]:
+        errors.append("burst: 没有任何视频进入下载（视频信息查询桩可能与 _handle_video 不匹配）")
+    r = results.get("redelivery")
+    if r and r["queue"]["accepted"] != r["unique_videos"]:
+        errors.append(f"redelivery: 重复投递应只接收 {r['unique_videos']} 个视频，实际 {r['queue']['accepted']}")
+    d = results.get("disabled")
+    if d and d["queue"]["downloads_started"]:
+        errors.append(f"disabled: 禁用频道不应下载，实际 {d['queue']['downloads_started']}")
+    if d and d["queue"]["forwarded_to_c"] != d["unique_videos"]:
+        errors.append(f"disabled: 禁用频道视频应全部推送C端，实际 {d['queue']['forwarded_to_c']}/{d['unique_videos']}")
+    for name, result in results.items():
+        bad = {k: v for k, v in result["statuses"].items() if k != "200"}
+        if bad:
+            errors.append(f"{name}: 存在非 200 响应 {bad}")
+    return errors
+
+
+def compare_with_baseline(results, baseline, tolerance, p99_floor_ms):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: RPS {result['rps']:.0f} < 基线 {base['rps']:.0f} × {1 - tolerance:.2f}")
+        if result["p99_ms"] > base["p99_ms"] * (1 + tolerance) and result["p99_ms"] - base["p99_ms"] > p99_floor_ms:
+            regressions.append(f"{name}: p99 {result['p99_ms']:.2f}ms > 基线 {base['p99_ms']:.2f}ms × {1 + tolerance:.2f}")
+    return regressions
+
+
+async def run(args):
+    install_stubs(args.api_latency / 1000, args.download_latency / 1000)
+    await ws.init_async_globals()
+    handler = asyncio.create_task(ws.async_handler_task())
+    try:
+        results = {}
+        for name, spec in build_scenarios(args.scale).items():
+            if args.only and name not in args.only:
+                continue
+            runs = [await run_scenario(name, spec, args.drain) for _ in range(args.repeat)]
+            r = results[name] = dict(
+                runs[-1],
+                rps=statistics.median(run["rps"] for run in runs),
+                p50_ms=statistics.median(run["p50_ms"] for run in runs),
+                p99_ms=statistics.median(run["p99_ms"] for run in runs),
+                repeat=args.repeat,
+            )
+            print(f"{name:13s} n={r['requests']:5d} rps={r['rps']:8.0f} p50={r['p50_ms']:6.2f}ms "
+                  f"p99={r['p99_ms']:6.2f}ms queue_max={r['queue']['max_depth']}/{r['queue']['capacity']} "
+                  f"accepted={r['queue']['accepted']} to_c={r['queue']['forwarded_to_c']} dropped={r['queue']['dropped']}")
+        return results
+    finally:
+        handler.cancel()
+        await asyncio.gather(handler, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="youtube_callback 进程内压测")
+    parser.add_argument("--scale", type=float, default=1.0, help="各场景请求数倍率")
+    parser.add_argument("--only", nargs="*", help="只运行指定场景")
+    parser.add_argument("--api-latency", type=float, default=20, help="YouTube API 桩延迟（毫秒）")
+    parser.add_argument("--download-latency", type=float, default=50, help="下载器桩延迟（毫秒）")
+    parser.add_argument("--drain", type=float, default=0.5, help="每个场景结束后等待队列消化的秒数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景重复次数（取中位数）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的 RPS 下降 / p99 上升比例")
+    parser.add_argument("--p99-floor-ms", type=float, default=2.0, help="p99 上升小于该毫秒数时不视为回退")
+    parser.add_argument("--update-baseline", action="store_true", help="不变量全部通过时把本次结果写入基线")
+    parser.add_argument("--require-baseline", action="store_true", help="基线不存在时失败（默认只跳过性能比较）")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    if args.require_baseline and not args.update_baseline and not os.path.exists(args.baseline):
+        print(f"[!] 基线不存在: {args.baseline}，请先在基准机器上运行 --update-baseline 生成并提交")
+        sys.exit(1)
+
+    results = asyncio.run(run(args))
+    report = {"python": sys.version.split()[0], "scale": args.scale, "scenarios": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures = check_invariants(results)
+    if args.update_baseline:
+        if failures:
+            print("[!] 不变量检查未通过，不写入基线")
+        else:
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"[✓] 已写入基线: {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        print(f"[!] 基线不存在: {args.baseline}，本次只检查不变量；用 --update-baseline 生成基线后提交")
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"[!] 基线 scale={baseline.get('scale')} 与本次 {args.scale} 不同，跳过性能比较")
+        else:
+            failures += compare_with_baseline(results, baseline, args.tolerance, args.p99_floor_ms)
+
+    if failures:
+        print("[!] 压测失败:")
+        for failure in failures:
+            print(f"    - {failure}")
+        sys.exit(1)
+    print("[✓] 压测通过")
+
+
+if __name__ == "__main__":
+    main()
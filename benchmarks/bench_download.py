@@ -0,0 +1,278 @@
+"""
+本地下载吞吐基准
+用 ffmpeg 生成合成媒体并在本机 HTTP 服务上提供三种形式：
+- progressive：单个 MP4 文件
+- hls：m3u8 + ts 分片（下载后 ffmpeg 修复封装）
+- dash：mpd + 独立的视频/音频分片（下载后 ffmpeg 合并，与 YouTube 的 bestvideo+bestaudio 路径相同）
+对每种形式、每个文件大小、每个并发度，在独立子进程中并发调用 AsyncVideoDownloader.download_video，报告：
+- 吞吐（MB/s，按输出文件大小计）与墙钟耗时
+- 本进程 CPU 时间，以及子进程（ffmpeg 合并/封装）CPU 时间（RUSAGE_CHILDREN）
+- 本进程与子进程的峰值内存（ru_maxrss）
+每个组合使用新进程，峰值内存互不干扰。Windows 上没有 resource 模块，CPU/内存项为 null。
+
+用法（在项目根目录，需要 yt-dlp 与 ffmpeg）：
+    python benchmarks/bench_download.py --sizes-mb 10,50 --concurrency 1,2,4
+    python benchmarks/bench_download.py --kinds dash --media-dir .bench_media --json download.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import functools
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KINDS = ("progressive", "hls", "dash")
+VIDEO_KBPS = 4000
+AUDIO_KBPS = 128
+SEGMENT_SECONDS = 4
+# progressive/hls 只有一路音视频，dash 保留生产环境的格式选择以走相同的合并路径
+FORMAT_BY_KIND = {"progressive": "best", "hls": "best", "dash": None}
+ENTRY_BY_KIND = {"progressive": "progressive.mp4", "hls": "hls/index.m3u8", "dash": "dash/manifest.mpd"}
+
+
+class MediaRequestHandler(SimpleHTTPRequestHandler):
+    extensions_map = dict(SimpleHTTPRequestHandler.extensions_map, **{
+        ".mpd": "application/dash+xml",
+        ".m3u8": "application/vnd.apple.mpegurl",
+        ".m4s": "video/iso.segment",
+        ".ts": "video/mp2t",
+    })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_ffmpeg(ffmpeg, args, cwd):
+    subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y", *args], cwd=cwd, check=True)
+
+
+def generate_media(ffmpeg, root, size_mb):
+    """生成约 size_mb 大小的测试视频及其 HLS、DASH 版本，已存在时复用"""
+    media_dir = os.path.join(root, f"{size_mb:g}mb")
+    if all(os.path.exists(os.path.join(media_dir, entry)) for entry in ENTRY_BY_KIND.values()):
+        return media_dir
+    os.makedirs(os.path.join(media_dir, "hls"), exist_ok=True)
+    os.makedirs(os.path.join(media_dir, "dash"), exist_ok=True)
+    duration = max(SEGMENT_SECONDS, size_mb * 1024 * 1024 * 8 / ((VIDEO_KBPS + AUDIO_KBPS) * 1000))
+    print(f"[✓] 生成 {size_mb:g}MB 测试媒体（{duration:.0f}s）...")
+    run_ffmpeg(ffmpeg, [
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", f"{duration:.2f}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-b:v", f"{VIDEO_KBPS}k", "-minrate", f"{VIDEO_KBPS}k", "-maxrate", f"{VIDEO_KBPS}k",
+        "-bufsize", f"{VIDEO_KBPS * 2}k", "-x264-params", "nal-hrd=cbr",
+        "-g", str(30 * SEGMENT_SECONDS), "-keyint_min", str(30 * SEGMENT_SECONDS),
+        "-c:a", "aac", "-b:a", f"{AUDIO_KBPS}k",
+        "-movflags", "+faststart", ENTRY_BY_KIND["progressive"],
+    ], media_dir)
+    run_ffmpeg(ffmpeg, [
+        "-i", ENTRY_BY_KIND["progressive"], "-c", "copy", "-f", "hls",
+        "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", "hls/seg_%05d.ts", ENTRY_BY_KIND["hls"],
+    ], media_dir)
+    run_ffmpeg(ffmpeg, [
+        "-i", ENTRY_BY_KIND["progressive"], "-map", "0:v", "-map", "0:a", "-c", "copy", "-f", "dash",
+        "-seg_duration", str(SEGMENT_SECONDS), "-use_template", "1", "-use_timeline", "1",
+        "-adaptation_sets", "id=0,streams=v id=1,streams=a", ENTRY_BY_KIND["dash"],
+    ], media_dir)
+    return media_dir
+
+
+def start_media_server(root):
+    handler = functools.partial(MediaRequestHandler, directory=root)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench_media_server", daemon=True).start()
+    return server
+
+
+def rusage_snapshot():
+    if resource is None:
+        return None
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Linux 的 ru_maxrss 单位为 KB，macOS 为字节
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self_cpu": self_usage.ru_utime + self_usage.ru_stime,
+        "children_cpu": children.ru_utime + children.ru_stime,
+        "self_maxrss": self_usage.ru_maxrss * scale,
+        "children_maxrss": children.ru_maxrss * scale,
+    }
+
+
+class DirectProxyPool:
+    """代理池桩：始终直连"""
+    def pick(self, exclude=()):
+        return None
+
+    def acquire(self, proxy):
+        pass
+
+    def release(self, proxy, success, elapsed=None, size=0):
+        pass
+
+
+class _PassthroughBreaker:
+    state = "closed"
+
+    def allow(self):
+        return True
+
+    def record_success(self):
+        pass
+
+    def record_failure(self):
+        return False
+
+    def release_probe(self):
+        pass
+
+
+class PassthroughCircuitBreakers:
+    """熔断桩：所有站点始终放行"""
+    def get(self, site):
+        return _PassthroughBreaker()
+
+
+async def child_run(spec):
+    """子进程：并发下载同一地址 spec['concurrency'] 次"""
+    sys.path.insert(0, PROJECT_ROOT)
+    from utils import video_downloader
+    from utils.video_downloader import AsyncVideoDownloader, preload_yt_dlp
+
+    video_downloader.send_alert = lambda *a, **k: None
+    # 只测本地下载路径：不经过 [proxies] 中的生产代理（也不改动其得分），站点熔断不跳过任何下载
+    video_downloader.proxy_pool = DirectProxyPool()
+    video_downloader.circuit_breakers = PassthroughCircuitBreakers()
+    format_override = FORMAT_BY_KIND[spec["kind"]]
+
+    class BenchDownloader(AsyncVideoDownloader):
+        def build_ydl_opts(self, video_url, output_path_template):
+            opts = super().build_ydl_opts(video_url, output_path_template)
+            for key in ("cookies", "cookiesfrombrowser", "jsruntimes", "remote_components", "extractor_args"):
+                opts.pop(key, None)
+            if format_override:
+                opts["format"] = format_override
+            opts["ffmpeg_location"] = spec["ffmpeg"]
+            return opts
+
+    preload_yt_dlp()  # 导入耗时不计入下载
+    downloader = BenchDownloader()
+    downloader.base_dir = spec["output_dir"]
+
+    before = rusage_snapshot()
+    start = time.perf_counter()
+    paths = await asyncio.gather(*(
+        downloader.download_video("bench", spec["url"], f"v{index:03d}", max_retry=1)
+        for index in range(spec["concurrency"])
+    ))
+    elapsed = time.perf_counter() - start
+    after = rusage_snapshot()
+
+    sizes = [os.path.getsize(p) for p in paths if p and os.path.exists(p)]
+    result = {
+        "elapsed_seconds": elapsed,
+        "downloads": len(paths),
+        "succeeded": len(sizes),
+        "output_bytes": sum(sizes),
+        "throughput_mb_s": sum(sizes) / 1024 / 1024 / elapsed if elapsed else None,
+        "self_cpu_seconds": None,
+        "merge_cpu_seconds": None,
+        "self_peak_rss_mb": None,
+        "merge_peak_rss_mb": None,
+    }
+    if before and after:
+        result.update({
+            "self_cpu_seconds": after["self_cpu"] - before["self_cpu"],
+            "merge_cpu_seconds": after["children_cpu"] - before["children_cpu"],
+            "self_peak_rss_mb": after["self_maxrss"] / 1024 / 1024,
+            "merge_peak_rss_mb": after["children_maxrss"] / 1024 / 1024,
+        })
+    print(json.dumps(result))
+
+
+def run_case(spec):
+    with tempfile.TemporaryDirectory() as output_dir:
+        spec = dict(spec, output_dir=output_dir)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+            cwd=PROJECT_ROOT, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"子进程失败（code={proc.returncode}）: {proc.stderr.strip()[-500:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AsyncVideoDownloader 本地下载吞吐基准")
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"逗号分隔，可选 {', '.join(KINDS)}")
+    parser.add_argument("--sizes-mb", default="10,50", help="逗号分隔的文件大小（MB）")
+    parser.add_argument("--concurrency", default="1,2,4", help="逗号分隔的并发度列表")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"), help="ffmpeg 路径，默认取 PATH 中的 ffmpeg")
+    parser.add_argument("--media-dir", help="测试媒体目录（保留以便复用），默认使用临时目录")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child_run(json.loads(args.child)))
+        return
+    if not args.ffmpeg:
+        parser.error("未找到 ffmpeg，请通过 --ffmpeg 指定")
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"未知的媒体形式: {', '.join(sorted(unknown))}")
+    sizes = [float(s) for s in args.sizes_mb.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    tmp = None if args.media_dir else tempfile.TemporaryDirectory()
+    media_root = args.media_dir or tmp.name
+    os.makedirs(media_root, exist_ok=True)
+    server = start_media_server(media_root)
+    results = []
+    try:
+        for size_mb in sizes:
+            media_dir = generate_media(args.ffmpeg, media_root, size_mb)
+            for kind in kinds:
+                relative = os.path.relpath(os.path.join(media_dir, ENTRY_BY_KIND[kind]), media_root).replace(os.sep, "/")
+                url = f"http://127.0.0.1:{server.server_address[1]}/{relative}"
+                for concurrency in levels:
+                    result = run_case({"kind": kind, "url": url, "concurrency": concurrency, "ffmpeg": args.ffmpeg})
+                    result.update({"kind": kind, "size_mb": size_mb, "concurrency": concurrency})
+                    results.append(result)
+                    merge_cpu = result["merge_cpu_seconds"]
+                    print(f"[✓] {kind:<11} {size_mb:>6g}MB x{concurrency}: "
+                          f"{result['succeeded']}/{result['downloads']} 成功，{result['throughput_mb_s'] or 0:.1f} MB/s，"
+                          f"耗时 {result['elapsed_seconds']:.2f}s，"
+                          f"合并 CPU {'n/a' if merge_cpu is None else f'{merge_cpu:.2f}s'}，"
+                          f"峰值内存 {result['self_peak_rss_mb'] or 0:.0f}MB")
+    finally:
+        server.shutdown()
+        server.server_close()
+        if tmp:
+            tmp.cleanup()
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
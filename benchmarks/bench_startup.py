@@ -0,0 +1,127 @@
+"""
+冷启动基准
+在全新的子进程中测量：
+1. import webhook_server 的耗时（及 yt_dlp / playwright / pyautogui 是否被提前导入）
+2. 启动 uvicorn 到 /livez 首次返回 200 的耗时（开始接收回调）
+3. 启动 uvicorn 到 /readyz 首次返回 200 的耗时（浏览器、下载器全部就绪）
+
+用法（在项目根目录）：
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --role ingest        # 只测 ingest 进程（不启动浏览器）
+    python benchmarks/bench_startup.py --json result.json   # 保存结果
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("yt_dlp", "playwright.async_api", "pyautogui")
+
+IMPORT_PROBE = f"""
+import sys, time, json
+start = time.perf_counter()
+import webhook_server
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_seconds": elapsed, "heavy_loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def http_status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return None
+
+
+def measure_import(env):
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(out)
+
+
+def measure_server(env, ready_timeout):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "webhook_server:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    start = time.perf_counter()
+    live = ready = None
+    try:
+        while time.perf_counter() - start < ready_timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"服务进程提前退出，code={proc.returncode}")
+            if live is None and http_status(f"http://127.0.0.1:{port}/livez") == 200:
+                live = time.perf_counter() - start
+            if live is not None and http_status(f"http://127.0.0.1:{port}/readyz") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {"live_seconds": live, "ready_seconds": ready}
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {"median": statistics.median(values), "min": min(values), "max": max(values), "n": len(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="webhook 服务冷启动基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--role", default="all", choices=("all", "ingest", "worker"))
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--skip-server", action="store_true", help="只测导入耗时")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    env = dict(os.environ, YSD_ROLE=args.role, PYTHONDONTWRITEBYTECODE="1")
+    imports, servers = [], []
+    for i in range(args.runs):
+        imports.append(measure_import(env))
+        if not args.skip_server:
+            servers.append(measure_server(env, args.ready_timeout))
+        print(f"[{i + 1}/{args.runs}] import={imports[-1]['import_seconds']:.3f}s"
+              + (f" live={servers[-1]['live_seconds']} ready={servers[-1]['ready_seconds']}" if servers else ""))
+
+    result = {
+        "role": args.role,
+        "runs": args.runs,
+        "import_seconds": summarize([r["import_seconds"] for r in imports]),
+        "heavy_modules_loaded_at_import": sorted({m for r in imports for m in r["heavy_loaded"]}),
+        "live_seconds": summarize([r["live_seconds"] for r in servers]),
+        "ready_seconds": summarize([r["ready_seconds"] for r in servers]),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
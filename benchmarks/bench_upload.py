@@ -0,0 +1,195 @@
+"""
+抖音上传流程离线基准
+用真实的 DouyinUploader.upload_video + Playwright Chromium 驱动本地模拟创作者中心
+（benchmarks/fake_creator_center.py），测量上传器自身的开销：
+- 每次上传的总耗时、吞吐（次/分钟）
+- 各阶段耗时：登录检测、填写标签、设置封面、发布确认，其余为跳转、选择文件与等待预览
+- 上传器内部固定 asyncio.sleep 的累计时长
+- 开销 = 总耗时 - 模拟站点上无法避免的等待（FakeCreatorCenter.critical_path_seconds）
+并在多个并发度（同一浏览器上下文中的多个页面）下重复，用于离线评估并发调整。
+
+用法（在项目根目录，需要 playwright 及 chromium）：
+    python benchmarks/bench_upload.py --uploads 8 --concurrency 1,2,4
+    python benchmarks/bench_upload.py --preview 10 --file-size-mb 50 --json upload.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_creator_center import FakeCreatorCenter, add_delay_arguments, delays_from_args  # noqa: E402
+from utils import douyin_uploader  # noqa: E402
+from utils.douyin_uploader import DouyinUploader  # noqa: E402
+
+STAGES = ("is_login_page", "fill_tags", "set_cover", "publish_and_confirm")
+BENCH_TAGS = ["旅行", "美食", "日常", "vlog", "风景"]
+
+
+class SleepMeter:
+    """替换 douyin_uploader 模块中的 asyncio，按任务累计 asyncio.sleep 的时长，其余属性原样转发"""
+    def __init__(self, module):
+        self._module = module
+        self.slept = defaultdict(float)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    async def sleep(self, delay, *args, **kwargs):
+        self.slept[self._module.current_task()] += delay
+        return await self._module.sleep(delay, *args, **kwargs)
+
+
+class BenchUploader(DouyinUploader):
+    # 固定标签，不依赖 channels.ini
+    tags = BENCH_TAGS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = defaultdict(float)
+        for name in STAGES:
+            setattr(self, name, self._timed(name, getattr(self, name)))
+
+    def _timed(self, name, method):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.timings[name] += time.perf_counter() - start
+        return wrapper
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_level(browser, center, video_path, uploads, concurrency, sleep_meter, log_handler):
+    context = await browser.new_context()
+    queue = asyncio.Queue()
+    for index in range(uploads):
+        queue.put_nowait({"video_id": f"bench{index:04d}", "channel_id": "bench", "path": video_path})
+    records = []
+
+    async def worker():
+        page = await context.new_page()
+        uploader = BenchUploader(page, log_handler=log_handler, base_url=center.base_url)
+        await page.goto(uploader.manage_url)
+        await uploader.ensure_logged_in()
+        while True:
+            try:
+                task = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            uploader.timings.clear()
+            current = asyncio.current_task()
+            sleep_meter.slept[current] = 0.0
+            start = time.perf_counter()
+            success = await uploader.upload_video(task["path"], task=task)
+            total = time.perf_counter() - start
+            stages = dict(uploader.timings)
+            stages["other"] = max(0.0, total - sum(stages.values()))
+            records.append({
+                "success": bool(success),
+                "total": total,
+                "slept": sleep_meter.slept.pop(current, 0.0),
+                "stages": stages,
+            })
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await context.close()
+    elapsed = time.perf_counter() - start
+
+    totals = [r["total"] for r in records]
+    floor = center.critical_path_seconds(os.path.getsize(video_path))
+    return {
+        "concurrency": concurrency,
+        "uploads": len(records),
+        "succeeded": sum(r["success"] for r in records),
+        "elapsed_seconds": elapsed,
+        "uploads_per_minute": len(records) / elapsed * 60 if elapsed else None,
+        "total_seconds": {"median": statistics.median(totals), "p95": percentile(totals, 0.95)} if totals else None,
+        "site_wait_seconds": floor,
+        "overhead_seconds": statistics.median(totals) - floor if totals else None,
+        "fixed_sleep_seconds": statistics.median(r["slept"] for r in records) if records else None,
+        "stages_median_seconds": {
+            name: statistics.median(r["stages"].get(name, 0.0) for r in records)
+            for name in STAGES + ("other",)
+        } if records else {},
+    }
+
+
+async def run(args):
+    from playwright.async_api import async_playwright
+
+    # 基准不发送告警
+    douyin_uploader.send_alert = lambda *a, **k: None
+    sleep_meter = SleepMeter(asyncio)
+    douyin_uploader.asyncio = sleep_meter
+    log_handler = print if args.verbose else (lambda msg: None)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, FakeCreatorCenter(
+        delays=delays_from_args(args), reject_rate=args.reject_rate,
+        upload_bytes_per_second=args.upload_mbps * 1024 * 1024,
+    ) as center:
+        video_path = os.path.join(tmp, "bench.mp4")
+        with open(video_path, "wb") as f:
+            f.write(os.urandom(int(args.file_size_mb * 1024 * 1024)))
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=not args.headed)
+            try:
+                for concurrency in levels:
+                    result = await run_level(browser, center, video_path, args.uploads, concurrency,
+                                             sleep_meter, log_handler)
+                    results.append(result)
+                    stages = " ".join(f"{k}={v:.2f}s" for k, v in result["stages_median_seconds"].items())
+                    print(f"[✓] 并发 {concurrency}: {result['succeeded']}/{result['uploads']} 成功，"
+                          f"{result['uploads_per_minute']:.1f} 次/分钟，单次中位 {result['total_seconds']['median']:.2f}s，"
+                          f"开销 {result['overhead_seconds']:.2f}s（固定 sleep {result['fixed_sleep_seconds']:.2f}s） | {stages}")
+            finally:
+                await browser.close()
+        site_stats = dict(center.stats)
+    return {
+        "file_size_mb": args.file_size_mb,
+        "delays": delays_from_args(args),
+        "levels": results,
+        "site": site_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抖音上传流程离线基准")
+    parser.add_argument("--uploads", type=int, default=8, help="每个并发度下的上传次数")
+    parser.add_argument("--concurrency", default="1,2,4", help="逗号分隔的并发度列表")
+    parser.add_argument("--file-size-mb", type=float, default=5)
+    parser.add_argument("--headed", action="store_true", help="显示浏览器窗口")
+    parser.add_argument("--verbose", action="store_true", help="输出上传器日志")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    add_delay_arguments(parser)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+本地模拟的抖音创作者中心
+只复刻 DouyinUploader 依赖的页面结构与选择器，用于离线测量上传流程本身的开销：
+- 管理页：高清发布按钮（span#douyin-creator-master-side-upload），可选显示扫码登录
+- 上传页：input[type=file]、作品简介输入框、竖封面区域与“选择封面”弹窗、预览视频标签页、发布按钮
+- 发布接口：POST /web/api/media/aweme/create_v2/，返回 status_code/item_id，成功后跳回管理页
+各环节的耗时均可配置（秒），见 DEFAULT_DELAYS。
+
+单独运行（便于用浏览器手动查看页面）：
+    python benchmarks/fake_creator_center.py --port 8765 --preview 3
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MANAGE_PATH = "/creator-micro/content/manage"
+UPLOAD_PATH = "/creator-micro/content/upload"
+CREATE_PATH = "/web/api/media/aweme/create_v2/"
+STATS_PATH = "/__stats"
+
+DEFAULT_DELAYS = {
+    "page_load": 0.05,        # 服务端返回 HTML 前的延迟
+    "navigate": 0.1,          # 点击高清发布后跳转上传页的延迟
+    "editor": 0.5,            # 选择文件后编辑区（简介、封面、发布按钮）出现的延迟
+    "cover_modal": 0.2,       # 点击“选择封面”后弹窗出现的延迟
+    "preview": 2.0,           # 文件传输完成后预览视频生成的延迟
+    "publish": 0.3,           # 发布接口的响应延迟
+    "redirect": 0.1,          # 发布成功后跳回管理页的延迟
+}
+DEFAULT_UPLOAD_BYTES_PER_SECOND = 50 * 1024 * 1024
+
+MANAGE_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>作品管理</title></head>
+<body>
+  <div class="header">
+    <button class="header-button-a1B2c3" type="button">
+      <span id="douyin-creator-master-side-upload" class="header-button-text-Ww8aQU">高清发布</span>
+    </button>
+  </div>
+  __LOGIN__
+  <div class="content-list">作品管理</div>
+  <script>
+    const DELAYS = __DELAYS__;
+    document.querySelector("button.header-button-a1B2c3").addEventListener("click", () => {
+      setTimeout(() => { location.href = "__UPLOAD_PATH__"; }, DELAYS.navigate * 1000);
+    });
+  </script>
+</body></html>
+"""
+
+LOGIN_HTML = """<div class="login-tabs">
+    <span class="selected-w_E01s">扫码登录</span><span>验证码登录</span>
+  </div>"""
+
+UPLOAD_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>发布视频</title>
+<style>.hidden { display: none; } .modal { position: fixed; top: 20%; left: 30%; }</style>
+</head>
+<body>
+  <div class="upload-btn">
+    <input type="file" accept="video/*">
+  </div>
+  <div id="editor" class="hidden">
+    <div class="editor-kit-container" contenteditable="true" data-placeholder="添加作品简介"></div>
+    <div class="coverControl-CjlzqC" style="width: 90px; height: 120px;">
+      <div class="background-OpVteV">竖封面</div>
+      <div class="filter-k_CjvJ">选择封面</div>
+    </div>
+    <div class="coverControl-CjlzqC" style="width: 160px; height: 90px;">
+      <div class="filter-k_CjvJ">选择封面</div>
+    </div>
+    <div id="tabs" class="tabs-container"></div>
+    <div class="content-confirm-container-Wp91G7">
+      <button class="button-dhlUZE primary-cECiOJ" type="button">发布</button>
+    </div>
+  </div>
+  <div id="cover-modal" class="modal hidden">
+    <button class="semi-button semi-button-secondary secondary-zU1YLr" type="button"><span class="semi-button-content">完成</span></button>
+  </div>
+  <script>
+    const DELAYS = __DELAYS__;
+    const BYTES_PER_SECOND = __BYTES_PER_SECOND__;
+    const show = (el) => el.classList.remove("hidden");
+    const hide = (el) => el.classList.add("hidden");
+    let selectedFile = null;
+
+    document.querySelector("input[type=file]").addEventListener("change", (event) => {
+      selectedFile = event.target.files[0];
+      if (!selectedFile) return;
+      setTimeout(() => show(document.getElementById("editor")), DELAYS.editor * 1000);
+      const transfer = selectedFile.size / BYTES_PER_SECOND;
+      setTimeout(() => {
+        const tab = document.createElement("div");
+        tab.className = "tabItem-x7Yq2D";
+        tab.textContent = "预览视频";
+        document.getElementById("tabs").appendChild(tab);
+      }, (transfer + DELAYS.preview) * 1000);
+    });
+
+    document.querySelector(".coverControl-CjlzqC[style*='width: 90px'] .filter-k_CjvJ").addEventListener("click", () => {
+      setTimeout(() => show(document.getElementById("cover-modal")), DELAYS.cover_modal * 1000);
+    });
+    document.querySelector("#cover-modal button").addEventListener("click", () => {
+      hide(document.getElementById("cover-modal"));
+    });
+
+    document.querySelector(".content-confirm-container-Wp91G7 button").addEventListener("click", async () => {
+      const body = {
+        text: document.querySelector("[data-placeholder]").innerText,
+        file: selectedFile ? selectedFile.name : null,
+        size: selectedFile ? selectedFile.size : 0,
+      };
+      const response = await fetch("__CREATE_PATH__?aid=1128", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify(body),
+      });
+      const data = await response.json();
+      if (data.status_code === 0) {
+        setTimeout(() => { location.href = "__MANAGE_PATH__"; }, DELAYS.redirect * 1000);
+      }
+    });
+  </script>
+</body></html>
+"""
+
+
+class FakeCreatorCenter:
+    def __init__(self, host="127.0.0.1", port=0, delays=None, reject_rate=0.0,
+                 login_required=False, upload_bytes_per_second=DEFAULT_UPLOAD_BYTES_PER_SECOND):
+        """
+        :param delays: 覆盖 DEFAULT_DELAYS 中的部分耗时（秒）
+        :param reject_rate: 发布接口返回失败（status_code != 0）的概率
+        :param login_required: 管理页显示扫码登录，用于验证登录检测
+        :param upload_bytes_per_second: 模拟的文件传输速度，决定预览视频出现的时间
+        """
+        self.host = host
+        self.port = port
+        self.delays = dict(DEFAULT_DELAYS, **(delays or {}))
+        self.reject_rate = reject_rate
+        self.login_required = login_required
+        self.upload_bytes_per_second = upload_bytes_per_second
+        self.stats = {"manage_pages": 0, "upload_pages": 0, "published": 0, "rejected": 0}
+        self.published = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def critical_path_seconds(self, file_size):
+        """
+        连续上传时每次在模拟站点上无法避免的等待：上次发布后跳回管理页 → 跳转上传页 →
+        编辑区出现与预览生成中较晚者 → 发布响应
+        上传器实际耗时减去该值即为上传流程自身的开销（固定 sleep、定位器等待等）
+        """
+        d = self.delays
+        transfer = file_size / self.upload_bytes_per_second
+        return (d["redirect"] + d["navigate"] + 2 * d["page_load"]
+                + max(d["editor"], transfer + d["preview"]) + d["publish"])
+
+    def _render(self, template):
+        return (template
+                .replace("__LOGIN__", LOGIN_HTML if self.login_required else "")
+                .replace("__DELAYS__", json.dumps(self.delays))
+                .replace("__BYTES_PER_SECOND__", str(self.upload_bytes_per_second))
+                .replace("__MANAGE_PATH__", MANAGE_PATH)
+                .replace("__UPLOAD_PATH__", UPLOAD_PATH)
+                .replace("__CREATE_PATH__", CREATE_PATH)
+                .encode("utf-8"))
+
+    def _publish(self, body):
+        time.sleep(self.delays["publish"])
+        with self._lock:
+            if random.random() < self.reject_rate:
+                self.stats["rejected"] += 1
+                return {"status_code": 8, "status_msg": "模拟发布失败"}
+            self.stats["published"] += 1
+            item_id = str(7_000_000_000_000_000_000 + len(self.published))
+            self.published.append({"item_id": item_id, **body})
+        return {"status_code": 0, "item_id": item_id}
+
+    def _make_handler(self):
+        center = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, data, status=200):
+                self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == STATS_PATH:
+                    with center._lock:
+                        return self._send_json(dict(center.stats))
+                if path.startswith(MANAGE_PATH) or path == "/":
+                    template, counter = MANAGE_HTML, "manage_pages"
+                elif path.startswith(UPLOAD_PATH):
+                    template, counter = UPLOAD_HTML, "upload_pages"
+                else:
+                    return self._send(404, b"not found", "text/plain")
+                time.sleep(center.delays["page_load"])
+                with center._lock:
+                    center.stats[counter] += 1
+                self._send(200, center._render(template), "text/html; charset=utf-8")
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if path != CREATE_PATH:
+                    return self._send(404, b"not found", "text/plain")
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                self._send_json(center._publish(body))
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake_creator_center", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_delay_arguments(parser):
+    for name, value in DEFAULT_DELAYS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value, dest=f"delay_{name}",
+                            help=f"{name} 延迟（秒），默认 {value}")
+    parser.add_argument("--upload-mbps", type=float, default=DEFAULT_UPLOAD_BYTES_PER_SECOND / 1024 / 1024,
+                        help="模拟的文件传输速度（MB/s）")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="发布接口返回失败的概率")
+
+
+def delays_from_args(args):
+    return {name: getattr(args, f"delay_{name}") for name in DEFAULT_DELAYS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟抖音创作者中心")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--login-required", action="store_true")
+    add_delay_arguments(parser)
+    args = parser.parse_args()
+
+    center = FakeCreatorCenter(
+        host=args.host, port=args.port, delays=delays_from_args(args), reject_rate=args.reject_rate,
+        login_required=args.login_required, upload_bytes_per_second=args.upload_mbps * 1024 * 1024,
+    ).start()
+    print(f"[✓] 模拟创作者中心已启动: {center.base_url}{MANAGE_PATH}")
+    try:
+        center._thread.join()
+    except KeyboardInterrupt:
+        center.stop()
+
+
+if __name__ == "__main__":
+    main()
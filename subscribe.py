@@ -9,28 +9,33 @@ async def subscribe_channel(channel_id: str, callback_url: str) -> tuple[bool, s
 async def unsubscribe_channel(channel_id: str, callback_url: str) -> tuple[bool, str]:
     return await _submit_subscription(channel_id, callback_url, mode="unsubscribe")
 
+HUB_URL = 'https://pubsubhubbub.appspot.com/subscribe'
+
 async def _submit_subscription(channel_id: str, callback_url: str, mode: str, retry: int = 3, delay: int = 3) -> tuple[bool, str]:
-    hub_url = 'https://pubsubhubbub.appspot.com/subscribe'
-    topic = f'https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}'
-    data = {
-        'hub.mode': mode,
-        'hub.topic': topic,
-        'hub.callback': callback_url,
-        'hub.verify': 'async'
-    }
     for attempt in range(retry):
         try:
             async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.post(hub_url, data=data) as resp:
-                    if resp.status == 202:
-                        msg = f"[✓] {mode.upper()} 成功: {channel_id}"
-                        return True, msg
-                    else:
-                        response_text = await resp.text()
-                        msg = f"[!] {mode.upper()} 失败: {resp.status} - {response_text}"
+                success, msg = await post_subscription(session, channel_id, callback_url, mode)
+                if success:
+                    return True, msg
         except Exception as e:
             msg = f"[!] 网络异常 ({mode}, 尝试 {attempt+1}/{retry}): {e}"
         if attempt < retry - 1:
             await asyncio.sleep(delay)
     msg = f"[!] {mode.upper()} 最终失败: {channel_id}"
-    return False, msg
\ No newline at end of file
+    return False, msg
+
+async def post_subscription(session: aiohttp.ClientSession, channel_id: str, callback_url: str, mode: str) -> tuple[bool, str]:
+    """向 Hub 提交一次订阅/取消订阅请求（不重试，复用调用方的 session）"""
+    topic = f'https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}'
+    data = {
+        'hub.mode': mode,
+        'hub.topic': topic,
+        'hub.callback': callback_url,
+        'hub.verify': 'async'
+    }
+    async with session.post(HUB_URL, data=data) as resp:
+        if resp.status == 202:
+            return True, f"[✓] {mode.upper()} 成功: {channel_id}"
+        response_text = await resp.text()
+        return False, f"[!] {mode.upper()} 失败: {resp.status} - {response_text}"
@@ -0,0 +1,136 @@
+"""
+DeadlineTaskQueue 的排序与挤出规则
+运行：python -m pytest tests 或 python -m unittest discover -s tests -t .
+"""
+import asyncio
+import unittest
+
+from utils.task_scheduler import DeadlineTaskQueue
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def auto(name, deadline, priority=0):
+    return {"name": name, "deadline": deadline, "priority": priority}
+
+
+def manual(name):
+    return {"name": name, "manual": True}
+
+
+class DeadlineTaskQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.discarded = []
+        self.queue = self.make_queue(10)
+
+    def make_queue(self, maxsize):
+        return DeadlineTaskQueue(
+            maxsize=maxsize,
+            on_discard=lambda task, reason: self.discarded.append((task["name"], reason)),
+            clock=self.clock,
+        )
+
+    def drain(self, queue=None):
+        queue = queue or self.queue
+        names = []
+        while True:
+            try:
+                names.append(queue.get_nowait()["name"])
+            except asyncio.QueueEmpty:
+                return names
+
+    # ---------- 排序 ----------
+
+    def test_auto_tasks_ordered_by_deadline(self):
+        self.queue.put_nowait(auto("late", 1300))
+        self.queue.put_nowait(auto("early", 1100))
+        self.queue.put_nowait(auto("middle", 1200))
+        self.assertEqual(self.drain(), ["early", "middle", "late"])
+
+    def test_same_deadline_ordered_by_priority_then_arrival(self):
+        self.queue.put_nowait(auto("low", 1100, priority=0))
+        self.queue.put_nowait(auto("high", 1100, priority=5))
+        self.queue.put_nowait(auto("low2", 1100, priority=0))
+        self.assertEqual(self.drain(), ["high", "low", "low2"])
+
+    def test_manual_tasks_before_auto_tasks(self):
+        self.queue.put_nowait(auto("urgent", 1001, priority=9))
+        self.queue.put_nowait(manual("m1"))
+        self.queue.put_nowait(auto("later", 1500))
+        self.queue.put_nowait(manual("m2"))
+        self.assertEqual(self.drain(), ["m1", "m2", "urgent", "later"])
+
+    def test_snapshot_matches_dispatch_order(self):
+        self.queue.put_nowait(auto("a", 1200))
+        self.queue.put_nowait(manual("m"))
+        self.queue.put_nowait(auto("b", 1100))
+        self.assertEqual([task["name"] for task in self.queue.snapshot()], ["m", "b", "a"])
+
+    def test_expired_tasks_discarded_on_get(self):
+        self.queue.put_nowait(auto("expired", 1050))
+        self.queue.put_nowait(auto("alive", 1200))
+        self.queue.put_nowait(manual("m"))
+        self.clock.now = 1100
+        self.assertEqual(self.drain(), ["m", "alive"])
+        self.assertEqual(self.discarded, [("expired", "expired")])
+
+    # ---------- 队列满时的挤出 ----------
+
+    def test_full_queue_evicts_worst_auto_for_more_urgent_auto(self):
+        queue = self.make_queue(2)
+        queue.put_nowait(auto("a", 1100))
+        queue.put_nowait(auto("b", 1300))
+        queue.put_nowait(auto("c", 1200))
+        self.assertEqual(self.discarded, [("b", "evicted")])
+        self.assertEqual(self.drain(queue), ["a", "c"])
+
+    def test_full_queue_rejects_less_urgent_auto(self):
+        queue = self.make_queue(2)
+        queue.put_nowait(auto("a", 1100))
+        queue.put_nowait(auto("b", 1200))
+        with self.assertRaises(asyncio.QueueFull):
+            queue.put_nowait(auto("c", 1300))
+        self.assertEqual(self.discarded, [])
+        self.assertEqual(self.drain(queue), ["a", "b"])
+
+    def test_manual_task_evicts_worst_auto(self):
+        queue = self.make_queue(2)
+        queue.put_nowait(auto("a", 1100))
+        queue.put_nowait(auto("b", 1200))
+        queue.put_nowait(manual("m"))
+        self.assertEqual(self.discarded, [("b", "evicted")])
+        self.assertEqual(self.drain(queue), ["m", "a"])
+
+    def test_manual_tasks_never_evicted(self):
+        queue = self.make_queue(2)
+        queue.put_nowait(manual("m1"))
+        queue.put_nowait(manual("m2"))
+        with self.assertRaises(asyncio.QueueFull):
+            queue.put_nowait(auto("a", 1001, priority=9))
+        with self.assertRaises(asyncio.QueueFull):
+            queue.put_nowait(manual("m3"))
+        self.assertEqual(self.discarded, [])
+        self.assertEqual(self.drain(queue), ["m1", "m2"])
+
+    # ---------- 异步出队 ----------
+
+    def test_get_waits_for_put(self):
+        async def scenario():
+            getter = asyncio.ensure_future(self.queue.get())
+            await asyncio.sleep(0)
+            self.assertFalse(getter.done())
+            await self.queue.put(manual("m"))
+            return await asyncio.wait_for(getter, 1)
+
+        self.assertEqual(asyncio.run(scenario())["name"], "m")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,384 @@
+"""
+抖音多账号上传池
+每个账号使用独立的浏览器用户目录（持久化上下文）、上传队列、并发槽位和 worker，上传吞吐随账号数线性扩展。
+- 频道按一致性哈希映射到账号，增减账号时只有少量频道迁移；[account_overrides] 可固定指定频道使用的账号
+- 每个账号独立限速（account_uploads_per_hour）并维护健康状态：连续失败或掉登录后暂时摘除，
+  冷却期间新任务及其队列中的任务转投哈希环上的下一个健康账号
+"""
+import time
+import bisect
+import asyncio
+import hashlib
+
+from utils.browser_manager import BrowserManager
+from utils.concurrency import ResizableSemaphore, ResizableQueue
+from utils.adaptive_concurrency import AIMDController
+from utils.rate_limiter import AsyncTokenBucket
+from utils.config_loader import get_config
+from utils.douyin_uploader import process_upload_task, WECOM_WEBHOOK
+from utils.fanout import upload_fanout
+from utils.notifier import send_alert
+from utils.metrics import Counter, Gauge
+
+RING_REPLICAS = 100           # 每个账号在哈希环上的虚拟节点数
+FAILURE_THRESHOLD = 3         # 连续失败达到该次数后进入冷却
+COOLDOWN_SECONDS = 900        # 首次冷却时长，之后每次翻倍
+MAX_COOLDOWN_SECONDS = 4 * 3600
+LOGIN_COOLDOWN_SECONDS = 1800  # 检测到掉登录时的冷却时长（等待人工扫码）
+
+ACCOUNT_UPLOADS = Counter("ysd_account_uploads_total", "各抖音账号上传结果", ["account", "result"])
+ACCOUNT_HEALTHY = Gauge("ysd_account_healthy", "抖音账号是否可接收任务（1 可用，0 冷却/未就绪）", ["account"])
+ACCOUNT_QUEUE_SIZE = Gauge("ysd_account_queue_size", "各抖音账号上传队列长度", ["account"])
+
+
+class ConsistentHashRing:
+    """一致性哈希环（带虚拟节点）"""
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self._keys = []
+        self._nodes = {}
+        self.node_count = 0
+        for node in nodes:
+            self.node_count += 1
+            for i in range(replicas):
+                h = self._hash(f"{node}#{i}")
+                self._nodes[h] = node
+        self._keys = sorted(self._nodes)
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def iter_nodes(self, key):
+        """从 key 的位置顺时针遍历哈希环，依次返回不重复的节点（首个即 key 的归属节点）"""
+        if not self._keys:
+            return
+        start = bisect.bisect(self._keys, self._hash(key))
+        seen = set()
+        for i in range(len(self._keys)):
+            node = self._nodes[self._keys[(start + i) % len(self._keys)]]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == self.node_count:
+                    return
+
+
+class UploadAccount:
+    """单个抖音账号的上传通道：浏览器、队列、并发槽位、限速与健康状态"""
+    def __init__(self, name, profile, cfg, log_handler, with_kuaishou=False):
+        self.name = name
+        self.profile = profile
+        self.browser = BrowserManager(log_handler=log_handler, profile=profile, with_kuaishou=with_kuaishou)
+        self.queue = ResizableQueue(maxsize=cfg.upload_queue_maxsize)
+        self.semaphore = ResizableSemaphore(cfg.max_concurrent_uploads)
+        self.controller = AIMDController(
+            f"抖音上传[{name}]", self.semaphore,
+            cfg.upload_concurrency_min, cfg.upload_concurrency_max,
+            latency_target=cfg.upload_latency_target,
+        )
+        self.bucket = None
+        self.set_rate(cfg.account_uploads_per_hour)
+        self.ready = False
+        self.retired = False
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.last_error = ""
+        self.uploaded = 0
+        self.failed = 0
+        self.tasks = []
+        ACCOUNT_HEALTHY.labels(name).set_function(lambda: 1 if self.healthy else 0)
+        ACCOUNT_QUEUE_SIZE.labels(name).set_function(self.queue.qsize)
+
+    @property
+    def uploader(self):
+        return self.browser.uploader_douyin
+
+    @property
+    def healthy(self):
+        return self.ready and not self.retired and time.monotonic() >= self.cooldown_until
+
+    def set_rate(self, uploads_per_hour):
+        if uploads_per_hour <= 0:
+            self.bucket = None
+        elif self.bucket is None:
+            self.bucket = AsyncTokenBucket(uploads_per_hour / 3600, 1)
+        else:
+            self.bucket.rate = uploads_per_hour / 3600
+
+    def record_success(self):
+        self.uploaded += 1
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        ACCOUNT_UPLOADS.labels(self.name, "ok").inc()
+
+    def record_failure(self, reason, cooldown=None):
+        """记录失败，返回本次进入冷却的时长（秒），未进入冷却返回 0"""
+        self.failed += 1
+        self.consecutive_failures += 1
+        self.last_error = reason
+        ACCOUNT_UPLOADS.labels(self.name, "failed").inc()
+        if cooldown is None and self.consecutive_failures >= FAILURE_THRESHOLD:
+            cooldown = min(MAX_COOLDOWN_SECONDS,
+                           COOLDOWN_SECONDS * 2 ** (self.consecutive_failures - FAILURE_THRESHOLD))
+        if not cooldown:
+            return 0
+        self.cooldown_until = time.monotonic() + cooldown
+        return cooldown
+
+    def state(self):
+        return {
+            "profile": self.profile,
+            "ready": self.ready,
+            "healthy": self.healthy,
+            "retired": self.retired,
+            "cooldown_remaining": max(0, round(self.cooldown_until - time.monotonic())),
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "queue_size": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "rate_per_hour": round(self.bucket.rate * 3600, 2) if self.bucket else 0,
+            "concurrency": self.controller.state(),
+        }
+
+
+class AccountPool:
+    def __init__(self):
+        self.accounts = {}
+        self.ring = ConsistentHashRing()
+        self.overrides = {}
+        self.log_handler = print
+        # 浏览器启动完成（无论成功与否）后置位；此前提交的上传任务等待而不是被丢弃
+        self.started = asyncio.Event()
+
+    # ---------------- 生命周期 ----------------
+    async def start(self, log_handler=print):
+        """按配置创建账号并并行启动各自的浏览器（第一个账号同时负责快手页面）"""
+        cfg = get_config()
+        self.log_handler = log_handler
+        self.overrides = dict(cfg.account_overrides)
+        for index, (name, profile) in enumerate(cfg.douyin_accounts.items()):
+            self.accounts[name] = UploadAccount(name, profile, cfg, log_handler, with_kuaishou=(index == 0))
+        self._rebuild_ring()
+        try:
+            await asyncio.gather(*(self._start_account(account, cfg) for account in list(self.accounts.values())))
+        finally:
+            self.started.set()
+
+    async def _start_account(self, account, cfg):
+        try:
+            await account.browser.start()
+        except Exception as e:
+            account.last_error = f"浏览器启动失败: {type(e).__name__}"
+            self.log_handler(f"[!] 抖音账号 {account.name} 浏览器启动失败: {type(e).__name__} | {str(e).splitlines()[0]}")
+            send_alert(f"[!]小包浆Vlog-抖音账号 {account.name} 浏览器启动失败，请尽快查看原因", WECOM_WEBHOOK)
+            return
+        account.ready = True
+        self._ensure_workers(account, cfg)
+        self.log_handler(f"[✓] 抖音账号 {account.name} 已就绪（用户目录 {account.profile}）")
+
+    def _ensure_workers(self, account, cfg):
+        """按上传并发补足 worker；按 adaptive_concurrency 为账号启动或停止 AIMD 控制器"""
+        workers = [t for t in account.tasks if t.get_name().startswith("douyin_worker")]
+        target = max(2, cfg.max_concurrent_uploads)
+        for index in range(len(workers), target):
+            account.tasks.append(asyncio.create_task(
+                self._worker(account), name=f"douyin_worker_{account.name}_{index}"
+            ))
+        controllers = [t for t in account.tasks if t.get_name().startswith("upload_aimd") and not t.done()]
+        if cfg.adaptive_concurrency and not controllers:
+            account.tasks.append(asyncio.create_task(account.controller.run(), name=f"upload_aimd_{account.name}"))
+        elif not cfg.adaptive_concurrency and controllers:
+            for task in controllers:
+                task.cancel()
+                account.tasks.remove(task)
+            # 恢复静态并发上限，不再停留在 AIMD 最后调整的值
+            account.semaphore.resize(cfg.max_concurrent_uploads)
+
+    async def stop(self):
+        for account in list(self.accounts.values()):
+            await self._stop_account(account)
+
+    async def _stop_account(self, account):
+        for task in account.tasks:
+            if not task.done():
+                task.cancel()
+        for task in account.tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        account.tasks.clear()
+        try:
+            await account.browser.stop()
+        except Exception as e:
+            self.log_handler(f"[!] 关闭抖音账号 {account.name} 浏览器异常: {e}")
+
+    async def _retire_account(self, account):
+        """账号从配置中移除：不再分配新任务，排空已入队任务后关闭浏览器"""
+        if account.ready:
+            await account.queue.join()
+        await self._stop_account(account)
+        self.accounts.pop(account.name, None)
+        self.log_handler(f"[✓] 抖音账号 {account.name} 已下线")
+
+    # ---------------- 路由 ----------------
+    def _rebuild_ring(self):
+        self.ring = ConsistentHashRing(name for name, account in self.accounts.items() if not account.retired)
+
+    def candidates(self, channel_id):
+        """频道的候选账号：指定账号优先，其后按哈希环顺序"""
+        names = []
+        override = self.overrides.get(channel_id)
+        if override in self.accounts and not self.accounts[override].retired:
+            names.append(override)
+        names.extend(name for name in self.ring.iter_nodes(channel_id or "") if name != override)
+        return [self.accounts[name] for name in names]
+
+    def route(self, channel_id, exclude=None):
+        """返回第一个健康的候选账号；都不可用时退回首个已就绪账号（排队等待其恢复），无账号可用返回 None"""
+        candidates = [a for a in self.candidates(channel_id) if a.name != exclude]
+        for account in candidates:
+            if account.healthy:
+                return account
+        for account in candidates:
+            if account.ready:
+                return account
+        return None
+
+    async def submit(self, task):
+        """把上传任务放入对应账号的队列（队列满时等待）；无可用账号时抛出 asyncio.QueueFull"""
+        await self.started.wait()
+        account = self.route(task.get("channel_id"))
+        if account is None:
+            raise asyncio.QueueFull("没有可用的抖音账号")
+        task["account"] = account.name
+        await account.queue.put(task)
+        return account
+
+    # ---------------- worker ----------------
+    async def _worker(self, account):
+        while True:
+            task = await account.queue.get()
+            success = False
+            try:
+                if not account.healthy and self._reroute(account, task):
+                    continue
+                await self._wait_until_available(account)
+                if account.bucket is not None:
+                    await account.bucket.acquire()
+                async with account.semaphore:
+                    success = await process_upload_task(account.uploader, task, self.log_handler, account.controller)
+                if success is True:
+                    account.record_success()
+                elif success is False:
+                    await self._on_failure(account)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log_handler(f"[!] 抖音账号 {account.name} upload_worker异常: {type(e).__name__} | {str(e).splitlines()[0]}")
+            finally:
+                # 转投其他账号的任务由新账号负责释放文件引用
+                if task.get("account") == account.name:
+                    upload_fanout.complete(task, success)
+                account.queue.task_done()
+
+    def _reroute(self, account, task):
+        """账号不可用时把任务转投其他健康账号，成功返回 True"""
+        other = self.route(task.get("channel_id"), exclude=account.name)
+        if other is None or not other.healthy:
+            return False
+        try:
+            other.queue.put_nowait(task)
+        except asyncio.QueueFull:
+            return False
+        task["account"] = other.name
+        self.log_handler(f"[-] 抖音账号 {account.name} 不可用，任务 {task.get('video_id')} 转投账号 {other.name}")
+        return True
+
+    async def _wait_until_available(self, account):
+        while not account.retired and time.monotonic() < account.cooldown_until:
+            await asyncio.sleep(min(60, account.cooldown_until - time.monotonic()))
+
+    async def _on_failure(self, account):
+        try:
+            logged_out = await account.uploader.is_login_page()
+        except Exception:
+            logged_out = False
+        if logged_out:
+            cooldown = account.record_failure("未登录", cooldown=LOGIN_COOLDOWN_SECONDS)
+        else:
+            cooldown = account.record_failure("上传失败")
+        if cooldown:
+            self.log_handler(
+                f"[!] 抖音账号 {account.name} {account.last_error}（连续失败 {account.consecutive_failures} 次），"
+                f"暂停 {cooldown // 60} 分钟，期间任务转投其他账号"
+            )
+            send_alert(f"[!]小包浆Vlog-抖音账号 {account.name} {account.last_error}，已暂停使用，请尽快处理", WECOM_WEBHOOK)
+
+    # ---------------- 配置热更新与状态 ----------------
+    async def apply_runtime_config(self, old, new):
+        """在线调整各账号并发、队列容量与限速，按 [douyin_accounts] 增减账号"""
+        self.overrides = dict(new.account_overrides)
+        for account in self.accounts.values():
+            if account.retired:
+                continue
+            if old.max_concurrent_uploads != new.max_concurrent_uploads:
+                account.semaphore.resize(new.max_concurrent_uploads)
+            if old.upload_queue_maxsize != new.upload_queue_maxsize:
+                account.queue.resize(new.upload_queue_maxsize)
+            account.controller.latency_target = new.upload_latency_target
+            account.controller.set_bounds(new.upload_concurrency_min, new.upload_concurrency_max)
+            account.set_rate(new.account_uploads_per_hour)
+            if account.ready:
+                self._ensure_workers(account, new)
+
+        added = [name for name in new.douyin_accounts if name not in self.accounts]
+        removed = [name for name, account in self.accounts.items()
+                   if name not in new.douyin_accounts and not account.retired]
+        for name in removed:
+            self.accounts[name].retired = True
+            asyncio.create_task(self._retire_account(self.accounts[name]), name=f"retire_{name}")
+        for name in added:
+            self.accounts[name] = UploadAccount(name, new.douyin_accounts[name], new, self.log_handler)
+        for name, profile in new.douyin_accounts.items():
+            if name not in added and self.accounts[name].profile != profile:
+                self.log_handler(f"[!] 抖音账号 {name} 的用户目录变更需重启后生效")
+        if added or removed:
+            self._rebuild_ring()
+            self.log_handler(f"[✓] 抖音账号已调整：新增 {added or '无'}，下线 {removed or '无'}")
+            await asyncio.gather(*(self._start_account(self.accounts[name], new) for name in added))
+
+    def kuaishou_uploader(self):
+        """快手页面由第一个账号的浏览器打开，未就绪时返回 None"""
+        for account in self.accounts.values():
+            if account.browser.with_kuaishou:
+                return account.browser.uploader_kuaishou if account.ready else None
+        return None
+
+    def set_log_handler(self, handler):
+        self.log_handler = handler
+        for account in self.accounts.values():
+            account.browser.log_handler = handler
+            if account.uploader is not None:
+                account.uploader.log_handler = handler
+
+    def qsize(self):
+        return sum(a.queue.qsize() for a in self.accounts.values())
+
+    def capacity(self):
+        return sum(a.queue.maxsize for a in self.accounts.values() if not a.retired)
+
+    def slots_in_use(self):
+        return sum(a.semaphore.in_use for a in self.accounts.values())
+
+    def slots_limit(self):
+        return sum(a.semaphore.limit for a in self.accounts.values() if a.ready and not a.retired)
+
+    def state(self):
+        return {name: account.state() for name, account in self.accounts.items()}
+
+
+# 全局单例
+account_pool = AccountPool()
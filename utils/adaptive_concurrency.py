@@ -0,0 +1,125 @@
+"""
+AIMD 自适应并发控制
+按观测到的错误率、延迟和吞吐，在配置的上下限之间调整 ResizableSemaphore 的上限：
+- 错误率超阈值或 p90 延迟超目标：乘性减小
+- 槽位打满且吞吐未下降：加性增加
+- 上一次增加后吞吐反而下降：回退
+"""
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+
+DEFAULT_INTERVAL = 60
+DEFAULT_ERROR_RATE_THRESHOLD = 0.2
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_MIN_SAMPLES = 3
+HISTORY_SIZE = 100
+
+
+class AIMDController:
+    def __init__(self, name, semaphore, min_limit, max_limit, latency_target=None,
+                 interval=DEFAULT_INTERVAL, error_rate_threshold=DEFAULT_ERROR_RATE_THRESHOLD,
+                 decrease_factor=DEFAULT_DECREASE_FACTOR, increase_step=1, min_samples=DEFAULT_MIN_SAMPLES):
+        self.name = name
+        self.semaphore = semaphore
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.interval = interval
+        self.error_rate_threshold = error_rate_threshold
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_samples = min_samples
+        self._samples = []     # 本周期的 (success, latency, nbytes)
+        self._saturated = False
+        self._last_throughput = None
+        self._last_action = None
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+    def record(self, success, latency, nbytes=0):
+        """记录一次任务结果（在任务结束时调用）"""
+        self._samples.append((success, latency, nbytes))
+
+    def observe_saturation(self):
+        """采样当前槽位是否打满（有等待者或占用达到上限）"""
+        if self.semaphore.in_use >= self.semaphore.limit or self.semaphore.waiting:
+            self._saturated = True
+
+    def set_bounds(self, min_limit, max_limit):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        clamped = max(min_limit, min(max_limit, self.semaphore.limit))
+        if clamped != self.semaphore.limit:
+            self._apply(clamped, "配置上下限变化", {})
+
+    def evaluate(self):
+        samples, self._samples = self._samples, []
+        saturated, self._saturated = self._saturated, False
+        limit = self.semaphore.limit
+        stats = {"samples": len(samples), "saturated": saturated}
+        if len(samples) < self.min_samples:
+            return limit
+
+        failures = sum(1 for ok, _, _ in samples if not ok)
+        error_rate = failures / len(samples)
+        latencies = sorted(lat for ok, lat, _ in samples if ok)
+        p90 = latencies[max(0, math.ceil(0.9 * len(latencies)) - 1)] if latencies else None
+        throughput = sum(nbytes for ok, _, nbytes in samples if ok) or (len(samples) - failures)
+        stats.update({
+            "error_rate": round(error_rate, 3),
+            "p90_latency": round(p90, 3) if p90 is not None else None,
+            "throughput": throughput,
+        })
+
+        new_limit, reason = limit, None
+        if error_rate > self.error_rate_threshold:
+            new_limit, reason = math.floor(limit * self.decrease_factor), f"错误率 {error_rate:.0%} 超过阈值"
+        elif self.latency_target and p90 is not None and p90 > self.latency_target:
+            new_limit, reason = math.floor(limit * self.decrease_factor), f"p90 延迟 {p90:.1f}s 超过目标 {self.latency_target}s"
+        elif self._last_action == "increase" and self._last_throughput and throughput < self._last_throughput * 0.95:
+            new_limit, reason = limit - self.increase_step, "增加并发后吞吐下降，回退"
+        elif saturated:
+            new_limit, reason = limit + self.increase_step, "槽位打满且无异常，增加并发"
+        self._last_throughput = throughput
+
+        new_limit = max(self.min_limit, min(self.max_limit, new_limit))
+        if new_limit == limit:
+            self._last_action = None
+            return limit
+        self._last_action = "increase" if new_limit > limit else "decrease"
+        self._apply(new_limit, reason, stats)
+        return new_limit
+
+    def _apply(self, new_limit, reason, stats):
+        old_limit = self.semaphore.limit
+        self.semaphore.resize(new_limit)
+        self.history.append({"time": time.time(), "old": old_limit, "new": new_limit, "reason": reason, **stats})
+        logging.info(f"[✓] {self.name} 并发自适应调整: {old_limit} -> {new_limit}（{reason}）")
+
+    def state(self):
+        return {
+            "limit": self.semaphore.limit,
+            "in_use": self.semaphore.in_use,
+            "waiting": self.semaphore.waiting,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "history": list(self.history),
+        }
+
+    async def run(self, sample_interval=1.0):
+        """周期性采样饱和度并在每个周期末调整上限"""
+        elapsed = 0.0
+        while True:
+            try:
+                await asyncio.sleep(sample_interval)
+                self.observe_saturation()
+                elapsed += sample_interval
+                if elapsed >= self.interval:
+                    elapsed = 0.0
+                    self.evaluate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"[!] {self.name} 自适应并发控制异常: {e}")
@@ -1,13 +1,14 @@
 import os
-import pyautogui
-from playwright.async_api import async_playwright
+import asyncio
 
-# 导入同级 utils 下的上传器
+# 导入同级 utils 下的上传器（playwright、pyautogui 与快手上传器在 start() 中按需导入，加快服务启动）
 from .douyin_uploader import DouyinUploader
-from .kuaishou_uploader import KuaishouUploader
 
 class BrowserManager:
-    def __init__(self, log_handler=print):
+    def __init__(self, log_handler=print, profile="Profile1", with_kuaishou=True):
+        # profile: user_data 下的浏览器用户目录，每个抖音账号一个；with_kuaishou: 是否同时打开快手页面
+        self.profile = profile
+        self.with_kuaishou = with_kuaishou
         self.playwright = None
         self.browser = None
         self.douyin_page = None
@@ -17,7 +18,9 @@ class BrowserManager:
         self.log_handler = log_handler
 
     async def start(self):
+        from playwright.async_api import async_playwright
         try:
+            import pyautogui
             screen_width, screen_height = pyautogui.size()
         except Exception:
             screen_width, screen_height = 1920, 1080
@@ -28,7 +31,7 @@ class BrowserManager:
 
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch_persistent_context(
-            user_data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "user_data", "Profile1")),
+            user_data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "user_data", self.profile)),
             headless=False,
             viewport={'width': viewport_width, 'height': viewport_height},
             device_scale_factor=SCALE_FACTOR,
@@ -84,14 +87,32 @@ class BrowserManager:
             // 8. 关闭 OffscreenCanvas
             window.OffscreenCanvas = undefined;
         """)
-        self.kuaishou_page = self.browser.pages[0]
-        self.douyin_page = await self.browser.new_page()
-        await self.douyin_page.goto("https://creator.douyin.com/creator-micro/content/manage")
-        await self.kuaishou_page.goto("https://cp.kuaishou.com/article/manage/video")
+        if self.with_kuaishou:
+            self.kuaishou_page = self.browser.pages[0]
+            self.douyin_page = await self.browser.new_page()
+        else:
+            self.douyin_page = self.browser.pages[0]
+        # 抖音、快手页面的打开与登录检查互不依赖，并行进行
+        steps = [self._open_douyin()]
+        if self.with_kuaishou:
+            steps.append(self._open_kuaishou())
+        await asyncio.gather(*steps)
+
+    async def _open_douyin(self):
         self.uploader_douyin = DouyinUploader(page=self.douyin_page, log_handler=self.log_handler)
-        self.uploader_kuaishou = KuaishouUploader(page=self.kuaishou_page, log_handler=self.log_handler)
+        await self.douyin_page.goto(self.uploader_douyin.manage_url)
         await self.uploader_douyin.ensure_logged_in()
-        await self.uploader_kuaishou.ensure_logged_in()
+
+    async def _open_kuaishou(self):
+        # 快手不可用时不影响抖音上传
+        try:
+            from .kuaishou_uploader import KuaishouUploader
+            await self.kuaishou_page.goto("https://cp.kuaishou.com/article/manage/video")
+            self.uploader_kuaishou = KuaishouUploader(page=self.kuaishou_page, log_handler=self.log_handler)
+            await self.uploader_kuaishou.ensure_logged_in()
+        except Exception as e:
+            self.uploader_kuaishou = None
+            self.log_handler(f"[!] 快手页面初始化失败，快手上传不可用: {type(e).__name__} | {str(e).splitlines()[0]}")
 
     async def stop(self):
         if self.browser:
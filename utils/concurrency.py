@@ -0,0 +1,91 @@
+"""
+可在运行时调整容量的信号量与队列
+"""
+import asyncio
+import collections
+
+
+class ResizableSemaphore:
+    """
+    上限可动态调整的信号量
+    调小上限时不会打断已持有的槽位，只是新的 acquire 要等占用数降到上限以下
+    """
+    def __init__(self, limit):
+        if limit < 1:
+            raise ValueError(f"limit 必须 >= 1: {limit}")
+        self._limit = limit
+        self._in_use = 0
+        self._waiters = collections.deque()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    @property
+    def waiting(self):
+        return sum(1 for w in self._waiters if not w.done())
+
+    def locked(self):
+        return self._in_use >= self._limit
+
+    async def acquire(self):
+        if not self.locked() and not self._waiters:
+            self._in_use += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已被分配槽位但调用方被取消，归还槽位
+                self._in_use -= 1
+                self._wake_up()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        return True
+
+    def release(self):
+        if self._in_use <= 0:
+            raise ValueError("ResizableSemaphore 释放次数超过获取次数")
+        self._in_use -= 1
+        self._wake_up()
+
+    def resize(self, limit):
+        if limit < 1:
+            raise ValueError(f"limit 必须 >= 1: {limit}")
+        self._limit = limit
+        self._wake_up()
+
+    def _wake_up(self):
+        for waiter in self._waiters:
+            if self._in_use >= self._limit:
+                break
+            if not waiter.done():
+                self._in_use += 1
+                waiter.set_result(True)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return None
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class ResizableQueue(asyncio.Queue):
+    """容量可动态调整的 asyncio.Queue"""
+
+    def resize(self, maxsize):
+        self._maxsize = maxsize
+        # 扩容后唤醒等待 put 的协程
+        while self._putters and not self.full():
+            self._wakeup_next(self._putters)
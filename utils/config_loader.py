@@ -1,14 +1,19 @@
 # utils/config_loader.py
 """
 统一配置热加载模块
-使用 watchdog 监听 config.ini 文件变化，实现 time_gap_minutes 热更新
+使用 watchdog 监听 config.ini / channels.ini 变化，构建不可变配置快照，校验通过后整体原子替换
+读取方直接取当前快照（无锁），变更通过监听器通知（如调整信号量、队列容量）
 """
 import os
+import sys
 import logging
 import configparser
 import asyncio
+import inspect
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import Optional
+from types import MappingProxyType
+from typing import Callable, List, Mapping, Optional
 
 try:
     from watchdog.observers import Observer
@@ -16,6 +21,8 @@ try:
 except ImportError:
     raise ImportError("缺少依赖库: pip install watchdog")
 
+from utils.executors import run_blocking, CONFIG
+
 # ------------------------
 # 全局变量：在主线程中保存事件循环引用
 # ------------------------
@@ -29,37 +36,282 @@ def _set_main_thread_loop():
     logging.info(f"[√] config_loader 已绑定主线程事件循环: {_main_thread_loop}")
 
 
+def _get_base_dir():
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # 上一级目录
+
+
+# A端单个频道限流逻辑（config.ini 未配置 [channel_limits] 时使用）
+# 值为分钟数，-1 代表该频道不处理，0 代表不限流
+DEFAULT_CUSTOM_CHANNEL_IDS = {
+    "UCzSFLbvTKdcfmCo7saWZujQ": 720,
+    "UCIbPhiNMXmko9CTUaWX8gqQ": 720,
+    "UCleXpK9Sb2MCSZeNR4CTsMQ": 720,
+    "UCwavDe8g8Mfdk0o8QVJKaog": 720,
+    "UCjWCVEhAS4LCECSMDNMnzlw": -1,
+    "UCh9xEOEmXC_FuGUarv_2HUw": 720,
+    "UCUc0c5R90Evk4zNqxO6GzHA": -1,
+    "UCZn8dbFxfy_iOWnWEHyFfdw": 720,
+    "UCurCrjSzGWfL2MMxkzVKAIw": -1, #抄袭4oA博主
+    "UCqaBbXWyJ3-kHBb2PdkUJRw": -1,
+    "UCwUq57PDCpsvwN5DYRig2-w": 720,
+    "UCJtVPEhP9ovaD0OkVi66B2A": 720,
+    "UCnWRXcywrripPvT9SGbztjg": -1,
+    "UCM7d5JKl2mPhZdwrpVG0hnQ": -1,
+    "UCCf51KVCmk-AGJY-XrCEkjw": -1,
+    "UCqcwDHhFk17OEHuvf16kY4A": 720,
+    "UCO9RUgHoQ-bUpfFQopCFrxw": 720,
+    "UCSr575W5pK9NmHiZ69WFp4A": -1,
+    "UCVWG-brm2sO4CYuNlQg_4oA": -1,
+    "UCiNvbjFfN4lQTNJm6P-hfzA": 720,
+    "UC-maRiqJ9Y3mBZfBk-xnb8A": 720,
+    "UCqGRYxVOmDGCZPjMD-UBGlw": 720,
+}
+
+# 不推送C端的频道ID（config.ini 未配置 [no_push_c] 时使用）
+DEFAULT_NO_PUSH_C_IDS = frozenset({
+    "UC-maRiqJ9Y3mBZfBk-xnb8A",
+    "UCqGRYxVOmDGCZPjMD-UBGlw",
+})
+
+# 抖音上传账号：账号名 -> 浏览器用户目录（user_data 下），config.ini 未配置 [douyin_accounts] 时使用
+DEFAULT_DOUYIN_ACCOUNTS = {"default": "Profile1"}
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """不可变配置快照，任何修改都通过构建新快照并整体替换完成"""
+    time_gap_minutes: int = 60
+    max_download_queue_size: int = 4
+    max_concurrent_downloads: int = 2
+    upload_queue_maxsize: int = 4
+    max_concurrent_uploads: int = 1
+    # 自适应并发（AIMD）的上下限与延迟目标（秒）
+    adaptive_concurrency: bool = True
+    download_concurrency_min: int = 1
+    download_concurrency_max: int = 4
+    download_latency_target: int = 180
+    upload_concurrency_min: int = 1
+    upload_concurrency_max: int = 1
+    upload_latency_target: int = 600
+    # 拆分部署：ingest_workers > 1 时回调由多个 ingest 进程接收，下载与浏览器在独立 worker 进程（监听 worker_port）
+    ingest_workers: int = 1
+    worker_port: int = 8002
+    # 自动推送视频的时效窗口（分钟）：发布超过该时长仍未开始下载的任务不再处理
+    freshness_window_minutes: int = 2
+    # 单个抖音账号每小时最多上传数，0 为不限
+    account_uploads_per_hour: int = 0
+    custom_channel_ids: Mapping[str, int] = field(default_factory=lambda: MappingProxyType(dict(DEFAULT_CUSTOM_CHANNEL_IDS)))
+    no_push_c_ids: frozenset = DEFAULT_NO_PUSH_C_IDS
+    # 频道调度优先级，数值越大越优先（截止时间相同时比较）
+    channel_priority: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    # 多账号上传：频道按一致性哈希分配到账号，account_overrides 可指定频道固定使用的账号
+    douyin_accounts: Mapping[str, str] = field(default_factory=lambda: MappingProxyType(dict(DEFAULT_DOUYIN_ACCOUNTS)))
+    account_overrides: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    # RSS 轮询兜底：按频道发布频率在上下限（秒）之间调整轮询间隔
+    feed_polling: bool = True
+    feed_poll_min_interval: int = 120
+    feed_poll_max_interval: int = 1800
+    feed_poll_concurrency: int = 4
+    # 下载完成后分发的上传平台（同一文件只下载一次）
+    upload_platforms: tuple = ("douyin",)
+    # 下载代理池：名称 -> 代理地址（http://、socks5:// 等），为空时直连
+    proxies: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    # 各用途线程池大小（下载 / 回调路径的任务总线操作 / 其它状态文件读写 / 配置重载），热更新时换用新大小的线程池
+    download_executor_workers: int = 8
+    ingest_executor_workers: int = 4
+    disk_executor_workers: int = 2
+    config_executor_workers: int = 2
+    # 事件循环单次阻塞超过该时长（毫秒）时记录阻塞位置的调用栈，见 /debug/loop
+    loop_block_threshold_ms: int = 100
+    # YouTube Data API 每日配额（单位），剩余低于 youtube_quota_reserve 时改用 yt-dlp/Atom 获取视频信息
+    youtube_daily_quota: int = 10000
+    youtube_quota_reserve: int = 500
+    channels: tuple = ()
+    tags: tuple = ()
+
+    @property
+    def time_gap(self) -> timedelta:
+        return timedelta(minutes=self.time_gap_minutes)
+
+    def validate(self) -> List[str]:
+        errors = []
+        if self.time_gap_minutes < 0:
+            errors.append(f"time_gap_minutes 不能为负数: {self.time_gap_minutes}")
+        if self.account_uploads_per_hour < 0:
+            errors.append(f"account_uploads_per_hour 不能为负数: {self.account_uploads_per_hour}")
+        if self.youtube_quota_reserve < 0:
+            errors.append(f"youtube_quota_reserve 不能为负数: {self.youtube_quota_reserve}")
+        for name in ("max_download_queue_size", "max_concurrent_downloads", "freshness_window_minutes", "ingest_workers",
+                     "upload_queue_maxsize", "max_concurrent_uploads",
+                     "download_concurrency_min", "upload_concurrency_min",
+                     "download_latency_target", "upload_latency_target",
+                     "feed_poll_min_interval", "feed_poll_concurrency", "youtube_daily_quota",
+                     "download_executor_workers", "ingest_executor_workers", "disk_executor_workers", "config_executor_workers",
+                     "loop_block_threshold_ms"):
+            value = getattr(self, name)
+            if value < 1:
+                errors.append(f"{name} 必须 >= 1: {value}")
+        if self.feed_poll_max_interval < self.feed_poll_min_interval:
+            errors.append(f"feed_poll_max_interval({self.feed_poll_max_interval}) 不能小于 feed_poll_min_interval({self.feed_poll_min_interval})")
+        for stage in ("download", "upload"):
+            low = getattr(self, f"{stage}_concurrency_min")
+            high = getattr(self, f"{stage}_concurrency_max")
+            if high < low:
+                errors.append(f"{stage}_concurrency_max({high}) 不能小于 {stage}_concurrency_min({low})")
+        for channel_id, minutes in self.custom_channel_ids.items():
+            if minutes < -1:
+                errors.append(f"[channel_limits] {channel_id} 必须 >= -1: {minutes}")
+        if not self.upload_platforms:
+            errors.append("upload_platforms 至少需要一个平台")
+        if not self.douyin_accounts:
+            errors.append("[douyin_accounts] 至少需要配置一个账号")
+        for name, url in self.proxies.items():
+            if "://" not in url:
+                errors.append(f"[proxies] {name} 缺少协议前缀（如 http://、socks5://）: {url}")
+        for channel_id, account in self.account_overrides.items():
+            if account not in self.douyin_accounts:
+                errors.append(f"[account_overrides] {channel_id} 指定的账号 {account} 不在 [douyin_accounts] 中")
+        return errors
+
+
+# SETTINGS 中可热更新的整数项：键名 -> RuntimeConfig 字段
+_INT_SETTINGS = (
+    "time_gap_minutes",
+    "max_download_queue_size",
+    "max_concurrent_downloads",
+    "upload_queue_maxsize",
+    "max_concurrent_uploads",
+    "download_concurrency_min",
+    "download_concurrency_max",
+    "download_latency_target",
+    "upload_concurrency_min",
+    "upload_concurrency_max",
+    "upload_latency_target",
+    "freshness_window_minutes",
+    "ingest_workers",
+    "worker_port",
+    "account_uploads_per_hour",
+    "feed_poll_min_interval",
+    "feed_poll_max_interval",
+    "feed_poll_concurrency",
+    "youtube_daily_quota",
+    "youtube_quota_reserve",
+    "download_executor_workers",
+    "ingest_executor_workers",
+    "disk_executor_workers",
+    "config_executor_workers",
+    "loop_block_threshold_ms",
+)
+
+
 class ConfigReloader:
     def __init__(self):
-        self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # 上一级目录
+        self.base_dir = _get_base_dir()
         self.config_path = os.path.join(self.base_dir, "config", "config.ini")
+        self.channels_path = os.path.join(self.base_dir, "config", "channels.ini")
         self.config_dir = os.path.dirname(self.config_path)
-        self._time_gap_minutes = 60  # 默认值
-        self._lock = asyncio.Lock()  # 异步安全锁
+        self._snapshot = RuntimeConfig()
+        self._listeners: List[Callable] = []
         self._observer: Optional[Observer] = None
         self._load_config()
 
+    @property
+    def snapshot(self) -> RuntimeConfig:
+        """当前配置快照（引用读取是原子的，无需加锁）"""
+        return self._snapshot
+
+    def build_snapshot(self) -> RuntimeConfig:
+        """从配置文件构建新快照（未校验）"""
+        defaults = RuntimeConfig()
+        values = {}
+        config = configparser.ConfigParser(allow_no_value=True)
+        config.optionxform = str
+        if os.path.exists(self.config_path):
+            config.read(self.config_path, encoding="utf-8")
+        else:
+            logging.warning(f"未找到 config.ini ({self.config_path})，使用默认配置")
+        for name in _INT_SETTINGS:
+            values[name] = int(config.get("SETTINGS", name, fallback=str(getattr(defaults, name))))
+        values["adaptive_concurrency"] = config.getboolean("SETTINGS", "adaptive_concurrency",
+                                                           fallback=defaults.adaptive_concurrency)
+        values["feed_polling"] = config.getboolean("SETTINGS", "feed_polling", fallback=defaults.feed_polling)
+        platforms = config.get("SETTINGS", "upload_platforms", fallback=",".join(defaults.upload_platforms))
+        values["upload_platforms"] = tuple(p.strip() for p in platforms.split(",") if p.strip())
+        if config.has_section("channel_limits"):
+            values["custom_channel_ids"] = MappingProxyType(
+                {cid: int(minutes) for cid, minutes in config.items("channel_limits")}
+            )
+        if config.has_section("channel_priority"):
+            values["channel_priority"] = MappingProxyType(
+                {cid: int(priority) for cid, priority in config.items("channel_priority")}
+            )
+        if config.has_section("no_push_c"):
+            values["no_push_c_ids"] = frozenset(config.options("no_push_c"))
+        if config.has_section("douyin_accounts"):
+            # 未填写用户目录时以账号名作为目录名
+            values["douyin_accounts"] = MappingProxyType(
+                {name: (profile or name).strip() for name, profile in config.items("douyin_accounts")}
+            )
+        if config.has_section("account_overrides"):
+            values["account_overrides"] = MappingProxyType(
+                {cid: account.strip() for cid, account in config.items("account_overrides") if account}
+            )
+        if config.has_section("proxies"):
+            values["proxies"] = MappingProxyType(
+                {name: url.strip() for name, url in config.items("proxies") if url}
+            )
+
+        channels_conf = configparser.ConfigParser(allow_no_value=True)
+        channels_conf.optionxform = str
+        if os.path.exists(self.channels_path):
+            channels_conf.read(self.channels_path, encoding="utf-8")
+        if channels_conf.has_section("channels"):
+            values["channels"] = tuple(channels_conf.options("channels"))
+        if channels_conf.has_section("tags"):
+            values["tags"] = tuple(k.strip() for k in channels_conf.options("tags") if k.strip())
+        return RuntimeConfig(**values)
+
     def _load_config(self):
-        """同步加载配置（由 watchdog 调用）"""
-        config = configparser.ConfigParser()
+        """同步构建并校验新快照，通过后原子替换（由 watchdog 触发时在线程池中执行）"""
         try:
-            if os.path.exists(self.config_path):
-                config.read(self.config_path, encoding="utf-8")
-                new_value = int(config.get("SETTINGS", "time_gap_minutes", fallback="60"))
-            else:
-                logging.warning(f"未找到 config.ini ({self.config_path})，使用默认值 60")
-                new_value = 60
-            old_value = self._time_gap_minutes
-            self._time_gap_minutes = new_value
-            logging.info(f"[√] 成功加载 time_gap_minutes = {new_value} 分钟 (从 {old_value} 更新)")
+            new_snapshot = self.build_snapshot()
         except Exception as e:
-            logging.error(f"[!] 解析 config.ini time_gap_minutes 出错: {e}")
-            self._time_gap_minutes = 60
+            logging.error(f"[!] 解析配置文件出错，保留当前配置: {e}")
+            return None
+        errors = new_snapshot.validate()
+        if errors:
+            logging.error(f"[!] 配置校验失败，保留当前配置: {'; '.join(errors)}")
+            return None
+        old_snapshot = self._snapshot
+        self._snapshot = new_snapshot
+        if old_snapshot != new_snapshot:
+            logging.info(
+                f"[√] 配置已更新: time_gap_minutes={new_snapshot.time_gap_minutes}, "
+                f"下载并发={new_snapshot.max_concurrent_downloads}/队列={new_snapshot.max_download_queue_size}, "
+                f"上传并发={new_snapshot.max_concurrent_uploads}/队列={new_snapshot.upload_queue_maxsize}, "
+                f"抖音账号 {len(new_snapshot.douyin_accounts)} 个, "
+                f"频道 {len(new_snapshot.channels)} 个, 标签 {len(new_snapshot.tags)} 个"
+            )
+        return old_snapshot
+
+    def add_listener(self, listener: Callable):
+        """注册配置变更监听器 listener(old, new)，在主线程事件循环中调用，可为协程函数"""
+        self._listeners.append(listener)
+
+    async def _notify(self, old_snapshot, new_snapshot):
+        for listener in list(self._listeners):
+            try:
+                result = listener(old_snapshot, new_snapshot)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.error(f"[!] 配置变更监听器执行出错: {e}")
 
     async def get_time_gap(self) -> timedelta:
-        """异步安全获取当前时间间隔"""
-        async with self._lock:
-            return timedelta(minutes=self._time_gap_minutes)
+        """获取当前时间间隔（兼容旧接口）"""
+        return self._snapshot.time_gap
 
     def reload(self):
         """供 watchdog 调用：触发重载（线程安全的异步调度）"""
@@ -77,20 +329,22 @@ class ConfigReloader:
             logging.error(f"[!] 调度异步重载任务时出错: {e}")
 
     async def _async_reload(self):
-        """异步重载配置"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self._load_config)
+        """异步重载配置，替换成功后在事件循环中通知监听器"""
+        old_snapshot = await run_blocking(CONFIG, self._load_config)
+        if old_snapshot is not None and old_snapshot != self._snapshot:
+            await self._notify(old_snapshot, self._snapshot)
 
     def start_watching(self):
         """启动 watchdog 监听文件变化"""
         if self._observer:
             return
+        watched = {self.config_path, self.channels_path}
         class ConfigHandler(FileSystemEventHandler):
             def __init__(self, reloader):
                 self.reloader = reloader
             def on_modified(self, event):
-                if not event.is_directory and event.src_path == self.reloader.config_path:
-                    logging.info(f"[!] 检测到 config.ini 被修改，正在重新加载...")
+                if not event.is_directory and event.src_path in watched:
+                    logging.info(f"[!] 检测到 {os.path.basename(event.src_path)} 被修改，正在重新加载...")
                     self.reloader.reload()
         event_handler = ConfigHandler(self)
         self._observer = Observer()
@@ -103,6 +357,10 @@ config_reloader = ConfigReloader()
 #config_reloader.start_watching()
 
 # 便捷函数
+def get_config() -> RuntimeConfig:
+    """获取当前生效的配置快照（推荐在业务代码中使用）"""
+    return config_reloader.snapshot
+
 async def get_time_gap():
-    """获取当前生效的时间间隔（推荐在业务代码中使用）"""
-    return await config_reloader.get_time_gap()
\ No newline at end of file
+    """获取当前生效的时间间隔"""
+    return config_reloader.snapshot.time_gap
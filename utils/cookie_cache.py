@@ -0,0 +1,129 @@
+"""
+浏览器 Cookie 缓存
+TikTok/Instagram 下载原先每次都让 yt-dlp 通过 cookiesfrombrowser 打开并解密 Firefox 的 Cookie 数据库。
+这里只导出一次（Netscape 格式，保存在内存中），之后：
+- 超过 TTL 时在后台重新导出，期间继续使用旧的 Cookie
+- 下载出现登录/鉴权失败时立即作废，下次下载前同步重新导出
+- 每次下载从内存写出一份独立的 cookie 文件（yt-dlp 结束时会回写 cookiefile，共用一个文件会互相覆盖），用完删除
+导出失败时返回 None，调用方退回 cookiesfrombrowser。
+"""
+import os
+import time
+import asyncio
+import logging
+import tempfile
+
+from utils.metrics import Counter
+from utils.executors import run_blocking, DOWNLOAD
+
+COOKIE_TTL_SECONDS = 3600
+EXPORT_RETRY_SECONDS = 300  # 导出失败后在此期间直接退回 cookiesfrombrowser，不再反复尝试
+AUTH_ERROR_MARKERS = (
+    "login required", "log in", "sign in", "cookies", "http error 401", "http error 403", "rate-limit reached",
+)
+
+COOKIE_EXPORTS = Counter("ysd_cookie_exports_total", "浏览器 Cookie 导出次数", ["browser", "result"])
+COOKIE_CHECKOUTS = Counter("ysd_cookie_checkouts_total", "下载使用缓存 Cookie 的次数", ["browser", "result"])
+
+
+def is_auth_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in AUTH_ERROR_MARKERS)
+
+
+class CookieCache:
+    def __init__(self, browser="firefox", ttl=COOKIE_TTL_SECONDS, tmp_dir=None):
+        self.browser = browser
+        self.ttl = ttl
+        self.tmp_dir = tmp_dir or tempfile.gettempdir()
+        self._text = None
+        self._exported_at = 0.0
+        self._failed_at = None
+        self._lock = None
+        self._refresh_task = None
+
+    def _get_lock(self):
+        # 延迟创建，确保绑定到使用它的事件循环
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def age(self):
+        return time.time() - self._exported_at if self._text is not None else None
+
+    def _export(self):
+        """从浏览器读取并解密 Cookie，返回 Netscape 格式文本（在线程池中执行）"""
+        from yt_dlp.cookies import extract_cookies_from_browser
+        jar = extract_cookies_from_browser(self.browser)
+        fd, path = tempfile.mkstemp(prefix="ysd_cookies_", suffix=".txt", dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            jar.save(path, ignore_discard=True, ignore_expires=True)
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read(), len(jar)
+        finally:
+            os.remove(path)
+
+    async def refresh(self, only_if_missing=False):
+        async with self._get_lock():
+            # 并发下载同时发现缓存为空时只导出一次
+            if only_if_missing and self._text is not None:
+                return True
+            start = time.perf_counter()
+            try:
+                text, count = await run_blocking(DOWNLOAD, self._export)
+            except Exception as e:
+                self._failed_at = time.time()
+                COOKIE_EXPORTS.labels(self.browser, "failed").inc()
+                logging.warning(f"[!] 导出 {self.browser} Cookie 失败，下载改为直接读取浏览器: {type(e).__name__} | {e}")
+                return False
+            self._text = text
+            self._exported_at = time.time()
+            self._failed_at = None
+            COOKIE_EXPORTS.labels(self.browser, "ok").inc()
+            logging.info(f"[✓] 已导出 {self.browser} Cookie（{count} 条，耗时 {time.perf_counter() - start:.2f}s）")
+            return True
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    def invalidate(self):
+        """下载鉴权失败时调用，下次 checkout 前同步重新导出"""
+        if self._text is not None:
+            logging.warning(f"[!] 下载鉴权失败，{self.browser} Cookie 将重新导出")
+        self._text = None
+
+    async def checkout(self):
+        """返回本次下载专用的 cookie 文件路径；无法导出时返回 None"""
+        if self._text is None:
+            recently_failed = self._failed_at is not None and time.time() - self._failed_at < EXPORT_RETRY_SECONDS
+            if recently_failed or not await self.refresh(only_if_missing=True):
+                COOKIE_CHECKOUTS.labels(self.browser, "unavailable").inc()
+                return None
+            result = "exported"
+        elif self.age > self.ttl:
+            self._refresh_in_background()
+            result = "stale"
+        else:
+            result = "hit"
+        COOKIE_CHECKOUTS.labels(self.browser, result).inc()
+        fd, path = tempfile.mkstemp(prefix="ysd_cookies_", suffix=".txt", dir=self.tmp_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self._text)
+        return path
+
+    def release(self, path):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"[!] 删除临时 cookie 文件失败: {e}")
+
+
+# 全局单例
+cookie_cache = CookieCache()
@@ -1,13 +1,20 @@
 import os
 import random
 import sys
-import pyautogui
 import asyncio
 import time
-import configparser
 import re
-from playwright.async_api import TimeoutError
-from utils.notifier import notify_wecom_group
+try:
+    # 只导入异常类型，避免启动时加载完整的 playwright.async_api
+    from playwright._impl._errors import TimeoutError
+except ImportError:
+    from playwright.async_api import TimeoutError
+from utils.notifier import send_alert
+from utils.video_history import VideoHistory
+from utils.metrics import Histogram
+from utils.freshness_tracker import freshness_tracker
+from utils.config_loader import get_config
+from utils.executors import run_blocking, DISK
 
 WECOM_WEBHOOK = "https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key=9283fa7c-0e99-4c89-85e2-2908c7285804"
 
@@ -17,54 +24,57 @@ def get_base_dir():
     else:
         return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-#抖音队列与 worker 
-MAX_CONCURRENT_UPLOADS = 1
-UPLOAD_QUEUE_MAXSIZE = 4
+#抖音上传任务处理（队列、并发槽位与 worker 按账号划分，见 utils/account_pool.py）
 
-upload_semaphore = None
-upload_queue = None
+# 已发布作品记录（平台返回的作品ID），用于重试去重
+upload_history = VideoHistory()
 
-def init_globals():
-    global upload_semaphore, upload_queue
-    if upload_semaphore is None:
-        upload_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
-    if upload_queue is None:
-        upload_queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_MAXSIZE)
+# 创作者中心发布作品接口（create / create_v2），以其响应判定发布结果
+CREATE_POST_API_PATTERN = re.compile(r"/web/api/media/aweme/create(?:_v\d+)?/?(?:\?|$)")
+PUBLISH_RESPONSE_TIMEOUT = 60_000
+UPLOAD_SECONDS = Histogram("ysd_upload_seconds", "抖音上传耗时", ["result"])
 
-def get_queue():
-    return upload_queue
+# 创作者中心地址，基准测试时可指向本地模拟站点（见 benchmarks/fake_creator_center.py）
+CREATOR_BASE_URL = "https://creator.douyin.com"
+MANAGE_PATH = "/creator-micro/content/manage"
+UPLOAD_PATH = "/creator-micro/content/upload"
 
-async def worker(uploader, log_handler):
-    while True:
-        try:
-            task = await upload_queue.get()
-            async with upload_semaphore:
-                await process_upload_task(uploader, task, log_handler)
-            upload_queue.task_done()
-        except Exception as e:
-            log_handler(f"[!] Douyin upload_worker异常: {type(e).__name__} | {str(e).splitlines()[0]}")
-
-async def process_upload_task(uploader, task, log_handler):
+async def process_upload_task(uploader, task, log_handler, controller=None):
+    """上传单个任务，返回 True/False 表示上传结果，已发布过而跳过时返回 None"""
     video_id = task['video_id']
     channel_id = task['channel_id']
     path = task['path']
     platform = task.get('platform', 'douyin')
+    if video_id:
+        published_item = upload_history.get_published_item(platform, video_id)
+        if published_item:
+            log_handler(f"[-] 视频 {video_id} 已发布过（作品ID: {published_item}），跳过重复上传")
+            freshness_tracker.finish(video_id, "duplicate")
+            return None
     try:
+        upload_start = time.perf_counter()
+        freshness_tracker.mark(video_id, "upload_start")
         success = await uploader.upload_video(path, task=task)
+        upload_elapsed = time.perf_counter() - upload_start
+        UPLOAD_SECONDS.labels("ok" if success else "failed").observe(upload_elapsed)
+        if controller is not None:
+            controller.record(success, upload_elapsed)
         if success:
-            if should_wait_preview(task):  # 长视频
-                log_handler(f"[✓] 抖音上传成功，保留本地文件: {path}")
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    log_handler(f"[!] 删除长视频文件失败: {type(e).__name__} | {str(e).splitlines()[0]}")
-            else:
-                log_handler(f"[✓] 抖音上传成功，保留本地文件: {path}")
+            freshness_tracker.mark(video_id, "upload_published")
+            freshness_tracker.finish(video_id, "published")
+            if video_id:
+                await run_blocking(DISK, upload_history.mark_published, platform, video_id, task.get("item_id"))
+            # 本地文件由上传扇出在所有平台结束后统一释放（见 utils/fanout.py）
+            log_handler(f"[✓] 抖音上传成功: {path}")
         else:
+            freshness_tracker.finish(video_id, "upload_failed")
             log_handler(f"[!] 抖音上传失败，保留文件: {path}")
-            notify_wecom_group(f"[!]小包浆Vlog-抖音上传异常,视频最终上传失败，请尽快排查原因", WECOM_WEBHOOK)
+            send_alert(f"[!]小包浆Vlog-抖音上传异常,视频最终上传失败，请尽快排查原因", WECOM_WEBHOOK)
+        return success
     except Exception as e:
+        freshness_tracker.finish(video_id, "upload_failed")
         log_handler(f"[!] 抖音上传过程异常: {type(e).__name__} | {str(e).splitlines()[0]}")
+        return False
 
 def should_wait_preview(task):
     if not task:
@@ -77,26 +87,40 @@ def should_wait_preview(task):
     ]
     return task.get("channel_id") in target_channels
 
+def is_create_post_response(response):
+    return response.request.method == "POST" and CREATE_POST_API_PATTERN.search(response.url) is not None
+
+async def parse_create_post_response(response):
+    """解析发布接口响应，返回 (是否成功, 作品ID, 失败原因)"""
+    try:
+        data = await response.json()
+    except Exception as e:
+        return False, None, f"HTTP {response.status}，响应无法解析: {type(e).__name__}"
+    status_code = data.get("status_code", -1)
+    if response.ok and status_code == 0:
+        item_id = data.get("item_id") or data.get("aweme_id") or (data.get("aweme") or {}).get("aweme_id")
+        return True, str(item_id) if item_id else None, ""
+    reason = data.get("status_msg") or data.get("message") or f"status_code={status_code}"
+    return False, None, f"HTTP {response.status}，{reason}"
+
 #抖音队列与 worker结束 ======================================================
 
 class DouyinUploader:
-    def __init__(self, page, log_handler=None):
+    def __init__(self, page, log_handler=None, base_url=CREATOR_BASE_URL):
         self.page = page
         self.timeout = 60_000
+        self.base_url = base_url.rstrip("/")
+        self.manage_url = self.base_url + MANAGE_PATH
+        self.upload_url = self.base_url + UPLOAD_PATH
+        self.manage_url_pattern = re.compile(re.escape(self.manage_url) + ".*")
+        self.upload_url_pattern = re.compile(re.escape(self.upload_url) + ".*")
         self.log_handler = log_handler or (lambda msg: None)
-        self.tags = self.load_tags_from_config()
         self._has_checked_login = False
 
-    def load_tags_from_config(self):
-        tags = []
-        base_dir = get_base_dir()
-        config_path = os.path.join(base_dir, "config", "channels.ini")
-        config = configparser.ConfigParser(allow_no_value=True)
-        if os.path.exists(config_path):
-            config.read(config_path, encoding="utf-8")
-            if "tags" in config:
-                tags = [k.strip() for k in config["tags"].keys() if k.strip()]
-        return tags
+    @property
+    def tags(self):
+        """标签取自配置快照，修改 channels.ini 后无需重启"""
+        return list(get_config().tags)
 
     def log(self, msg):
         if self.log_handler:
@@ -138,8 +162,8 @@ class DouyinUploader:
             self.log("[!] 检测到抖音页面已关闭")
             raise Exception("页面未初始化")
         # 只在不是主页时跳主页
-        if not self.page.url.startswith("https://creator.douyin.com/creator-micro/content/manage"):
-            await self.page.goto("https://creator.douyin.com/creator-micro/content/manage", timeout=self.timeout)
+        if not self.page.url.startswith(self.manage_url):
+            await self.page.goto(self.manage_url, timeout=self.timeout)
         try:
             self.log("[✓] 正在检测抖音创作者中心主页登录状态...")
             await asyncio.sleep(1.0)
@@ -178,19 +202,18 @@ class DouyinUploader:
             filter_btn = vertical_cover_area.locator('.filter-k_CjvJ:has-text("选择封面")')
             await filter_btn.wait_for(timeout=10_000)
             await filter_btn.click()
-            await asyncio.sleep(1.0)
 
-            # 点击弹窗“完成”按钮
+            # 点击弹窗“完成”按钮：等待按钮出现与弹窗关闭，代替固定等待
             done_btn = self.page.locator('button.semi-button.secondary-zU1YLr span.semi-button-content', has_text="完成")
             parent_btn = done_btn.locator('..')
             await parent_btn.wait_for(timeout=10_000)
             await parent_btn.click()
-            await asyncio.sleep(1.0)
+            await parent_btn.wait_for(state="hidden", timeout=10_000)
 
             #self.log("[✓] 抖音封面设置成功（竖封面），使用默认首帧作为封面。")
         except Exception as e:
             self.log(f"[!] 抖音设置封面失败: {type(e).__name__} | {str(e).splitlines()[0]}")
-            notify_wecom_group(f"[!]小包浆Vlog-抖音设置封面失败，请尽快查看原因", WECOM_WEBHOOK)
+            send_alert(f"[!]小包浆Vlog-抖音设置封面失败，请尽快查看原因", WECOM_WEBHOOK)
             
     async def fill_tags(self):
         if not self.tags or len(self.tags) < 2:
@@ -208,8 +231,32 @@ class DouyinUploader:
             #self.log(f"[✓] 已自动填写抖音标签：{' '.join('#'+t for t in selected_tags)}")
         except Exception as e:
             self.log(f"[!] 自动填写抖音标签时失败: {type(e).__name__} | {str(e).splitlines()[0]}")
-            notify_wecom_group(f"[!]小包浆Vlog-自动填写抖音标签时失败，请尽快处理", WECOM_WEBHOOK)
+            send_alert(f"[!]小包浆Vlog-自动填写抖音标签时失败，请尽快处理", WECOM_WEBHOOK)
     
+    async def publish_and_confirm(self, publish_button, task=None):
+        """点击发布，并以发布接口的响应判定结果；未捕获到接口响应时回退为检测页面跳转"""
+        try:
+            async with self.page.expect_response(is_create_post_response, timeout=PUBLISH_RESPONSE_TIMEOUT) as response_info:
+                await publish_button.click()
+            response = await response_info.value
+        except TimeoutError:
+            self.log("[!] 未捕获到抖音发布接口响应，回退为检测页面跳转")
+            try:
+                await self.page.wait_for_url(self.manage_url_pattern, timeout=5_000)
+                return True
+            except TimeoutError:
+                self.log("[!] 未检测到跳转抖音发布管理页，上传可能失败")
+                return False
+
+        success, item_id, reason = await parse_create_post_response(response)
+        if not success:
+            self.log(f"[!] 抖音发布被拒绝: {reason}")
+            return False
+        if task is not None:
+            task["item_id"] = item_id
+        self.log(f"[✓] 抖音发布成功，作品ID: {item_id}")
+        return True
+
     async def upload_video(self, video_path, task=None):
         try:
             self.log(f"[✓] 正在上传视频到抖音...")
@@ -217,7 +264,7 @@ class DouyinUploader:
             # 检查登录
             if await self.is_login_page():
                 self.log("[!] 抖音当前未登录，请先扫码登录后再上传")
-                notify_wecom_group(f"[!]小包浆Vlog-抖音当前未登录，请尽快处理", WECOM_WEBHOOK)
+                send_alert(f"[!]小包浆Vlog-抖音当前未登录，请尽快处理", WECOM_WEBHOOK)
                 return False
 
             try:
@@ -227,9 +274,9 @@ class DouyinUploader:
                 #self.log("[✓] 已点击抖音高清发布按钮")
             except Exception as e:
                 self.log(f"[!] 未找到或无法点击抖音“高清发布”按钮，降级为直接跳转: {type(e).__name__} | {str(e).splitlines()[0]}")
-                await self.page.goto('https://creator.douyin.com/creator-micro/content/upload', timeout=self.timeout)
+                await self.page.goto(self.upload_url, timeout=self.timeout)
 
-            await self.page.wait_for_url(re.compile(r"https://creator\.douyin\.com/creator-micro/content/upload.*"), timeout=15_000)
+            await self.page.wait_for_url(self.upload_url_pattern, timeout=15_000)
 
             if not os.path.exists(video_path):
                 self.log(f"[!] 抖音视频文件不存在: {video_path}")
@@ -270,23 +317,14 @@ class DouyinUploader:
             )
             try:
                 await publish_button.wait_for(timeout=self.timeout)
-                await publish_button.click()
-                #self.log("[✓] 点击抖音发布按钮")
-
-                try:
-                    await self.page.wait_for_url(re.compile(r"https://creator\.douyin\.com/creator-micro/content/manage.*"), timeout=60_000)
-                    #self.log("[✓] 页面跳转到抖音发布管理页，发布成功")
-                    return True
-                except TimeoutError:
-                    self.log("[!] 未检测到跳转抖音发布管理页，上传可能失败")
-                    return False
-
             except TimeoutError:
                 self.log("[!] 抖音发布按钮未加载")
                 return False
 
+            return await self.publish_and_confirm(publish_button, task)
+
         except Exception as e:
             msg = f"[!] 抖音上传异常: {type(e).__name__} | {str(e).splitlines()[0]}"
             self.log(msg)
-            notify_wecom_group(f"[!]小包浆Vlog-抖音上传异常,视频最终上传失败，请尽快排查原因", WECOM_WEBHOOK)
+            send_alert(f"[!]小包浆Vlog-抖音上传异常,视频最终上传失败，请尽快排查原因", WECOM_WEBHOOK)
             return False
\ No newline at end of file
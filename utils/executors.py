@@ -0,0 +1,139 @@
+"""
+按用途隔离的线程池
+原先所有阻塞操作都通过 run_in_executor(None, ...) 共用事件循环的默认线程池，长时间的 yt-dlp 下载
+会让状态文件写入、配置重载排队。这里按用途划分独立、固定大小的线程池：
+- download：yt-dlp 下载/元数据提取、浏览器 Cookie 导出
+- ingest：回调路径上的任务总线操作（去重、频道限流、写入任务），拆分部署时每个回调都会用到，
+  与其它磁盘读写隔离，避免回调排在时效记录、租约写入之后
+- disk：其余状态文件与 SQLite 读写（last_processed_time、租约、任务领取/确认、时效记录、上传记录、配额）
+- config：配置重载、文件监听启动及启动时的初始化
+每个线程池导出排队等待时长、正在执行与排队中的任务数。大小由 [SETTINGS] 中的 *_executor_workers 配置，
+线程池在首次使用时按当时的配置创建；热更新改变大小时换用新大小的线程池，旧线程池执行完已提交的任务后退出。
+"""
+import time
+import asyncio
+import logging
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import Gauge, Histogram
+
+DOWNLOAD = "download"
+INGEST = "ingest"
+DISK = "disk"
+CONFIG = "config"
+DEFAULT_SIZES = {DOWNLOAD: 8, INGEST: 4, DISK: 2, CONFIG: 2}
+
+EXECUTOR_WAIT = Histogram(
+    "ysd_executor_wait_seconds", "任务在线程池中排队等待的时长", ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120),
+)
+EXECUTOR_ACTIVE = Gauge("ysd_executor_active", "线程池中正在执行的任务数", ["pool"])
+EXECUTOR_QUEUED = Gauge("ysd_executor_queued", "线程池中排队等待的任务数", ["pool"])
+EXECUTOR_SIZE = Gauge("ysd_executor_max_workers", "线程池大小", ["pool"])
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    def __init__(self, name, max_workers, previous=None):
+        """:param previous: 被替换的同名线程池，累计的完成数与最长等待时长延续下来"""
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"ysd_{name}")
+        self.name = name
+        self.max_workers = max_workers
+        self.active = 0
+        self.queued = 0
+        self.completed = previous.completed if previous is not None else 0
+        self.max_wait = previous.max_wait if previous is not None else 0.0
+        self._lock = threading.Lock()
+        EXECUTOR_ACTIVE.labels(name).set_function(lambda: self.active)
+        EXECUTOR_QUEUED.labels(name).set_function(lambda: self.queued)
+        EXECUTOR_SIZE.labels(name).set(max_workers)
+
+    def submit(self, fn, /, *args, **kwargs):
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+
+        def run():
+            wait = time.perf_counter() - enqueued_at
+            EXECUTOR_WAIT.labels(self.name).observe(wait)
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        future = super().submit(run)
+        # 尚未开始就被取消（shutdown(cancel_futures=True) 或调用方取消）的任务不会执行 run，在这里扣除排队数
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def state(self):
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "max_wait": round(self.max_wait, 3),
+        }
+
+
+_executors = {}
+_sizes = dict(DEFAULT_SIZES)
+_registry_lock = threading.Lock()
+
+
+def configure(cfg):
+    """
+    按配置快照设置线程池大小
+    已创建的线程池大小变化时，新任务改交给新建的线程池；旧线程池不再接收任务，执行完已提交的任务后线程退出
+    """
+    retired = []
+    with _registry_lock:
+        for name in DEFAULT_SIZES:
+            size = getattr(cfg, f"{name}_executor_workers", DEFAULT_SIZES[name])
+            _sizes[name] = size
+            executor = _executors.get(name)
+            if executor is not None and executor.max_workers != size:
+                _executors[name] = InstrumentedExecutor(name, size, previous=executor)
+                retired.append(executor)
+                logging.info(f"[✓] {name} 线程池大小已调整: {executor.max_workers} -> {size}")
+    for executor in retired:
+        executor.shutdown(wait=False)
+
+
+def get_executor(name):
+    executor = _executors.get(name)
+    if executor is None:
+        with _registry_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = InstrumentedExecutor(name, _sizes.get(name, 1))
+    return executor
+
+
+async def run_blocking(name, func, *args, **kwargs):
+    """在指定用途的线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    if kwargs:
+        func = partial(func, **kwargs)
+    return await loop.run_in_executor(get_executor(name), func, *args)
+
+
+def executors_state():
+    return {name: executor.state() for name, executor in _executors.items()}
+
+
+def shutdown(wait=False):
+    for executor in list(_executors.values()):
+        executor.shutdown(wait=wait, cancel_futures=True)
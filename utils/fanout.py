@@ -0,0 +1,178 @@
+"""
+下载一次、分发到多个平台的上传扇出
+同一个已下载文件同时放入各平台（upload_platforms）的上传队列，按平台做引用计数，
+所有平台都结束（成功、失败或未能入队）后才统一释放文件，多平台分发只需下载一次。
+"""
+import os
+import asyncio
+import logging
+
+from utils.concurrency import ResizableSemaphore, ResizableQueue
+from utils.config_loader import get_config
+from utils.douyin_uploader import upload_history, should_wait_preview
+from utils.executors import run_blocking, DISK
+from utils.metrics import Gauge
+
+NOT_QUEUED = "not_queued"  # 平台未能入队（队列满或无可用账号）时的结果标记
+
+
+class SharedFile:
+    """在多个平台上传之间共享的本地文件，pending 为尚未结束的平台（即引用计数）"""
+    def __init__(self, path, platforms, on_release, task=None):
+        self.path = path
+        self.pending = set(platforms)
+        self.results = {}
+        self.task = task or {}
+        self._on_release = on_release
+
+    @property
+    def refcount(self):
+        return len(self.pending)
+
+    def done(self, platform, success):
+        """某个平台结束，重复调用忽略；引用计数归零时触发释放"""
+        if platform not in self.pending:
+            return
+        self.pending.discard(platform)
+        self.results[platform] = success
+        if not self.pending:
+            self._on_release(self)
+
+
+class PlatformLane:
+    """
+    非账号池平台（如快手）的上传通道：单独的队列、并发槽位和 worker
+    uploader_getter 返回带 upload_video(path, task=) 接口的上传器，未就绪时返回 None
+    """
+    def __init__(self, platform, uploader_getter, log_handler=print, maxsize=None, concurrency=1):
+        self.platform = platform
+        self.uploader_getter = uploader_getter
+        self.log_handler = log_handler
+        self.queue = ResizableQueue(maxsize=maxsize or get_config().upload_queue_maxsize)
+        self.semaphore = ResizableSemaphore(concurrency)
+        self.tasks = []
+
+    async def submit(self, task):
+        await self.queue.put(task)
+
+    def start(self, workers=1):
+        for index in range(workers):
+            self.tasks.append(asyncio.create_task(self._worker(), name=f"{self.platform}_worker_{index}"))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+
+    async def _worker(self):
+        while True:
+            task = await self.queue.get()
+            success = False
+            try:
+                video_id = task.get("video_id")
+                published_item = upload_history.get_published_item(self.platform, video_id) if video_id else None
+                if published_item:
+                    self.log_handler(f"[-] 视频 {video_id} 已发布到{self.platform}（作品ID: {published_item}），跳过重复上传")
+                    success = None
+                    continue
+                uploader = self.uploader_getter()
+                if uploader is None:
+                    self.log_handler(f"[!] {self.platform} 上传器未就绪，跳过: {task.get('path')}")
+                    continue
+                async with self.semaphore:
+                    success = await uploader.upload_video(task["path"], task=task)
+                if success:
+                    if video_id:
+                        await run_blocking(DISK, upload_history.mark_published, self.platform, video_id, task.get("item_id"))
+                    self.log_handler(f"[✓] {self.platform} 上传成功: {task['path']}")
+                else:
+                    self.log_handler(f"[!] {self.platform} 上传失败，保留文件: {task['path']}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log_handler(f"[!] {self.platform} upload_worker异常: {type(e).__name__} | {str(e).splitlines()[0]}")
+            finally:
+                upload_fanout.complete(task, success)
+                self.queue.task_done()
+
+
+class UploadFanout:
+    def __init__(self):
+        self._targets = {}   # 平台 -> async submit(task)
+        self.active = {}     # 文件路径 -> SharedFile
+        self.log_handler = print
+        self.on_release = None   # on_release(task)：所有平台上传结束后调用（worker 进程用于 ack 任务总线）
+        self._warned = set()
+
+    def register(self, platform, submit):
+        """注册平台的入队函数；submit 队列满时等待，无法接收时抛出 asyncio.QueueFull"""
+        self._targets[platform] = submit
+        self._warned.discard(platform)
+
+    def unregister(self, platform):
+        self._targets.pop(platform, None)
+
+    def platforms(self, requested=None):
+        """本次要分发的平台：requested 或配置中的 upload_platforms，忽略未注册的平台"""
+        platforms = []
+        for platform in requested or get_config().upload_platforms:
+            if platform in self._targets:
+                platforms.append(platform)
+            elif platform not in self._warned:
+                self._warned.add(platform)
+                self.log_handler(f"[!] 上传平台 {platform} 未启用或上传器不可用，已跳过")
+        return platforms
+
+    async def dispatch(self, task, platforms=None):
+        """
+        把同一文件同时放入各平台上传队列，返回成功入队的平台列表
+        全部未能入队时不释放文件，由调用方按队列溢出处理
+        """
+        platforms = self.platforms(platforms)
+        if not platforms:
+            return []
+        shared = SharedFile(task["path"], platforms, self._release, task)
+        self.active[shared.path] = shared
+
+        async def submit(platform):
+            try:
+                await self._targets[platform](dict(task, platform=platform, fanout=shared))
+                return platform
+            except asyncio.QueueFull as e:
+                self.log_handler(f"[!] {platform} 上传队列无法接收任务（{str(e) or '队列已满'}）: {shared.path}")
+                shared.done(platform, NOT_QUEUED)
+                return None
+
+        queued = [p for p in await asyncio.gather(*(submit(p) for p in platforms)) if p]
+        return queued
+
+    def complete(self, task, success):
+        """平台上传结束后调用，释放该平台对文件的引用"""
+        shared = task.get("fanout")
+        if isinstance(shared, SharedFile):
+            shared.done(task.get("platform"), success)
+
+    def _release(self, shared):
+        self.active.pop(shared.path, None)
+        if self.on_release is not None:
+            self.on_release(shared.task)
+        queued = {p: r for p, r in shared.results.items() if r is not NOT_QUEUED}
+        if not queued:
+            return
+        if all(queued.values()) and should_wait_preview(shared.task):
+            # 长视频所有平台都发布成功后删除本地文件
+            try:
+                os.remove(shared.path)
+                self.log_handler(f"[✓] 所有平台上传完成，已删除本地文件: {shared.path}")
+            except Exception as e:
+                logging.warning(f"[!] 删除本地文件失败: {type(e).__name__} | {e}")
+        elif len(shared.results) > 1:
+            self.log_handler(f"[✓] 所有平台上传结束（{', '.join(f'{p}={r}' for p, r in shared.results.items())}），保留本地文件: {shared.path}")
+
+
+# 全局单例
+upload_fanout = UploadFanout()
+
+FANOUT_ACTIVE_FILES = Gauge("ysd_fanout_active_files", "等待各平台上传结束的共享文件数")
+FANOUT_ACTIVE_FILES.set_function(lambda: len(upload_fanout.active))
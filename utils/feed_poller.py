@@ -0,0 +1,256 @@
+"""
+RSS 轮询兜底
+frp 隧道或 Hub 丢失推送时，PubSubHubbub 是唯一来源会导致漏视频。这里轮询已订阅频道的
+videos.xml?channel_id= 订阅源作为兜底：
+- 条件请求（ETag / If-Modified-Since），无更新时只有一个 304
+- 每个频道按自身发布频率决定轮询间隔（最近发布间隔的中位数 / POLLS_PER_UPLOAD_GAP，限制在上下限内）
+- 并发受限；新条目交给与 youtube_callback 相同的去重/限流/入队路径，并统计只由轮询发现的视频数
+  （Hub 随后又推送了的视频不计入）
+- 进程启动后首次轮询某频道时，已超出时效窗口的条目无法判断重启前是否处理过，直接跳过
+"""
+import time
+import heapq
+import random
+import asyncio
+import logging
+import statistics
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import aiohttp
+
+from utils.freshness_tracker import parse_timestamp
+from utils.metrics import Counter
+
+FEED_URL = "https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+FEED_NS = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015'
+}
+POLLS_PER_UPLOAD_GAP = 12       # 一个发布间隔内轮询的次数
+MAX_ENTRY_AGE_SECONDS = 3600    # 只处理该时长内发布的条目，避免启动时把订阅源里的旧视频当新视频
+REQUEST_TIMEOUT_SECONDS = 15
+MAX_SLEEP_SECONDS = 30          # 最长休眠，用于感知频道列表变化
+SEEN_CAPACITY = 20000
+POLLER_ONLY_CAPACITY = 1000     # 记录最近由轮询先发现的视频，Hub 随后推送时从 poller_only 中扣除
+
+# 视频的发现来源；poller_stale 为轮询发现时已超出时效窗口（未处理，仅推送C端），Hub 推送可覆盖
+SOURCE_HUB = "hub"
+SOURCE_POLLER = "poller"
+SOURCE_POLLER_STALE = "poller_stale"
+
+FEED_POLLS = Counter("ysd_feed_polls_total", "RSS 轮询请求数", ["result"])
+
+
+class SeenVideos:
+    """单进程模式下的已发现视频记录（有界，按插入顺序淘汰）"""
+    def __init__(self, capacity=SEEN_CAPACITY):
+        self.capacity = capacity
+        self._sources = OrderedDict()
+
+    def mark(self, video_id, source, replace=()):
+        """首次发现返回 None，否则返回最先发现它的来源；原来源在 replace 中时改记为本次来源"""
+        previous = self._sources.get(video_id)
+        if previous is not None:
+            if previous in replace:
+                self._sources[video_id] = source
+            return previous
+        self._sources[video_id] = source
+        while len(self._sources) > self.capacity:
+            self._sources.popitem(last=False)
+        return None
+
+
+def parse_feed(xml_text):
+    """解析 videos.xml，返回 [{video_id, channel_id, published, updated}]"""
+    root = ET.fromstring(xml_text)
+    entries = []
+    for entry in root.findall("atom:entry", FEED_NS):
+        video_id = entry.findtext("yt:videoId", namespaces=FEED_NS)
+        if not video_id:
+            continue
+        entries.append({
+            "video_id": video_id,
+            "channel_id": entry.findtext("yt:channelId", namespaces=FEED_NS),
+            "published": entry.findtext("atom:published", namespaces=FEED_NS),
+            "updated": entry.findtext("atom:updated", namespaces=FEED_NS),
+        })
+    return entries
+
+
+class FeedPoller:
+    def __init__(self, channels_loader, ingest, config_loader, log_handler=print):
+        """
+        :param channels_loader: 返回当前已订阅频道列表的函数
+        :param ingest: async ingest(entry, source) -> 处理结果，与 hub 回调共用的入队路径
+        :param config_loader: 返回当前配置快照（轮询间隔上下限、并发数）
+        """
+        self.channels_loader = channels_loader
+        self.ingest = ingest
+        self.config_loader = config_loader
+        self.log_handler = log_handler
+        self._heap = []            # (next_poll_at, channel_id)
+        self._state = {}           # channel_id -> 轮询状态
+        self._inflight = set()
+        self._poller_only = OrderedDict()  # video_id -> channel_id
+        self.stats = {"polls": 0, "not_modified": 0, "errors": 0, "poller_only": 0}
+
+    def _channel_state(self, channel_id):
+        state = self._state.get(channel_id)
+        if state is None:
+            state = self._state[channel_id] = {
+                "etag": None,
+                "last_modified": None,
+                "interval": self.config_loader().feed_poll_max_interval,
+                "next_poll_at": 0.0,
+                "failures": 0,
+                "last_status": None,
+                "poller_only": 0,
+                "primed": False,
+            }
+        return state
+
+    def compute_interval(self, entries, cfg):
+        """按频道最近的发布间隔中位数估算轮询间隔，发布越频繁轮询越密"""
+        published = sorted(filter(None, (parse_timestamp(e["published"]) for e in entries)), reverse=True)
+        gaps = [a - b for a, b in zip(published, published[1:]) if a > b]
+        if not gaps:
+            return cfg.feed_poll_max_interval
+        interval = statistics.median(gaps) / POLLS_PER_UPLOAD_GAP
+        return max(cfg.feed_poll_min_interval, min(cfg.feed_poll_max_interval, interval))
+
+    def _schedule(self, channel_id, delay):
+        state = self._channel_state(channel_id)
+        # ±10% 抖动，避免同频率的频道集中在同一时刻
+        state["next_poll_at"] = time.time() + delay * random.uniform(0.9, 1.1)
+        heapq.heappush(self._heap, (state["next_poll_at"], channel_id))
+
+    def _sync_channels(self):
+        channels = set(self.channels_loader())
+        for channel_id in channels:
+            if channel_id not in self._state:
+                # 新频道在一个最小间隔内随机错开首次轮询
+                self._channel_state(channel_id)
+                self._schedule(channel_id, random.uniform(0, self.config_loader().feed_poll_min_interval))
+        for channel_id in list(self._state):
+            if channel_id not in channels:
+                del self._state[channel_id]
+        return channels
+
+    async def poll_channel(self, session, channel_id):
+        cfg = self.config_loader()
+        state = self._channel_state(channel_id)
+        headers = {}
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+        self.stats["polls"] += 1
+        try:
+            async with session.get(FEED_URL.format(channel_id=channel_id), headers=headers) as response:
+                state["last_status"] = response.status
+                if response.status == 304:
+                    self.stats["not_modified"] += 1
+                    FEED_POLLS.labels("not_modified").inc()
+                    state["failures"] = 0
+                    return state["interval"]
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                text = await response.text()
+                state["etag"] = response.headers.get("ETag")
+                state["last_modified"] = response.headers.get("Last-Modified")
+            entries = parse_feed(text)
+        except Exception as e:
+            self.stats["errors"] += 1
+            FEED_POLLS.labels("error").inc()
+            state["failures"] += 1
+            logging.warning(f"[!] RSS 轮询频道 {channel_id} 失败: {type(e).__name__} | {e}")
+            return min(cfg.feed_poll_max_interval, state["interval"] * 2 ** state["failures"])
+
+        FEED_POLLS.labels("ok").inc()
+        state["failures"] = 0
+        state["interval"] = self.compute_interval(entries, cfg)
+        now = time.time()
+        stale_before = now - cfg.freshness_window_minutes * 60
+        for entry in entries:
+            published_ts = parse_timestamp(entry["published"])
+            if published_ts is None or now - published_ts > MAX_ENTRY_AGE_SECONDS:
+                continue
+            if not state["primed"] and published_ts < stale_before:
+                continue
+            entry["channel_id"] = entry["channel_id"] or channel_id
+            result = await self.ingest(entry, SOURCE_POLLER)
+            if result != "duplicate":
+                self._record_poller_only(entry["video_id"], channel_id)
+                self.log_handler(f"[!] RSS 轮询发现 Hub 未推送的视频: {entry['video_id']}（频道 {channel_id}，处理结果 {result}）")
+        state["primed"] = True
+        return state["interval"]
+
+    def _record_poller_only(self, video_id, channel_id):
+        self.stats["poller_only"] += 1
+        self._channel_state(channel_id)["poller_only"] += 1
+        self._poller_only[video_id] = channel_id
+        while len(self._poller_only) > POLLER_ONLY_CAPACITY:
+            self._poller_only.popitem(last=False)
+
+    def hub_delivered(self, video_id):
+        """Hub 推送了轮询先发现的视频：该视频不再算作只由轮询发现"""
+        channel_id = self._poller_only.pop(video_id, None)
+        if channel_id is None:
+            return
+        self.stats["poller_only"] -= 1
+        state = self._state.get(channel_id)
+        if state is not None and state["poller_only"] > 0:
+            state["poller_only"] -= 1
+
+    async def _poll_and_reschedule(self, session, semaphore, channel_id):
+        try:
+            async with semaphore:
+                delay = await self.poll_channel(session, channel_id)
+        except Exception as e:
+            logging.error(f"[!] RSS 轮询频道 {channel_id} 异常: {e}")
+            delay = self.config_loader().feed_poll_max_interval
+        finally:
+            self._inflight.discard(channel_id)
+        if channel_id in self._state:
+            self._schedule(channel_id, delay)
+
+    async def run(self):
+        cfg = self.config_loader()
+        semaphore = asyncio.Semaphore(cfg.feed_poll_concurrency)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+        self.log_handler(f"[✓] RSS 轮询兜底已启动（并发 {cfg.feed_poll_concurrency}）")
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                channels = self._sync_channels()
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    _, channel_id = heapq.heappop(self._heap)
+                    state = self._state.get(channel_id)
+                    # 频道已移除、已在轮询中或为过期的堆条目时跳过
+                    if channel_id not in channels or state is None or channel_id in self._inflight:
+                        continue
+                    if state["next_poll_at"] > now:
+                        continue
+                    self._inflight.add(channel_id)
+                    asyncio.create_task(self._poll_and_reschedule(session, semaphore, channel_id))
+                sleep_for = MAX_SLEEP_SECONDS
+                if self._heap:
+                    sleep_for = max(0.5, min(sleep_for, self._heap[0][0] - time.time()))
+                await asyncio.sleep(sleep_for)
+
+    def state(self):
+        now = time.time()
+        return {
+            **self.stats,
+            "channels": {
+                channel_id: {
+                    "interval": round(s["interval"]),
+                    "next_poll_in": max(0, round(s["next_poll_at"] - now)),
+                    "last_status": s["last_status"],
+                    "failures": s["failures"],
+                    "poller_only": s["poller_only"],
+                }
+                for channel_id, s in self._state.items()
+            },
+        }
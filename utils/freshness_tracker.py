@@ -0,0 +1,233 @@
+"""
+单视频端到端时效追踪
+记录从 YouTube 发布到抖音发布的各阶段时间点，落盘为 JSONL，并按频道做滚动窗口分位数统计
+- 文件只保留 RETENTION_SECONDS 内完成的记录：启动加载时及之后每 COMPACT_INTERVAL_SECONDS 按内存中的记录重写
+- 历史记录不在导入时读取，由服务启动后在线程池中调用 load()
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from utils.executors import get_executor, DISK
+
+FRESHNESS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'freshness_timeline.jsonl'))
+
+# 阶段顺序：
+# published        YouTube 发布时间（Atom <published>，拿到 Data API 结果后以其为准）
+# hub_delivered    Hub 推送的 feed 更新时间（Atom <updated>）
+# callback_received 本服务收到回调
+# download_start / download_end
+# upload_start / upload_published
+STAGES = (
+    "published",
+    "hub_delivered",
+    "callback_received",
+    "download_start",
+    "download_end",
+    "upload_start",
+    "upload_published",
+)
+
+# 统计的分段耗时：(名称, 起点阶段, 终点阶段)
+SEGMENTS = (
+    ("publish_to_hub", "published", "hub_delivered"),
+    ("hub_to_callback", "hub_delivered", "callback_received"),
+    ("download_queue_wait", "callback_received", "download_start"),
+    ("download", "download_start", "download_end"),
+    ("upload_queue_wait", "download_end", "upload_start"),
+    ("upload", "upload_start", "upload_published"),
+    ("total", "published", "upload_published"),
+)
+
+DEFAULT_WINDOWS = (3600, 24 * 3600)
+RETENTION_SECONDS = 7 * 24 * 3600
+OPEN_RECORD_TTL = 24 * 3600
+COMPACT_INTERVAL_SECONDS = 3600
+PERCENTILES = (50, 90, 99)
+
+
+def parse_timestamp(value):
+    """ISO8601 字符串 / datetime / epoch 统一转为 epoch 秒，无法解析返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _percentile(sorted_values, pct):
+    """最近秩法分位数"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class FreshnessTracker:
+    def __init__(self, timeline_file=FRESHNESS_FILE):
+        self.timeline_file = timeline_file
+        self._open = {}          # video_id -> 进行中的记录
+        self._completed = deque()  # 已完成记录（按完成时间升序）
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()  # 串行化追加与重写
+        self._loaded = False
+        self._compacted_at = 0.0
+
+    def load(self):
+        """读取保留期内的历史记录并重写文件，丢弃过期记录（阻塞，在线程池中调用）"""
+        cutoff = time.time() - RETENTION_SECONDS
+        loaded = []
+        with self._file_lock:
+            try:
+                if os.path.exists(self.timeline_file):
+                    with open(self.timeline_file, "r", encoding="utf-8") as f:
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            record = json.loads(line)
+                            if record.get("finished_at", 0) >= cutoff:
+                                loaded.append(record)
+            except Exception as e:
+                logging.error(f"[!] 加载 freshness_timeline.jsonl 失败: {e}")
+                return
+            with self._lock:
+                # 加载前已完成的记录已经追加到文件末尾，按 video_id + 完成时间去重后合并
+                known = {(r.get("video_id"), r.get("finished_at")) for r in self._completed}
+                merged = [r for r in loaded if (r.get("video_id"), r.get("finished_at")) not in known]
+                merged.extend(self._completed)
+                merged.sort(key=lambda r: r.get("finished_at", 0))
+                self._completed = deque(merged)
+                self._loaded = True
+            self._compact_locked()
+
+    def start(self, video_id, channel_id, **stages):
+        """开始追踪一个视频，stages 为已知的阶段时间点"""
+        if not video_id:
+            return
+        now = time.time()
+        record = {"video_id": video_id, "channel_id": channel_id, "started_at": now, "stages": {}}
+        with self._lock:
+            self._open[video_id] = record
+            self._expire_locked(now)
+        for stage, value in stages.items():
+            self.mark(video_id, stage, value)
+
+    def mark(self, video_id, stage, value=None):
+        """记录阶段时间点，value 缺省为当前时间"""
+        ts = time.time() if value is None else parse_timestamp(value)
+        if ts is None:
+            return
+        with self._lock:
+            record = self._open.get(video_id)
+            if record is not None:
+                record["stages"][stage] = ts
+
+    def finish(self, video_id, outcome):
+        """结束追踪并落盘，outcome 如 published / skipped / download_failed"""
+        with self._lock:
+            record = self._open.pop(video_id, None)
+            if record is None:
+                return
+            record["outcome"] = outcome
+            record["finished_at"] = time.time()
+            self._completed.append(record)
+            self._expire_locked(record["finished_at"])
+        try:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(get_executor(DISK), self._append, record)
+        except RuntimeError:
+            self._append(record)
+
+    def _expire_locked(self, now):
+        cutoff = now - RETENTION_SECONDS
+        while self._completed and self._completed[0].get("finished_at", 0) < cutoff:
+            self._completed.popleft()
+        # 一直没有结束的记录（包括从未收到回调的）按收到回调或开始追踪的时间过期
+        open_cutoff = now - OPEN_RECORD_TTL
+        stale = [vid for vid, r in self._open.items()
+                 if r["stages"].get("callback_received", r.get("started_at", now)) < open_cutoff]
+        for vid in stale:
+            self._open.pop(vid, None)
+
+    def _append(self, record):
+        with self._file_lock:
+            try:
+                os.makedirs(os.path.dirname(self.timeline_file), exist_ok=True)
+                with open(self.timeline_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except Exception as e:
+                logging.error(f"[!] 保存 freshness_timeline.jsonl 失败: {e}")
+            # 未加载历史前内存中的记录不完整，不能用来重写文件
+            if self._loaded and time.time() - self._compacted_at >= COMPACT_INTERVAL_SECONDS:
+                self._compact_locked()
+
+    def _compact_locked(self):
+        """用内存中保留期内的记录重写文件（调用方持有 _file_lock）"""
+        with self._lock:
+            self._expire_locked(time.time())
+            records = list(self._completed)
+        tmp_file = self.timeline_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.timeline_file), exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_file, self.timeline_file)
+        except Exception as e:
+            logging.error(f"[!] 重写 freshness_timeline.jsonl 失败: {e}")
+        self._compacted_at = time.time()
+
+    def stats(self, window_seconds, channel_id=None):
+        """
+        统计最近 window_seconds 内完成的视频各分段耗时分位数（秒）
+        返回 {channel_id: {segment: {count, p50, p90, p99}}}，"_all" 为全部频道汇总
+        """
+        cutoff = time.time() - window_seconds
+        with self._lock:
+            records = [r for r in self._completed if r.get("finished_at", 0) >= cutoff]
+        samples = {}
+        for record in records:
+            cid = record.get("channel_id")
+            if channel_id is not None and cid != channel_id:
+                continue
+            stages = record.get("stages", {})
+            for name, start, end in SEGMENTS:
+                if start in stages and end in stages:
+                    value = stages[end] - stages[start]
+                    samples.setdefault(cid, {}).setdefault(name, []).append(value)
+                    samples.setdefault("_all", {}).setdefault(name, []).append(value)
+        result = {}
+        for cid, segments in samples.items():
+            result[cid] = {}
+            for name, values in segments.items():
+                values.sort()
+                summary = {"count": len(values)}
+                for pct in PERCENTILES:
+                    summary[f"p{pct}"] = round(_percentile(values, pct), 3)
+                result[cid][name] = summary
+        return result
+
+    def outcome_counts(self, window_seconds):
+        cutoff = time.time() - window_seconds
+        counts = {}
+        with self._lock:
+            for record in self._completed:
+                if record.get("finished_at", 0) >= cutoff:
+                    counts[record.get("outcome")] = counts.get(record.get("outcome"), 0) + 1
+        return counts
+
+
+# 全局单例
+freshness_tracker = FreshnessTracker()
@@ -0,0 +1,127 @@
+"""
+订阅租约记录
+Hub 在订阅验证 GET 中带上 hub.lease_seconds，这里按频道记录验证时间与过期时间，供续订调度使用
+拆分部署时多个 ingest 进程与主进程都会写入同一文件，读-改-写在跨进程文件锁内完成，避免互相覆盖
+"""
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+
+LEASE_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'subscription_leases.json'))
+
+
+@contextmanager
+def interprocess_lock(lock_path):
+    """跨进程互斥锁（POSIX 使用 flock，Windows 使用 msvcrt.locking）"""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def channel_id_from_topic(topic):
+    """从 hub.topic（videos.xml?channel_id=xxx）中解析频道ID"""
+    if not topic:
+        return None
+    values = parse_qs(urlparse(topic).query).get("channel_id")
+    return values[0] if values else None
+
+
+class LeaseStore:
+    def __init__(self, lease_file=LEASE_FILE):
+        self.lease_file = lease_file
+        self.lock_file = lease_file + ".lock"
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._leases = self._load()
+
+    def _file_mtime(self):
+        try:
+            return os.path.getmtime(self.lease_file)
+        except OSError:
+            return None
+
+    def _reload_if_changed_locked(self):
+        # 拆分部署时验证回调由 ingest 进程写入，这里按文件修改时间感知其它进程的更新
+        if self._file_mtime() != self._mtime:
+            self._leases = self._load()
+
+    def _load(self):
+        try:
+            self._mtime = self._file_mtime()
+            if os.path.exists(self.lease_file):
+                with open(self.lease_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"[!] 加载 subscription_leases.json 失败: {e}")
+        return {}
+
+    def _save_locked(self):
+        try:
+            os.makedirs(os.path.dirname(self.lease_file), exist_ok=True)
+            tmp_path = self.lease_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._leases, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.lease_file)
+            self._mtime = self._file_mtime()
+        except Exception as e:
+            logging.error(f"[!] 保存 subscription_leases.json 失败: {e}")
+
+    @contextmanager
+    def _update(self):
+        """读-改-写：持有进程内锁与跨进程文件锁，重新读取文件后修改并保存"""
+        with self._lock, interprocess_lock(self.lock_file):
+            # 修改时间精度有限，写入前总是重新读取
+            self._leases = self._load()
+            yield self._leases
+            self._save_locked()
+
+    def record_verification(self, channel_id, mode, lease_seconds=None):
+        """记录 Hub 的订阅验证：subscribe 时更新租约，unsubscribe 时删除"""
+        now = time.time()
+        with self._update() as leases:
+            if mode == "unsubscribe":
+                leases.pop(channel_id, None)
+            else:
+                record = leases.setdefault(channel_id, {})
+                record["verified_at"] = now
+                if lease_seconds:
+                    record["lease_seconds"] = int(lease_seconds)
+                    record["expires_at"] = now + int(lease_seconds)
+
+    def record_request(self, channel_id):
+        """记录已向 Hub 发起订阅/续订请求（等待验证回调）"""
+        with self._update() as leases:
+            leases.setdefault(channel_id, {})["requested_at"] = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            self._reload_if_changed_locked()
+            return {cid: dict(record) for cid, record in self._leases.items()}
+
+
+# 全局单例
+lease_store = LeaseStore()
@@ -0,0 +1,177 @@
+"""
+事件循环延迟监控与阻塞检测
+回调、上传、下载调度都跑在同一个事件循环里，任何同步阻塞（文件写入、同步 HTTP 请求等）都会让所有回调一起变慢。
+- 采样：协程每 SAMPLE_INTERVAL_SECONDS 醒来一次，实际醒来时间与预期的差值即为事件循环延迟，
+  最近 LAG_WINDOW 个样本用于计算分位数，同时导出为直方图指标
+- 阻塞检测：独立的看门狗线程检查采样协程的心跳，超过 loop_block_threshold_ms 未按时醒来说明事件循环被阻塞，
+  此时通过 sys._current_frames 抓取事件循环线程的调用栈（即正在阻塞的位置），阻塞结束后按位置汇总次数与时长
+/debug/loop 返回延迟分位数与阻塞最严重的位置。
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+
+from utils.config_loader import get_config
+from utils.metrics import Counter, Histogram
+
+SAMPLE_INTERVAL_SECONDS = 0.1
+WATCHDOG_INTERVAL_SECONDS = 0.02
+LAG_WINDOW = 3000                # 约最近 5 分钟的样本
+STACK_DEPTH = 15                 # 记录的调用栈帧数（从阻塞位置往外）
+LOG_INTERVAL_SECONDS = 60        # 同一位置的阻塞告警日志最小间隔
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+LOOP_LAG = Histogram(
+    "ysd_event_loop_lag_seconds", "事件循环延迟（采样协程实际醒来时间与预期之差）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_BLOCKED = Counter("ysd_event_loop_blocked_total", "事件循环阻塞超过阈值的次数")
+
+
+def _is_project_frame(filename):
+    filename = os.path.abspath(filename)
+    return (
+        filename.startswith(PROJECT_ROOT)
+        and "site-packages" not in filename
+        and filename != os.path.abspath(__file__)
+    )
+
+
+def _culprit(stack):
+    """阻塞位置：调用栈中最内层的项目代码帧，找不到时取最内层帧"""
+    for frame in reversed(stack):
+        if _is_project_frame(frame.filename):
+            break
+    else:
+        frame = stack[-1]
+    return f"{os.path.relpath(frame.filename, PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+
+
+def _format_stack(stack):
+    return [
+        f"{os.path.relpath(f.filename, PROJECT_ROOT) if _is_project_frame(f.filename) else f.filename}:{f.lineno} "
+        f"in {f.name}: {f.line or ''}".rstrip()
+        for f in stack[-STACK_DEPTH:]
+    ]
+
+
+class LoopMonitor:
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS, window=LAG_WINDOW):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.blocked = 0
+        self.offenders = {}      # 阻塞位置 -> 次数、累计与最长时长、最近一次的调用栈
+        self._loop_thread_id = None
+        self._beat = None
+        self._stall = None       # 看门狗抓取到、尚未结束的阻塞
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    @property
+    def threshold(self):
+        return get_config().loop_block_threshold_ms / 1000
+
+    def _overdue(self):
+        """采样协程超出预期醒来时间的时长"""
+        if self._beat is None:
+            return 0.0
+        return time.monotonic() - self._beat - self.interval
+
+    def _watch(self):
+        while not self._stop.wait(WATCHDOG_INTERVAL_SECONDS):
+            if self._stall is not None or self._overdue() < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            del frame
+            with self._lock:
+                if self._stall is None:
+                    self._stall = stack
+
+    def _record_stall(self, lag):
+        with self._lock:
+            stack, self._stall = self._stall, None
+        # 看门狗按心跳判断，可能在采样协程刚醒来、尚未更新心跳时误抓；以实测延迟为准
+        if stack is None or lag < self.threshold:
+            return
+        location = _culprit(stack)
+        self.blocked += 1
+        LOOP_BLOCKED.inc()
+        entry = self.offenders.get(location)
+        if entry is None:
+            entry = self.offenders[location] = {"count": 0, "total": 0.0, "max": 0.0, "logged_at": 0.0}
+        entry["count"] += 1
+        entry["total"] += lag
+        entry["max"] = max(entry["max"], lag)
+        entry["last_at"] = time.time()
+        entry["stack"] = _format_stack(stack)
+        if entry["last_at"] - entry["logged_at"] >= LOG_INTERVAL_SECONDS:
+            entry["logged_at"] = entry["last_at"]
+            logging.warning(f"[!] 事件循环阻塞 {lag * 1000:.0f}ms: {location}")
+
+    async def run(self):
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="ysd_loop_watchdog", daemon=True)
+        self._watchdog.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                lag = max(0.0, now - expected)
+                self._beat = now
+                self.samples.append(lag)
+                LOOP_LAG.observe(lag)
+                self._record_stall(lag)
+        finally:
+            self._stop.set()
+            self._beat = None
+
+    def state(self, top=10):
+        lags = sorted(self.samples)
+
+        def percentile(p):
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 1) if lags else None
+
+        overdue = self._overdue()
+        worst = sorted(self.offenders.items(), key=lambda item: item[1]["max"], reverse=True)[:top]
+        return {
+            "running": self._beat is not None,
+            "threshold_ms": get_config().loop_block_threshold_ms,
+            "samples": len(lags),
+            "lag_ms": {
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+                "max": round(lags[-1] * 1000, 1) if lags else None,
+            },
+            "blocked": self.blocked,
+            # 通常为 None；接口本身在事件循环中执行，只有卡住的循环恢复后才能返回
+            "blocking_now_ms": round(overdue * 1000) if overdue >= self.threshold else None,
+            "worst_offenders": [
+                {
+                    "location": location,
+                    "count": entry["count"],
+                    "max_ms": round(entry["max"] * 1000, 1),
+                    "avg_ms": round(entry["total"] / entry["count"] * 1000, 1),
+                    "last_at": entry["last_at"],
+                    "stack": entry["stack"],
+                }
+                for location, entry in worst
+            ],
+        }
+
+
+# 全局单例
+loop_monitor = LoopMonitor()
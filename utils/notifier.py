@@ -1,21 +1,174 @@
+import asyncio
+import logging
+import threading
+import time
 import requests
 
+from utils.metrics import Counter
+from utils.rate_limiter import AsyncTokenBucket
+
+# 企业微信群机器人限制：每个机器人每分钟最多 20 条
+WECOM_MESSAGES_PER_MINUTE = 20
+ALERT_QUEUE_MAXSIZE = 100
+ALERT_COALESCE_SECONDS = 300
+
+ALERTS_DROPPED = Counter("ysd_alerts_dropped_total", "告警队列溢出丢弃数")
+ALERTS_COALESCED = Counter("ysd_alerts_coalesced_total", "被合并的重复告警数")
+
+def _build_payload(msg):
+    return {
+        "msgtype": "text",
+        "text": {
+            "content": msg
+        }
+    }
+
 def notify_wecom_group(msg, webhook_url):
     """
-    企业微信群聊机器人告警推送
+    企业微信群聊机器人告警推送（同步阻塞，协程中请使用 send_alert）
     :param msg: 告警内容字符串
     :param webhook_url: 企业微信群机器人 webhook 地址
     :return: True/False
     """
-    payload = {
-        "msgtype": "text",
-        "text": {
-            "content": msg
-        }
-    }
     try:
-        resp = requests.post(webhook_url, json=payload, timeout=5)
+        resp = requests.post(webhook_url, json=_build_payload(msg), timeout=5)
         return resp.status_code == 200 and resp.json().get("errcode", -1) == 0
     except Exception as e:
         print(f"[!] 企业微信推送失败: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+class AlertDispatcher:
+    """
+    异步告警分发器
+    - submit 永不阻塞调用方：告警进入有界队列，由后台任务发送
+    - 同一 webhook 的相同内容在 coalesce_seconds 内只发送一次，期间重复次数合并到下一条
+    - 按企业微信机器人配额做令牌桶限流
+    """
+    def __init__(self, maxsize=ALERT_QUEUE_MAXSIZE, coalesce_seconds=ALERT_COALESCE_SECONDS,
+                 per_minute=WECOM_MESSAGES_PER_MINUTE):
+        self.maxsize = maxsize
+        self.coalesce_seconds = coalesce_seconds
+        self.per_minute = per_minute
+        self._loop = None
+        self._queue = None
+        self._sender_task = None
+        self._buckets = {}     # webhook_url -> AsyncTokenBucket
+        self._pending = {}     # (webhook_url, msg) -> 待发送时累计的次数
+        self._last_sent = {}   # (webhook_url, msg) -> 上次发送时间
+        self._deferred = set() # 处于合并窗口内、已安排延后发送的 key
+        self.dropped = 0
+        self.coalesced = 0
+
+    def submit(self, msg, webhook_url):
+        """提交一条告警，可在事件循环内或任意线程中调用"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            if self._loop is None or self._loop.is_closed():
+                self._bind(loop)
+            if loop is self._loop:
+                self._submit((webhook_url, msg))
+                return
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._submit, (webhook_url, msg))
+            return
+        # 没有可用的事件循环（例如独立脚本），退化为后台线程同步发送
+        threading.Thread(target=notify_wecom_group, args=(msg, webhook_url), daemon=True).start()
+
+    def _bind(self, loop):
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._sender_task = loop.create_task(self._sender(), name="alert_dispatcher")
+
+    def _submit(self, key):
+        if key in self._pending:
+            self._pending[key] += 1
+            self.coalesced += 1
+            ALERTS_COALESCED.inc()
+            return
+        if key in self._deferred:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self.coalesced += 1
+            ALERTS_COALESCED.inc()
+            return
+        last_sent = self._last_sent.get(key)
+        now = time.monotonic()
+        if last_sent is not None and now - last_sent < self.coalesce_seconds:
+            # 合并窗口内的重复告警：窗口结束后汇总发送一次
+            self._deferred.add(key)
+            self._pending[key] = 1
+            self.coalesced += 1
+            ALERTS_COALESCED.inc()
+            self._loop.call_later(self.coalesce_seconds - (now - last_sent), self._enqueue_deferred, key)
+            return
+        self._pending[key] = 1
+        self._enqueue(key)
+
+    def _enqueue_deferred(self, key):
+        self._deferred.discard(key)
+        self._enqueue(key)
+
+    def _enqueue(self, key):
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            self._pending.pop(key, None)
+            self.dropped += 1
+            ALERTS_DROPPED.inc()
+            logging.warning(f"[!] 告警队列已满（容量: {self.maxsize}），丢弃告警: {key[1]}")
+
+    def _get_bucket(self, webhook_url):
+        bucket = self._buckets.get(webhook_url)
+        if bucket is None:
+            bucket = AsyncTokenBucket(rate=self.per_minute / 60, capacity=self.per_minute)
+            self._buckets[webhook_url] = bucket
+        return bucket
+
+    async def _sender(self):
+        import aiohttp
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            while True:
+                key = await self._queue.get()
+                webhook_url, msg = key
+                try:
+                    await self._get_bucket(webhook_url).acquire()
+                    count = self._pending.pop(key, 1)
+                    content = msg if count <= 1 else f"{msg}（{self.coalesce_seconds // 60}分钟内重复 {count} 次）"
+                    self._last_sent[key] = time.monotonic()
+                    async with session.post(webhook_url, json=_build_payload(content)) as resp:
+                        data = await resp.json(content_type=None)
+                        if resp.status != 200 or data.get("errcode", -1) != 0:
+                            logging.warning(f"[!] 企业微信推送失败: {resp.status} - {data}")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"[!] 企业微信推送失败: {e}")
+                finally:
+                    self._queue.task_done()
+
+    async def close(self, timeout=5):
+        """关闭前尽量发完队列中的告警"""
+        if self._sender_task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"[!] 告警队列未在 {timeout} 秒内发完，剩余 {self._queue.qsize()} 条已放弃")
+        self._sender_task.cancel()
+        try:
+            await self._sender_task
+        except asyncio.CancelledError:
+            pass
+        self._sender_task = None
+        self._loop = None
+
+
+# 全局单例
+alert_dispatcher = AlertDispatcher()
+
+def send_alert(msg, webhook_url):
+    """非阻塞告警推送（推荐在业务代码中使用）"""
+    alert_dispatcher.submit(msg, webhook_url)
@@ -0,0 +1,198 @@
+"""
+下载代理池
+[proxies] 中配置的每个代理都会被定期主动探测（请求 generate_204），并结合实际下载结果打分：
+- 延迟：探测耗时的 EWMA
+- 错误率：探测与下载失败的 EWMA，连续失败的代理进入冷却（时长指数增长），探测成功后恢复
+- 负载：正在使用该代理的下载数
+每次下载尝试选择得分最好的代理，重试时换用未尝试过的代理。各代理的吞吐（字节/秒 EWMA）导出为指标，
+吞吐明显低于长期水平时记录告警日志，便于在下载开始失败前发现出口变差。
+未配置代理时 pick 返回 None，下载直连。
+"""
+import time
+import asyncio
+import logging
+
+import aiohttp
+
+from utils.config_loader import get_config
+from utils.metrics import Counter, Gauge
+
+PROBE_URL = "https://www.youtube.com/generate_204"
+PROBE_INTERVAL_SECONDS = 60
+PROBE_TIMEOUT_SECONDS = 10
+EWMA_ALPHA = 0.3
+SLOW_EWMA_ALPHA = 0.05           # 长期吞吐基线
+ERROR_WEIGHT = 4                 # 错误率对得分的放大系数
+FAILURE_THRESHOLD = 3            # 连续失败次数达到后进入冷却
+BASE_COOLDOWN_SECONDS = 120
+MAX_COOLDOWN_SECONDS = 1800
+DEGRADED_RATIO = 0.5             # 短期吞吐低于长期基线的该比例时告警
+
+PROXY_REQUESTS = Counter("ysd_proxy_requests_total", "代理探测与下载结果", ["proxy", "kind", "result"])
+PROXY_LATENCY = Gauge("ysd_proxy_latency_seconds", "代理探测延迟 EWMA", ["proxy"])
+PROXY_ERROR_RATE = Gauge("ysd_proxy_error_rate", "代理错误率 EWMA", ["proxy"])
+PROXY_THROUGHPUT = Gauge("ysd_proxy_throughput_bytes", "代理下载吞吐 EWMA（字节/秒）", ["proxy"])
+PROXY_HEALTHY = Gauge("ysd_proxy_healthy", "代理是否可用（1 可用，0 冷却中）", ["proxy"])
+
+
+class ProxyState:
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.latency = None
+        self.error_rate = 0.0
+        self.throughput = None
+        self.throughput_baseline = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.last_probe = None
+        self.degraded = False
+        PROXY_LATENCY.labels(name).set_function(lambda: self.latency or 0)
+        PROXY_ERROR_RATE.labels(name).set_function(lambda: self.error_rate)
+        PROXY_THROUGHPUT.labels(name).set_function(lambda: self.throughput or 0)
+        PROXY_HEALTHY.labels(name).set_function(lambda: 1 if self.healthy else 0)
+
+    def unregister(self):
+        """代理从配置中移除：删除其指标，避免继续导出过期的值"""
+        for gauge in (PROXY_LATENCY, PROXY_ERROR_RATE, PROXY_THROUGHPUT, PROXY_HEALTHY):
+            gauge.remove(self.name)
+
+    @property
+    def healthy(self):
+        return time.time() >= self.cooldown_until
+
+    def score(self, default_latency):
+        """越小越好"""
+        latency = self.latency if self.latency is not None else default_latency
+        return latency * (1 + ERROR_WEIGHT * self.error_rate) * (1 + self.in_flight)
+
+    def record(self, success, latency=None):
+        self.error_rate += EWMA_ALPHA * ((0.0 if success else 1.0) - self.error_rate)
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+        if success:
+            if self.consecutive_failures >= FAILURE_THRESHOLD:
+                logging.info(f"[✓] 代理 {self.name} 已恢复")
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= FAILURE_THRESHOLD:
+            cooldown = min(MAX_COOLDOWN_SECONDS, BASE_COOLDOWN_SECONDS * 2 ** (self.consecutive_failures - FAILURE_THRESHOLD))
+            self.cooldown_until = time.time() + cooldown
+            logging.warning(f"[!] 代理 {self.name} 连续失败 {self.consecutive_failures} 次，冷却 {cooldown:.0f}s")
+
+    def record_throughput(self, bytes_per_second):
+        if self.throughput is None:
+            self.throughput = self.throughput_baseline = bytes_per_second
+            return
+        self.throughput += EWMA_ALPHA * (bytes_per_second - self.throughput)
+        self.throughput_baseline += SLOW_EWMA_ALPHA * (bytes_per_second - self.throughput_baseline)
+        degraded = self.throughput < self.throughput_baseline * DEGRADED_RATIO
+        if degraded and not self.degraded:
+            logging.warning(
+                f"[!] 代理 {self.name} 吞吐下降: {self.throughput / 1024 / 1024:.2f}MB/s，"
+                f"长期水平 {self.throughput_baseline / 1024 / 1024:.2f}MB/s"
+            )
+        self.degraded = degraded
+
+    def state(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "throughput_mb_s": round(self.throughput / 1024 / 1024, 2) if self.throughput else None,
+            "degraded": self.degraded,
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.consecutive_failures,
+            "cooldown_in": max(0, round(self.cooldown_until - time.time())),
+        }
+
+
+class ProxyPool:
+    def __init__(self):
+        self.proxies = {}
+        self._configured = {}
+
+    def _sync(self):
+        """按当前配置快照增删代理（配置未变化时无开销）"""
+        configured = dict(get_config().proxies)
+        if configured == self._configured:
+            return
+        for name in list(self.proxies):
+            if configured.get(name) != self.proxies[name].url:
+                self.proxies.pop(name).unregister()
+        for name, url in configured.items():
+            if name not in self.proxies:
+                self.proxies[name] = ProxyState(name, url)
+        self._configured = configured
+        if configured:
+            logging.info(f"[✓] 下载代理池: {', '.join(configured)}")
+
+    def pick(self, exclude=()):
+        """选择得分最好的代理；全部冷却时仍选最好的一个（比直接失败好），未配置代理返回 None"""
+        self._sync()
+        candidates = [p for p in self.proxies.values() if p.name not in exclude] or list(self.proxies.values())
+        if not candidates:
+            return None
+        healthy = [p for p in candidates if p.healthy] or candidates
+        known = sorted(p.latency for p in self.proxies.values() if p.latency is not None)
+        default_latency = known[len(known) // 2] if known else PROBE_TIMEOUT_SECONDS / 2
+        return min(healthy, key=lambda p: p.score(default_latency))
+
+    def acquire(self, proxy):
+        if proxy is not None:
+            proxy.in_flight += 1
+
+    def release(self, proxy, success, elapsed=None, size=0):
+        """下载尝试结束；success 为 None 时表示失败与代理无关（如视频已删除），不计入错误率"""
+        if proxy is None:
+            return
+        proxy.in_flight = max(0, proxy.in_flight - 1)
+        if success is None:
+            return
+        proxy.record(success)
+        PROXY_REQUESTS.labels(proxy.name, "download", "ok" if success else "failed").inc()
+        if success and elapsed and size:
+            proxy.record_throughput(size / elapsed)
+
+    async def _probe(self, proxy):
+        timeout = aiohttp.ClientTimeout(total=PROBE_TIMEOUT_SECONDS)
+        start = time.perf_counter()
+        try:
+            if proxy.url.startswith("socks"):
+                # socks 代理需要 aiohttp_socks
+                from aiohttp_socks import ProxyConnector
+                async with aiohttp.ClientSession(connector=ProxyConnector.from_url(proxy.url), timeout=timeout) as session:
+                    async with session.get(PROBE_URL) as response:
+                        ok = response.status in (200, 204)
+            else:
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.get(PROBE_URL, proxy=proxy.url) as response:
+                        ok = response.status in (200, 204)
+        except ImportError:
+            # 无法主动探测，只依据下载结果打分
+            return
+        except Exception as e:
+            ok = False
+            logging.debug(f"代理 {proxy.name} 探测失败: {type(e).__name__} | {e}")
+        proxy.last_probe = time.time()
+        proxy.record(ok, time.perf_counter() - start if ok else None)
+        PROXY_REQUESTS.labels(proxy.name, "probe", "ok" if ok else "failed").inc()
+
+    async def run(self):
+        while True:
+            self._sync()
+            if self.proxies:
+                await asyncio.gather(*(self._probe(p) for p in list(self.proxies.values())))
+            await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+    def state(self):
+        self._sync()
+        return {name: proxy.state() for name, proxy in self.proxies.items()}
+
+
+# 全局单例
+proxy_pool = ProxyPool()
@@ -0,0 +1,176 @@
+"""
+YouTube Data API 配额管理
+按太平洋时间自然日（配额在太平洋时间 0 点重置）记录已消耗的配额单位，并按当日消耗速度预测耗尽时间。
+剩余配额低于 youtube_quota_reserve，或接口已返回 quotaExceeded 时，视频信息改由 yt-dlp 元数据提取 +
+Atom 通知中的发布时间获得，配额重置后自动恢复使用 API。
+计费口径：API 有响应的请求（含错误响应）计入消耗；quotaExceeded 拒绝与未到达 API 的请求（网络错误）不计。
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from utils.config_loader import get_config
+from utils.metrics import Counter, Gauge
+from utils.executors import get_executor, DISK
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # Windows 未安装 tzdata 时退化为固定 UTC-8（夏令时期间重置时间会早一小时）
+    PACIFIC = timezone(timedelta(hours=-8))
+
+QUOTA_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'youtube_quota.json'))
+VIDEOS_LIST_COST = 1  # videos.list 每次调用消耗 1 单位（与 part 数量无关）
+MIN_PROJECTION_WINDOW = 3600
+
+QUOTA_SPENT = Counter("ysd_youtube_quota_units_total", "已消耗的 YouTube Data API 配额单位")
+METADATA_LOOKUPS = Counter("ysd_video_metadata_lookups_total", "视频信息查询次数", ["source", "result"])
+
+
+def pacific_day(now=None):
+    return datetime.fromtimestamp(now or time.time(), PACIFIC).date().isoformat()
+
+
+def next_reset_timestamp(now=None):
+    local = datetime.fromtimestamp(now or time.time(), PACIFIC)
+    midnight = datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), tzinfo=PACIFIC)
+    return midnight.timestamp()
+
+
+class QuotaGovernor:
+    def __init__(self, quota_file=QUOTA_FILE):
+        self.quota_file = quota_file
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._warned_day = None
+        self._save_pending = False
+        self._state = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.quota_file):
+                with open(self.quota_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"[!] 加载 youtube_quota.json 失败: {e}")
+        return {}
+
+    def _save_locked(self):
+        """在 disk 线程池中写入状态文件；写入完成前的多次更新合并为一次写入"""
+        if self._save_pending:
+            return
+        self._save_pending = True
+        try:
+            get_executor(DISK).submit(self.flush)
+        except RuntimeError:
+            # 线程池已关闭（进程退出中）
+            self._save_pending = False
+
+    def flush(self):
+        # 在写锁内取快照，保证后写入的总是较新的状态
+        with self._write_lock:
+            with self._lock:
+                self._save_pending = False
+                state = dict(self._state)
+            try:
+                os.makedirs(os.path.dirname(self.quota_file), exist_ok=True)
+                tmp_path = self.quota_file + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.quota_file)
+            except Exception as e:
+                logging.error(f"[!] 保存 youtube_quota.json 失败: {e}")
+
+    def _today_locked(self, now=None):
+        """返回当日状态，跨过太平洋时间 0 点时重置"""
+        day = pacific_day(now)
+        if self._state.get("day") != day:
+            if self._state.get("day"):
+                logging.info(f"[✓] YouTube API 配额已重置（太平洋时间 {day}），昨日消耗 {self._state.get('spent', 0)} 单位")
+            self._state = {"day": day, "spent": 0, "exhausted": False}
+        return self._state
+
+    def remaining(self, now=None):
+        with self._lock:
+            state = self._today_locked(now)
+            return max(0, get_config().youtube_daily_quota - state["spent"])
+
+    def allow(self, cost=VIDEOS_LIST_COST, now=None):
+        """本次调用是否使用 API：已耗尽或扣除后低于保留额度时返回 False"""
+        cfg = get_config()
+        with self._lock:
+            state = self._today_locked(now)
+            if state["exhausted"]:
+                return False
+            return cfg.youtube_daily_quota - state["spent"] - cost >= cfg.youtube_quota_reserve
+
+    def spend(self, cost=VIDEOS_LIST_COST, now=None):
+        now = now or time.time()
+        with self._lock:
+            state = self._today_locked(now)
+            state["spent"] += cost
+            self._save_locked()
+        QUOTA_SPENT.inc(cost)
+        self._warn_if_projected_short(now)
+
+    def mark_exhausted(self, now=None):
+        """接口返回 quotaExceeded（可能有其它程序共用同一 Key），当日不再调用"""
+        with self._lock:
+            state = self._today_locked(now)
+            if not state["exhausted"]:
+                state["exhausted"] = True
+                self._save_locked()
+                logging.warning("[!] YouTube API 配额已耗尽，太平洋时间 0 点前改用 yt-dlp/Atom 获取视频信息")
+
+    def projected_exhaustion(self, now=None):
+        """按当日平均消耗速度预测的耗尽时间戳，无消耗或已耗尽时返回 None"""
+        now = now or time.time()
+        cfg = get_config()
+        with self._lock:
+            state = self._today_locked(now)
+            spent = state["spent"]
+            if state["exhausted"] or not spent:
+                return None
+        # 已消耗量随状态文件跨重启保留，速度按当日 0 点起计算；刚过 0 点时至少按 MIN_PROJECTION_WINDOW 计，避免少量调用就触发预警
+        day_start = next_reset_timestamp(now) - 86400
+        rate = spent / max(MIN_PROJECTION_WINDOW, now - day_start)
+        budget = max(0, cfg.youtube_daily_quota - cfg.youtube_quota_reserve - spent)
+        return now + budget / rate
+
+    def _warn_if_projected_short(self, now):
+        projected = self.projected_exhaustion(now)
+        day = pacific_day(now)
+        if projected is None or projected >= next_reset_timestamp(now) or self._warned_day == day:
+            return
+        self._warned_day = day
+        eta = datetime.fromtimestamp(projected).strftime("%H:%M")
+        logging.warning(f"[!] 按当前速度 YouTube API 配额预计在 {eta} 用到保留额度，之后改用 yt-dlp/Atom 获取视频信息")
+
+    def state(self, now=None):
+        now = now or time.time()
+        cfg = get_config()
+        projected = self.projected_exhaustion(now)
+        with self._lock:
+            state = dict(self._today_locked(now))
+        return {
+            "day": state["day"],
+            "daily_quota": cfg.youtube_daily_quota,
+            "reserve": cfg.youtube_quota_reserve,
+            "spent": state["spent"],
+            "remaining": max(0, cfg.youtube_daily_quota - state["spent"]),
+            "exhausted": state["exhausted"],
+            "using_api": self.allow(now=now),
+            "projected_exhaustion_in": round(projected - now) if projected else None,
+            "reset_in": round(next_reset_timestamp(now) - now),
+        }
+
+
+# 全局单例
+quota_governor = QuotaGovernor()
+
+QUOTA_REMAINING = Gauge("ysd_youtube_quota_remaining", "当日剩余的 YouTube Data API 配额单位")
+QUOTA_REMAINING.set_function(quota_governor.remaining)
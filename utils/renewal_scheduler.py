@@ -0,0 +1,147 @@
+"""
+按租约续订调度
+每个频道在自己的租约到期前续订（最小堆按续订时间排序），租约已过期的频道优先重新订阅
+"""
+import time
+import heapq
+import asyncio
+import logging
+import zlib
+
+from utils.lease_store import lease_store as default_lease_store
+from utils.subscription_engine import SubscriptionEngine
+
+RENEW_MARGIN_RATIO = 0.1        # 在租约剩余 10% 时续订
+MIN_RENEW_MARGIN = 3600         # 至少提前 1 小时
+SPREAD_RATIO = 0.05             # 按频道再提前 0~5% 租约时长，打散续订时间
+VERIFY_GRACE_SECONDS = 3600     # 发起请求后等待 Hub 验证回调的时间
+RETRY_DELAY_SECONDS = 300       # 续订失败后的重试间隔
+MAX_BATCH_SIZE = 50             # 单轮最多续订的频道数
+MAX_SLEEP_SECONDS = 60          # 最长休眠，用于感知新的验证/频道变化
+DEFAULT_LEASE_SECONDS = 72 * 3600  # Hub 验证未带 hub.lease_seconds 时按原来的 72 小时续订周期计算
+
+
+def lease_expiry(record):
+    """
+    返回 (到期时间, 租约时长)；从未验证过返回 (None, 0)
+    Hub 验证时未带租约的，按验证时间加默认租约估算，避免反复立即重新订阅
+    """
+    expires_at = record.get("expires_at")
+    if expires_at is not None:
+        return expires_at, record.get("lease_seconds", 0)
+    verified_at = record.get("verified_at")
+    if verified_at:
+        return verified_at + DEFAULT_LEASE_SECONDS, DEFAULT_LEASE_SECONDS
+    return None, 0
+
+
+class RenewalScheduler:
+    def __init__(self, callback_url, channels_loader, lease_store=None, on_batch_done=None):
+        """
+        :param channels_loader: 返回当前已订阅频道集合的函数
+        :param on_batch_done: 每轮续订结束后的回调（用于记录续订时间等）
+        """
+        self.callback_url = callback_url
+        self.channels_loader = channels_loader
+        self.lease_store = lease_store or default_lease_store
+        self.on_batch_done = on_batch_done
+        self.engine = SubscriptionEngine(callback_url)
+        self._heap = []          # (renew_at, channel_id)
+        self._scheduled = {}     # channel_id -> 当前有效的 renew_at（堆中其它条目视为过期）
+        self._retry_at = {}      # channel_id -> 失败后的重试时间
+        self.expired_channels = set()
+
+    def _spread(self, channel_id, lease_seconds):
+        # 按频道ID稳定打散，避免同一批订阅的频道同时续订
+        return (zlib.crc32(channel_id.encode()) % 1000) / 1000 * SPREAD_RATIO * lease_seconds
+
+    def compute_renew_at(self, channel_id, record, now):
+        retry_at = self._retry_at.get(channel_id)
+        if retry_at is not None:
+            return retry_at
+        record = record or {}
+        requested_at = record.get("requested_at", 0)
+        verified_at = record.get("verified_at", 0)
+        if requested_at > verified_at and now - requested_at < VERIFY_GRACE_SECONDS:
+            # 已发起续订，等待 Hub 验证回调
+            return requested_at + VERIFY_GRACE_SECONDS
+        expires_at, lease_seconds = lease_expiry(record)
+        if expires_at is None:
+            # 从未验证过，立即订阅以拿到租约
+            return 0
+        if expires_at <= now:
+            return expires_at
+        margin = max(MIN_RENEW_MARGIN, lease_seconds * RENEW_MARGIN_RATIO)
+        return expires_at - margin - self._spread(channel_id, lease_seconds)
+
+    def refresh(self, now=None):
+        """根据最新的租约记录和频道列表更新堆"""
+        now = now or time.time()
+        channels = set(self.channels_loader())
+        leases = self.lease_store.snapshot()
+        for channel_id in list(self._scheduled):
+            if channel_id not in channels:
+                self._scheduled.pop(channel_id)
+                self._retry_at.pop(channel_id, None)
+        expired = set()
+        for channel_id in channels:
+            record = leases.get(channel_id)
+            expires_at, _ = lease_expiry(record or {})
+            if expires_at is not None and expires_at <= now:
+                expired.add(channel_id)
+            renew_at = self.compute_renew_at(channel_id, record, now)
+            if self._scheduled.get(channel_id) != renew_at:
+                self._scheduled[channel_id] = renew_at
+                heapq.heappush(self._heap, (renew_at, channel_id))
+        for channel_id in expired - self.expired_channels:
+            logging.warning(f"[!] 频道 {channel_id} 订阅租约已过期未续订，将优先重新订阅")
+        self.expired_channels = expired
+
+    def pop_due(self, now):
+        """弹出已到期的频道，租约已过期的排在最前"""
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < MAX_BATCH_SIZE:
+            renew_at, channel_id = heapq.heappop(self._heap)
+            if self._scheduled.get(channel_id) != renew_at:
+                continue
+            self._scheduled.pop(channel_id)
+            due.append(channel_id)
+        due.sort(key=lambda cid: cid not in self.expired_channels)
+        return due
+
+    def next_wakeup(self, now):
+        while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return MAX_SLEEP_SECONDS
+        return max(0, min(MAX_SLEEP_SECONDS, self._heap[0][0] - now))
+
+    async def renew(self, channel_ids):
+        results = await self.engine.run([("subscribe", cid) for cid in channel_ids], label="自动续订")
+        now = time.time()
+        renew_count = 0
+        for (_, channel_id), (success, _) in results.items():
+            if success:
+                renew_count += 1
+                self._retry_at.pop(channel_id, None)
+                self.lease_store.record_request(channel_id)
+            else:
+                self._retry_at[channel_id] = now + RETRY_DELAY_SECONDS
+        logging.info(f"[✓] 本轮共续订了 {renew_count}/{len(channel_ids)} 个频道。")
+        if self.on_batch_done:
+            self.on_batch_done()
+
+    async def run(self):
+        logging.info("[✓] 按租约续订调度已启动")
+        while True:
+            try:
+                now = time.time()
+                self.refresh(now)
+                due = self.pop_due(now)
+                if due:
+                    await self.renew(due)
+                    continue
+                await asyncio.sleep(self.next_wakeup(time.time()))
+            except Exception as e:
+                logging.exception(f"自动续订调度异常: {e}")
+                await asyncio.sleep(60)
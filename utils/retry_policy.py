@@ -0,0 +1,166 @@
+"""
+下载错误分类、退避与按站点熔断
+yt-dlp 的错误按信息分为三类，分别处理：
+- permanent：私享/已删除/地区限制/会员专享等，重试无意义，立即放弃，不计入代理与熔断统计
+- throttled：429、机器人验证等限流，较长的指数退避
+- transient：网络抖动、超时等，较短的指数退避
+退避时长均加入随机抖动（等值抖动：一半固定 + 一半随机），避免多个下载同时重试。
+每个站点（YouTube/TikTok/Instagram）一个熔断器：连续失败达到阈值后打开，期间该站点的下载直接失败；
+冷却结束后放行一个探测下载（半开），成功则关闭，失败则以加倍的冷却时间重新打开。
+"""
+import time
+import random
+import logging
+
+from utils.metrics import Counter, Gauge
+
+PERMANENT = "permanent"
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+
+# YouTube 限流时返回 "Video unavailable. This content isn't available, try again later"，
+# 含永久性错误的字样，需先于 PERMANENT_MARKERS 判断
+RETRY_LATER_MARKERS = ("try again later",)
+PERMANENT_MARKERS = (
+    "private video", "video unavailable", "this video is not available", "has been removed",
+    "no longer available", "account associated with this video has been terminated",
+    "not available in your country", "not made this video available in your country", "geo restrict",
+    "copyright", "members-only", "join this channel", "confirm your age", "age-restricted",
+    "unsupported url", "premieres in", "this live event will begin", "http error 404", "post isn't available",
+)
+THROTTLED_MARKERS = (
+    "http error 429", "too many requests", "rate-limit", "rate limit", "not a bot", "http error 403",
+    "please wait a few minutes",
+)
+
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_BASE_OPEN_SECONDS = 120
+CIRCUIT_MAX_OPEN_SECONDS = 900
+
+DOWNLOAD_ERRORS = Counter("ysd_download_errors_total", "下载错误按站点与类型计数", ["site", "kind"])
+CIRCUIT_OPEN = Gauge("ysd_download_circuit_open", "站点下载熔断状态（1 打开，0 关闭/半开）", ["site"])
+
+
+def classify_error(error):
+    message = str(error).lower()
+    if any(marker in message for marker in RETRY_LATER_MARKERS):
+        return THROTTLED
+    if any(marker in message for marker in PERMANENT_MARKERS):
+        return PERMANENT
+    if any(marker in message for marker in THROTTLED_MARKERS):
+        return THROTTLED
+    return TRANSIENT
+
+
+def site_of(url):
+    url = (url or "").lower()
+    if "youtube.com" in url or "youtu.be" in url:
+        return "youtube"
+    if "tiktok.com" in url:
+        return "tiktok"
+    if "instagram.com" in url:
+        return "instagram"
+    return "other"
+
+
+class BackoffPolicy:
+    def __init__(self, max_attempts, base_delay=0.0, max_delay=0.0, factor=2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+
+    def delay(self, attempt):
+        """第 attempt 次（从 1 开始）失败后的等待时长"""
+        delay = min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+RETRY_POLICIES = {
+    PERMANENT: BackoffPolicy(max_attempts=1),
+    THROTTLED: BackoffPolicy(max_attempts=3, base_delay=30, max_delay=300),
+    TRANSIENT: BackoffPolicy(max_attempts=3, base_delay=5, max_delay=60),
+}
+
+
+class CircuitBreaker:
+    def __init__(self, site, threshold=CIRCUIT_FAILURE_THRESHOLD):
+        self.site = site
+        self.threshold = threshold
+        self.failures = 0
+        self.opened_at = None
+        self.open_seconds = CIRCUIT_BASE_OPEN_SECONDS
+        self.trips = 0
+        self._probing = False
+        CIRCUIT_OPEN.labels(site).set_function(lambda: 1 if self.state == "open" else 0)
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """是否允许发起下载；半开状态只放行一个探测下载"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logging.info(f"[✓] {self.site} 下载已恢复，熔断关闭")
+        self.failures = 0
+        self.opened_at = None
+        self.open_seconds = CIRCUIT_BASE_OPEN_SECONDS
+        self._probing = False
+
+    def record_failure(self):
+        """记录一次非永久性失败，返回本次是否导致熔断打开"""
+        self.failures += 1
+        if self.opened_at is not None:
+            # 半开探测失败：加倍冷却后重新打开
+            if self._probing:
+                self._probing = False
+                self.open_seconds = min(CIRCUIT_MAX_OPEN_SECONDS, self.open_seconds * 2)
+                self.opened_at = time.time()
+            return False
+        if self.failures >= self.threshold:
+            self.opened_at = time.time()
+            self.trips += 1
+            logging.warning(f"[!] {self.site} 连续下载失败 {self.failures} 次，熔断 {self.open_seconds}s，期间该站点下载直接失败")
+            return True
+        return False
+
+    def release_probe(self):
+        """探测下载因永久性错误结束（与站点状态无关）时归还探测名额"""
+        self._probing = False
+
+    def snapshot(self):
+        remaining = None
+        if self.state == "open":
+            remaining = max(0, round(self.opened_at + self.open_seconds - time.time()))
+        return {"state": self.state, "failures": self.failures, "trips": self.trips, "open_remaining": remaining}
+
+
+class CircuitBreakers:
+    def __init__(self):
+        self._breakers = {}
+
+    def get(self, site):
+        breaker = self._breakers.get(site)
+        if breaker is None:
+            breaker = self._breakers[site] = CircuitBreaker(site)
+        return breaker
+
+    def state(self):
+        return {site: breaker.snapshot() for site, breaker in self._breakers.items()}
+
+
+# 全局单例
+circuit_breakers = CircuitBreakers()
@@ -0,0 +1,80 @@
+"""
+并发订阅引擎
+有界并发 + 令牌桶限速访问 Hub，失败按指数退避（全抖动）重试，并定期输出进度
+"""
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+
+from subscribe import post_subscription
+from utils.rate_limiter import AsyncTokenBucket
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE_PER_SECOND = 2
+DEFAULT_BURST = 4
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 2
+DEFAULT_MAX_DELAY = 60
+PROGRESS_LOG_INTERVAL = 10
+
+
+class SubscriptionEngine:
+    def __init__(self, callback_url, concurrency=DEFAULT_CONCURRENCY, rate_per_second=DEFAULT_RATE_PER_SECOND,
+                 burst=DEFAULT_BURST, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, progress_interval=PROGRESS_LOG_INTERVAL):
+        self.callback_url = callback_url
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.progress_interval = progress_interval
+        self.bucket = AsyncTokenBucket(rate=rate_per_second, capacity=burst)
+
+    async def run(self, jobs, label="订阅同步"):
+        """
+        并发执行订阅任务
+        :param jobs: [(mode, channel_id), ...]，mode 为 subscribe / unsubscribe
+        :return: {(mode, channel_id): (success, msg)}
+        """
+        jobs = list(jobs)
+        results = {}
+        if not jobs:
+            return results
+        semaphore = asyncio.Semaphore(self.concurrency)
+        progress = {"done": 0, "ok": 0, "last_log": time.monotonic()}
+        started = time.monotonic()
+
+        async def run_job(mode, channel_id):
+            async with semaphore:
+                success, msg = await self._submit_with_retry(session, mode, channel_id)
+            results[(mode, channel_id)] = (success, msg)
+            logging.info(msg)
+            progress["done"] += 1
+            progress["ok"] += 1 if success else 0
+            now = time.monotonic()
+            if progress["done"] == len(jobs) or now - progress["last_log"] >= self.progress_interval:
+                progress["last_log"] = now
+                logging.info(
+                    f"[✓] {label}进度: {progress['done']}/{len(jobs)}，成功 {progress['ok']}，"
+                    f"失败 {progress['done'] - progress['ok']}，已用时 {now - started:.0f} 秒"
+                )
+
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+            await asyncio.gather(*(run_job(mode, cid) for mode, cid in jobs))
+        return results
+
+    async def _submit_with_retry(self, session, mode, channel_id):
+        msg = ""
+        for attempt in range(self.max_attempts):
+            await self.bucket.acquire()
+            try:
+                success, msg = await post_subscription(session, channel_id, self.callback_url, mode)
+                if success:
+                    return True, msg
+            except Exception as e:
+                msg = f"[!] 网络异常 ({mode}, 尝试 {attempt+1}/{self.max_attempts}): {e}"
+            if attempt < self.max_attempts - 1:
+                await asyncio.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+        return False, f"[!] {mode.upper()} 最终失败: {channel_id}（{msg}）"
@@ -0,0 +1,156 @@
+"""
+进程间任务总线（SQLite，WAL 模式）
+拆分部署时，无状态的 ingest 进程（可多 worker）把回调任务写入总线，
+由独占浏览器与下载的 worker 进程取出处理；频道限流状态也保存在这里，保证多进程间判断一致
+任务采用 claim/ack：claim 只标记领取时间，worker 处理结束（上传结束、丢弃或失败）后 ack 才删除；
+worker 崩溃时未 ack 的任务在重启时或领取超过 CLAIM_VISIBILITY_SECONDS 未续期后重新投递（至少一次投递，
+重复上传由上传记录去重）
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+TASK_BUS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'task_bus.db'))
+SEEN_RETENTION_SECONDS = 7 * 86400  # 已发现视频记录保留时长
+CLAIM_VISIBILITY_SECONDS = 600      # 已领取任务未续期超过该时长视为 worker 失联，重新投递
+
+
+class SQLiteTaskBus:
+    def __init__(self, db_path=TASK_BUS_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " claimed_at REAL)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        if "claimed_at" not in columns:
+            # 旧版本创建的总线
+            conn.execute("ALTER TABLE tasks ADD COLUMN claimed_at REAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS channel_gate ("
+            " channel_id TEXT PRIMARY KEY,"
+            " last_time REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_videos ("
+            " video_id TEXT PRIMARY KEY,"
+            " source TEXT NOT NULL,"
+            " seen_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        # sqlite3 连接不能跨线程共享，每个线程各自持有一个
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, task):
+        self._conn().execute(
+            "INSERT INTO tasks (payload, created_at) VALUES (?, ?)",
+            (json.dumps(task, ensure_ascii=False), time.time()),
+        )
+
+    def claim(self, limit=10, now=None, visibility=CLAIM_VISIBILITY_SECONDS):
+        """
+        领取最早的若干未领取（或领取已超时）任务，返回的任务带 bus_id，处理结束后需 ack(bus_id)
+        """
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, payload FROM tasks WHERE claimed_at IS NULL OR claimed_at < ? ORDER BY id LIMIT ?",
+                (now - visibility, limit),
+            ).fetchall()
+            conn.executemany("UPDATE tasks SET claimed_at = ? WHERE id = ?", [(now, task_id) for task_id, _ in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [dict(json.loads(payload), bus_id=task_id) for task_id, payload in rows]
+
+    def ack(self, task_id):
+        """任务处理结束，从总线删除"""
+        self._conn().execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def touch(self, task_ids, now=None):
+        """为仍在处理中的任务续期，避免处理时间较长的任务被当作失联而重新投递"""
+        if not task_ids:
+            return
+        now = time.time() if now is None else now
+        self._conn().executemany("UPDATE tasks SET claimed_at = ? WHERE id = ?", [(now, i) for i in task_ids])
+
+    def release_claims(self):
+        """worker 启动时调用：上一个 worker 进程领取但未完成的任务立即重新投递，返回任务数"""
+        return self._conn().execute("UPDATE tasks SET claimed_at = NULL WHERE claimed_at IS NOT NULL").rowcount
+
+    def pending(self):
+        """未领取的任务数"""
+        return self._conn().execute("SELECT COUNT(*) FROM tasks WHERE claimed_at IS NULL").fetchone()[0]
+
+    def try_acquire_channel(self, channel_id, gap_seconds, now=None, fallback_last_time=None):
+        """
+        频道限流的原子检查并更新：距上次处理超过 gap_seconds 时记录本次时间并返回 True
+        fallback_last_time 用于总线中尚无该频道记录时（如从 last_processed_time.json 迁移）
+        """
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT last_time FROM channel_gate WHERE channel_id = ?", (channel_id,)).fetchone()
+            last_time = row[0] if row else fallback_last_time
+            acquired = last_time is None or now - last_time >= gap_seconds
+            if acquired:
+                conn.execute(
+                    "INSERT INTO channel_gate (channel_id, last_time) VALUES (?, ?) "
+                    "ON CONFLICT(channel_id) DO UPDATE SET last_time = excluded.last_time",
+                    (channel_id, now),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def mark_seen(self, video_id, source, now=None, retention=SEEN_RETENTION_SECONDS, replace=()):
+        """
+        记录视频已被某个来源（hub / poller）发现；首次发现返回 None，否则返回最先发现它的来源
+        已有记录的来源在 replace 中时改记为本次来源（仍返回原来源）；顺带清理超过 retention 的旧记录
+        """
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO seen_videos (video_id, source, seen_at) VALUES (?, ?, ?)",
+                (video_id, source, now),
+            )
+            if cursor.rowcount:
+                previous = None
+                conn.execute("DELETE FROM seen_videos WHERE seen_at < ?", (now - retention,))
+            else:
+                previous = conn.execute("SELECT source FROM seen_videos WHERE video_id = ?", (video_id,)).fetchone()[0]
+                if previous in replace:
+                    conn.execute(
+                        "UPDATE seen_videos SET source = ?, seen_at = ? WHERE video_id = ?", (source, now, video_id)
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return previous
+
+    def channel_last_times(self):
+        return dict(self._conn().execute("SELECT channel_id, last_time FROM channel_gate").fetchall())
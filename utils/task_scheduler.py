@@ -0,0 +1,122 @@
+"""
+截止时间优先（EDF）的下载任务调度队列
+排序键：(来源, 截止时间, -频道优先级)，手动提交优先于自动推送，手动任务之间按入队顺序处理
+- 队列满时，新任务若比最差的自动推送任务更紧急则挤掉后者，否则抛出 asyncio.QueueFull
+- 出队时已错过截止时间的任务不再占用下载槽位，交给 on_discard 处理（推送C端或丢弃）
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+
+ORIGIN_MANUAL = 0
+ORIGIN_AUTO = 1
+
+
+class DeadlineTaskQueue:
+    def __init__(self, maxsize, on_discard=None, clock=time.time):
+        """
+        :param on_discard: on_discard(task, reason)，reason 为 expired / evicted
+        """
+        self._maxsize = maxsize
+        self._heap = []  # (origin, deadline_key, -priority, seq, task)
+        self._seq = itertools.count()
+        self._getters = []
+        self.on_discard = on_discard
+        self.clock = clock
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    def qsize(self):
+        return len(self._heap)
+
+    def empty(self):
+        return not self._heap
+
+    def full(self):
+        return len(self._heap) >= self._maxsize
+
+    def resize(self, maxsize):
+        self._maxsize = maxsize
+
+    @staticmethod
+    def _entry_key(task, seq):
+        deadline = task.get("deadline")
+        origin = ORIGIN_MANUAL if task.get("manual") else ORIGIN_AUTO
+        # 手动提交的任务总是排在自动推送之前；无截止时间的任务排在同来源有截止时间的任务之后
+        deadline_key = deadline if deadline is not None else float("inf")
+        return (origin, deadline_key, -task.get("priority", 0), seq)
+
+    def put_nowait(self, task):
+        entry = self._entry_key(task, next(self._seq)) + (task,)
+        if self.full():
+            # 手动提交的任务不会被挤出；手动任务入队时可挤出最差的自动任务
+            evictable = [e for e in self._heap if not e[-1].get("manual")]
+            if not evictable:
+                raise asyncio.QueueFull
+            worst = max(evictable)
+            if not task.get("manual") and entry >= worst:
+                raise asyncio.QueueFull
+            self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            self._discard(worst[-1], "evicted")
+        heapq.heappush(self._heap, entry)
+        self._wakeup_getter()
+
+    async def put(self, task):
+        """不阻塞：队列满时按优先级挤出或抛出 asyncio.QueueFull"""
+        self.put_nowait(task)
+
+    def _wakeup_getter(self):
+        while self._getters:
+            getter = self._getters.pop(0)
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    def _discard(self, task, reason):
+        if self.on_discard is None:
+            return
+        try:
+            self.on_discard(task, reason)
+        except Exception as e:
+            logging.error(f"[!] 处理被丢弃任务时出错: {e}")
+
+    def _pop_live(self):
+        now = self.clock()
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            task = entry[-1]
+            deadline = task.get("deadline")
+            if deadline is not None and deadline < now:
+                self._discard(task, "expired")
+                continue
+            return task
+        return None
+
+    def get_nowait(self):
+        task = self._pop_live()
+        if task is None:
+            raise asyncio.QueueEmpty
+        return task
+
+    async def get(self):
+        while True:
+            task = self._pop_live()
+            if task is not None:
+                return task
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except asyncio.CancelledError:
+                if getter in self._getters:
+                    self._getters.remove(getter)
+                raise
+
+    def snapshot(self):
+        """按调度顺序返回当前排队任务（调试用）"""
+        return [entry[-1] for entry in sorted(self._heap)]
@@ -1,14 +1,25 @@
 import os
+import time
 import logging
 import sys
 import argparse
 import asyncio
-from functools import partial
-import yt_dlp
-from utils.notifier import notify_wecom_group
+from utils.notifier import send_alert
+from utils.cookie_cache import cookie_cache, is_auth_error
+from utils.ytdlp_warmup import ytdlp_warmup, local_ejs_available
+from utils.proxy_pool import proxy_pool
+from utils.executors import run_blocking, DOWNLOAD
+from utils.retry_policy import (
+    classify_error, site_of, circuit_breakers, RETRY_POLICIES, PERMANENT, DOWNLOAD_ERRORS
+)
 
 WECOM_WEBHOOK = "https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key=9283fa7c-0e99-4c89-85e2-2908c7285804"
 
+def preload_yt_dlp():
+    """导入 yt_dlp（约占启动耗时的大头），服务启动后在后台线程调用，避免首个下载任务等待导入"""
+    import yt_dlp
+    return yt_dlp
+
 class AsyncVideoDownloader:
     def __init__(self):
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,15 +33,14 @@ class AsyncVideoDownloader:
         self.bin_path = os.path.join(self.project_root, 'tools')
         exe_suffix = ".exe" if sys.platform.startswith("win") else ""
         self.ffmpeg_path = os.path.join(self.bin_path, f"ffmpeg{exe_suffix}")
+        # 最近一次下载失败的类型（permanent / throttled / transient / no_output / circuit_open），成功时为 None
+        self.last_error_kind = None
 
-    async def download_video(self, channel_id, video_url, video_id, max_retry=2, retry_delay=10):
-        channel_dir = os.path.join(self.base_dir, channel_id)
-        os.makedirs(channel_dir, exist_ok=True)
-        output_path_template = os.path.join(channel_dir, f"{video_id}.%(ext)s")
-
+    def build_ydl_opts(self, video_url, output_path_template):
+        """按链接来源生成 yt-dlp 参数（下载基准会在此基础上替换格式与 ffmpeg 路径）"""
         url = video_url.lower()
         if "tiktok.com" in url or "instagram.com" in url:
-            ydl_opts = {
+            return {
                 'format': 'best',
                 'outtmpl': output_path_template,
                 'noplaylist': True,
@@ -40,7 +50,7 @@ class AsyncVideoDownloader:
                 'cookiesfrombrowser': ('firefox',)
             }
         else:
-            ydl_opts = {
+            opts = {
                 'format': 'bestvideo[height<=1920][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height<=1280][ext=mp4]+bestaudio',
                 'outtmpl': output_path_template,
                 'noplaylist': True,
@@ -55,35 +65,159 @@ class AsyncVideoDownloader:
                 'jsruntimes': 'deno',
                 'remote_components': 'ejs:github',
             }
+            if local_ejs_available():
+                # 已安装 yt-dlp-ejs 时使用本地组件，不在下载时从 GitHub 拉取
+                opts.pop('remote_components')
+            return opts
 
-        async def run_yt_dlp():
-            # yt_dlp 不支持异步，只能用线程池
-            loop = asyncio.get_event_loop()
-            func = partial(self._download, video_url, ydl_opts)
-            return await loop.run_in_executor(None, func)
+    async def download_video(self, channel_id, video_url, video_id, max_retry=3):
+        """
+        下载视频，返回本地文件路径，失败返回 None
+        重试次数与退避按错误类型决定（见 utils/retry_policy.py），max_retry 为总尝试次数上限
+        """
+        site = site_of(video_url)
+        breaker = circuit_breakers.get(site)
+        is_probe = breaker.state == "half_open"
+        self.last_error_kind = None
+        if not breaker.allow():
+            self.last_error_kind = "circuit_open"
+            logging.error(f"[!] {site} 下载熔断中，跳过: {video_url}")
+            DOWNLOAD_ERRORS.labels(site, "circuit_open").inc()
+            return None
+        try:
+            return await self._download_with_retries(site, breaker, channel_id, video_url, video_id, max_retry)
+        finally:
+            # 探测下载无论以何种方式结束（含取消、意外异常）都归还探测名额，避免站点一直停留在半开状态
+            if is_probe:
+                breaker.release_probe()
 
-        attempt = 0
-        while attempt < max_retry:
+    async def _download_with_retries(self, site, breaker, channel_id, video_url, video_id, max_retry):
+        channel_dir = os.path.join(self.base_dir, channel_id)
+        os.makedirs(channel_dir, exist_ok=True)
+        output_path_template = os.path.join(channel_dir, f"{video_id}.%(ext)s")
+
+        ydl_opts = self.build_ydl_opts(video_url, output_path_template)
+        if site == "youtube":
+            await ytdlp_warmup.before_download()
+
+        async def run_yt_dlp(proxy):
+            # yt_dlp 不支持异步，在下载专用线程池中执行
+            opts = dict(ydl_opts)
+            if proxy is not None:
+                opts["proxy"] = proxy.url
+            cookie_file = None
+            if opts.get("cookiesfrombrowser"):
+                # 使用已导出的浏览器 Cookie，避免每次下载都读取并解密 Firefox 数据库
+                cookie_file = await cookie_cache.checkout()
+                if cookie_file:
+                    opts.pop("cookiesfrombrowser")
+                    opts["cookiefile"] = cookie_file
             try:
-                logging.info(f"[↓] 正在下载: {video_url} (尝试 {attempt+1}/{max_retry})")
-                await run_yt_dlp()
-                for ext in ["mp4", "mkv", "webm"]:
-                    final_path = os.path.join(channel_dir, f"{video_id}.{ext}")
-                    if os.path.exists(final_path):
-                        logging.info(f"[✓] 已下载至: {final_path}")
-                        return final_path
-                logging.error("[!] 下载完成但未找到视频文件")
+                return await run_blocking(DOWNLOAD, self._download, video_url, opts)
             except Exception as e:
-                logging.error(f"[!] yt-dlp 下载出错 (尝试 {attempt+1}/{max_retry}): {e}")
+                if cookie_file and is_auth_error(e):
+                    cookie_cache.invalidate()
+                raise
+            finally:
+                cookie_cache.release(cookie_file)
+
+        tried_proxies = []
+        attempt = 0
+        kind = None
+        while True:
+            # 每次尝试选择得分最好的代理，重试时换用未尝试过的代理
+            proxy = proxy_pool.pick(exclude=tried_proxies)
+            if proxy is not None:
+                tried_proxies.append(proxy.name)
+            proxy_pool.acquire(proxy)
             attempt += 1
-            if attempt < max_retry:
-                logging.info(f"[!] 下载失败，{retry_delay} 秒后重试...")
-                await asyncio.sleep(retry_delay)
+            attempt_start = time.perf_counter()
+            final_path = None
+            proxy_ok = None
+            via = f"，代理 {proxy.name}" if proxy is not None else ""
+            try:
+                logging.info(f"[↓] 正在下载: {video_url} (尝试 {attempt}{via})")
+                await run_yt_dlp(proxy)
+                final_path = self._find_output(channel_dir, video_id)
+                if final_path:
+                    proxy_ok = True
+                    logging.info(f"[✓] 已下载至: {final_path}")
+                else:
+                    kind = "no_output"
+                    logging.error("[!] 下载完成但未找到视频文件")
+            except Exception as e:
+                kind = classify_error(e)
+                # 永久性错误（视频私享/删除/地区限制）与代理无关，不计入代理错误率
+                proxy_ok = None if kind == PERMANENT else False
+                DOWNLOAD_ERRORS.labels(site, kind).inc()
+                logging.error(f"[!] yt-dlp 下载出错（{kind}，尝试 {attempt}{via}）: {e}")
+                if site == "youtube":
+                    ytdlp_warmup.request_check(e)
+            finally:
+                proxy_pool.release(
+                    proxy, proxy_ok, time.perf_counter() - attempt_start,
+                    os.path.getsize(final_path) if final_path else 0,
+                )
+
+            if final_path:
+                self.last_error_kind = None
+                breaker.record_success()
+                return final_path
+            self.last_error_kind = kind
+            if kind == PERMANENT:
+                logging.error(f"[!] 视频无法下载（永久性错误），不再重试: {video_url}")
+                return None
+            if breaker.record_failure():
+                send_alert(f"[!]小包浆Vlog {site} 视频连续下载失败，已暂停该站点下载，请尽快检查代理", WECOM_WEBHOOK)
+                return None
+            policy = RETRY_POLICIES.get(kind, RETRY_POLICIES["transient"])
+            if attempt >= min(max_retry, policy.max_attempts) or breaker.state != "closed":
+                break
+            delay = policy.delay(attempt)
+            logging.info(f"[!] 下载失败，{delay:.0f} 秒后重试...")
+            await asyncio.sleep(delay)
+
         logging.error(f"[!] 视频下载最终失败: {video_url}")
-        notify_wecom_group(f"[!]小包浆Vlog视频下载失败，请尽快检查代理", WECOM_WEBHOOK)
+        proxies = f"（已尝试代理: {', '.join(tried_proxies)}）" if tried_proxies else ""
+        send_alert(f"[!]小包浆Vlog视频下载失败{proxies}，请尽快检查代理", WECOM_WEBHOOK)
         return None
 
+    def _find_output(self, channel_dir, video_id):
+        for ext in ["mp4", "mkv", "webm"]:
+            final_path = os.path.join(channel_dir, f"{video_id}.{ext}")
+            if os.path.exists(final_path):
+                return final_path
+        return None
+
+    async def extract_metadata(self, video_url):
+        """只提取视频元数据（不下载），用于 YouTube API 配额不足时获取时长与发布时间"""
+        ydl_opts = self.build_ydl_opts(video_url, os.path.join(self.base_dir, "%(id)s.%(ext)s"))
+        ydl_opts["skip_download"] = True
+        # 与下载一样经代理池出口访问，结果计入代理得分
+        proxy = proxy_pool.pick()
+        if proxy is not None:
+            ydl_opts["proxy"] = proxy.url
+        proxy_pool.acquire(proxy)
+        proxy_ok = None
+        try:
+            info = await run_blocking(DOWNLOAD, self._extract_info, video_url, ydl_opts)
+            proxy_ok = True
+            return info
+        except Exception as e:
+            proxy_ok = None if classify_error(e) == PERMANENT else False
+            via = f"（代理 {proxy.name}）" if proxy is not None else ""
+            logging.error(f"[!] yt-dlp 提取元数据出错{via}: {e}")
+            return None
+        finally:
+            proxy_pool.release(proxy, proxy_ok)
+
+    def _extract_info(self, video_url, ydl_opts):
+        yt_dlp = preload_yt_dlp()
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(video_url, download=False)
+
     def _download(self, video_url, ydl_opts):
+        yt_dlp = preload_yt_dlp()
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([video_url])
 
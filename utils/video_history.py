@@ -2,6 +2,11 @@ import os
 import json
 from threading import Lock
 
+# 发布成功后平台返回的作品ID: {platform: {video_id: item_id}}
+PUBLISHED_ITEMS_KEY = "published_items"
+# 发布成功但未拿到作品ID（回退为页面跳转判定、接口未返回ID、平台不提供ID）时记录的占位值
+UNKNOWN_ITEM_ID = "unknown"
+
 class VideoHistory:
     def __init__(self, history_file=None):
         if history_file is None:
@@ -34,4 +39,23 @@ class VideoHistory:
                 self._data[platform] = []
             if video_id not in self._data[platform]:
                 self._data[platform].append(video_id)
-                self._save()
\ No newline at end of file
+                self._save()
+
+    def get_published_item(self, platform, video_id):
+        """返回该视频在目标平台发布后拿到的作品ID（未拿到ID时为 UNKNOWN_ITEM_ID），未发布过返回 None"""
+        with self.lock:
+            item_id = self._data.get(PUBLISHED_ITEMS_KEY, {}).get(platform, {}).get(video_id)
+            if item_id is None and video_id in self._data.get(platform, []):
+                # 旧记录只有已处理列表，没有作品ID
+                return UNKNOWN_ITEM_ID
+            return item_id
+
+    def mark_published(self, platform, video_id, item_id):
+        """记录平台返回的作品ID，同时标记为已处理，用于重试去重"""
+        with self.lock:
+            items = self._data.setdefault(PUBLISHED_ITEMS_KEY, {}).setdefault(platform, {})
+            items[video_id] = item_id or UNKNOWN_ITEM_ID
+            vids = self._data.setdefault(platform, [])
+            if video_id not in vids:
+                vids.append(video_id)
+            self._save()
\ No newline at end of file
@@ -6,6 +6,11 @@ import configparser
 import json
 from datetime import datetime, timezone, timedelta
 
+from utils.quota_governor import quota_governor, METADATA_LOOKUPS, VIDEOS_LIST_COST
+from utils.freshness_tracker import parse_timestamp
+
+PUBLISHED_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
 class YoutubeMonitor:
     def __init__(self):
         self.history_file = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'history.json'))
@@ -73,6 +78,12 @@ class YoutubeMonitor:
             async with aiohttp.ClientSession() as session:
                 async with session.get(url) as response:
                     text = await response.text()
+                    # 计费规则：API 有响应的请求（含 4xx/5xx 错误）都计入配额；quotaExceeded 被拒绝的请求不计费，
+                    # 只标记当日配额耗尽；请求未到达 API（网络错误、超时）不计
+                    if response.status == 403 and "quotaExceeded" in text:
+                        quota_governor.mark_exhausted()
+                    else:
+                        quota_governor.spend(VIDEOS_LIST_COST)
                     if response.status == 200:
                         data = json.loads(text)
                         items = data.get("items", [])
@@ -99,9 +110,57 @@ class YoutubeMonitor:
             logging.error(f"[!] 获取视频信息失败: {e}")
         return None
 
+    async def get_video_info(self, video_id, published_hint=None, freshness_minutes=None):
+        """
+        获取视频发布时间与时长：配额充足时调用 Data API，否则（或 API 失败时）使用
+        Atom 通知中的发布时间 published_hint + yt-dlp 提取的元数据
+        """
+        if quota_governor.allow(VIDEOS_LIST_COST):
+            info = await self.fetch_video_details(video_id)
+            METADATA_LOOKUPS.labels("api", "ok" if info else "failed").inc()
+            if info:
+                return info
+        return await self.fetch_video_details_fallback(video_id, published_hint, freshness_minutes)
+
+    async def fetch_video_details_fallback(self, video_id, published_hint=None, freshness_minutes=None):
+        published_ts = parse_timestamp(published_hint) if published_hint else None
+        if published_ts is not None:
+            published_at = datetime.fromtimestamp(published_ts, timezone.utc).strftime(PUBLISHED_FORMAT)
+            # 已超出时效窗口的视频不再提取元数据，由调用方按发布时间跳过
+            if freshness_minutes is not None and not self.is_recent(published_at, minutes=freshness_minutes):
+                METADATA_LOOKUPS.labels("atom", "ok").inc()
+                return {"video_id": video_id, "channel_id": None, "published_at": published_at,
+                        "duration": None, "title": "", "source": "atom"}
+        else:
+            published_at = None
+
+        # 延迟导入，避免 youtube_monitor 导入时加载下载器
+        from utils.video_downloader import AsyncVideoDownloader
+        metadata = await AsyncVideoDownloader().extract_metadata(f"https://www.youtube.com/watch?v={video_id}")
+        if not metadata:
+            METADATA_LOOKUPS.labels("ytdlp", "failed").inc()
+            logging.error(f"[!] yt-dlp 获取视频信息失败: {video_id}")
+            return None
+        METADATA_LOOKUPS.labels("ytdlp", "ok").inc()
+        if published_at is None:
+            timestamp = metadata.get("release_timestamp") or metadata.get("timestamp")
+            if timestamp is None:
+                logging.error(f"[!] yt-dlp 未返回发布时间: {video_id}")
+                return None
+            published_at = datetime.fromtimestamp(timestamp, timezone.utc).strftime(PUBLISHED_FORMAT)
+        duration = metadata.get("duration")
+        return {
+            "video_id": video_id,
+            "channel_id": metadata.get("channel_id"),
+            "published_at": published_at,
+            "duration": int(duration) if duration is not None else None,
+            "title": metadata.get("title", ""),
+            "source": "ytdlp",
+        }
+
     def is_recent(self, published_at, minutes=2):
         try:
-            published_time = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+            published_time = datetime.strptime(published_at, PUBLISHED_FORMAT).replace(tzinfo=timezone.utc)
             now = datetime.now(timezone.utc)
             return (now - published_time) < timedelta(minutes=minutes)
         except Exception as e:
@@ -0,0 +1,176 @@
+"""
+yt-dlp 播放器缓存预热
+YouTube 更新播放器（player JS）后，第一次下载需要下载新的播放器、拉取 ejs 远程组件并求解签名，
+这些都落在下载的关键路径上。这里在启动时及检测到新的播放器版本时，用固定的公开视频做一次
+仅提取元数据的 extract_info，把播放器与签名求解结果写入 .cache（与下载共用 cache_dir），
+并统计下载开始时缓存是否已对应当前播放器（命中率）。
+安装了 yt-dlp-ejs 时 ejs 组件随本地包提供，下载参数不再使用 remote_components。
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import importlib.util
+
+import aiohttp
+
+from utils.metrics import Counter
+
+IFRAME_API_URL = "https://www.youtube.com/iframe_api"
+PLAYER_ID_PATTERN = re.compile(r"player\\?/([0-9a-fA-F]{8})\\?/")
+WARMUP_VIDEO_URL = "https://www.youtube.com/watch?v=jNQXAC9IVRw"
+PLAYER_CHECK_INTERVAL = 1800     # 播放器版本检查间隔（秒）
+WARMUP_WAIT_SECONDS = 20         # 下载开始时预热仍在进行，最多等待的时长
+REQUEST_TIMEOUT_SECONDS = 15
+SIGNATURE_ERROR_MARKERS = ("signature", "nsig", "n challenge", "player")
+
+STATE_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.cache', 'ytdlp_warmup.json'))
+
+PLAYER_CACHE = Counter("ysd_ytdlp_player_cache_total", "下载开始时播放器缓存是否已预热", ["result"])
+WARMUPS = Counter("ysd_ytdlp_warmups_total", "yt-dlp 预热次数", ["result"])
+
+
+def local_ejs_available():
+    """是否安装了 yt-dlp-ejs（本地提供 ejs 组件，无需 remote_components 从 GitHub 拉取）"""
+    return importlib.util.find_spec("yt_dlp_ejs") is not None
+
+
+def is_signature_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in SIGNATURE_ERROR_MARKERS)
+
+
+class YtdlpWarmup:
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = state_file
+        self.current_player = None
+        self._state = self._load()
+        self._warming = None
+        self._check_now = None
+        self.stats = {"hit": 0, "miss": 0, "unknown": 0}
+
+    def _load(self):
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"[!] 加载 ytdlp_warmup.json 失败: {e}")
+        return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_path = self.state_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logging.error(f"[!] 保存 ytdlp_warmup.json 失败: {e}")
+
+    @property
+    def warmed_player(self):
+        return self._state.get("player_id")
+
+    async def fetch_player_id(self, session):
+        async with session.get(IFRAME_API_URL) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            match = PLAYER_ID_PATTERN.search(await response.text())
+        if not match:
+            raise RuntimeError("iframe_api 中未找到播放器版本")
+        return match.group(1)
+
+    async def warm(self, player_id):
+        """用固定视频做一次元数据提取，播放器与签名缓存写入 cache_dir"""
+        # 延迟导入，避免与 video_downloader 循环导入
+        from utils.video_downloader import AsyncVideoDownloader
+        start = time.perf_counter()
+        info = await AsyncVideoDownloader().extract_metadata(WARMUP_VIDEO_URL)
+        elapsed = time.perf_counter() - start
+        if not info:
+            WARMUPS.labels("failed").inc()
+            logging.warning(f"[!] yt-dlp 预热失败（播放器 {player_id}），首个下载将自行加载播放器")
+            return False
+        WARMUPS.labels("ok").inc()
+        self._state = {"player_id": player_id, "warmed_at": time.time(), "seconds": round(elapsed, 2)}
+        self._save()
+        logging.info(f"[✓] yt-dlp 已预热播放器 {player_id}（耗时 {elapsed:.2f}s）")
+        return True
+
+    async def check_once(self, session):
+        try:
+            player_id = await self.fetch_player_id(session)
+        except Exception as e:
+            logging.warning(f"[!] 获取 YouTube 播放器版本失败: {type(e).__name__} | {e}")
+            return
+        if player_id != self.current_player:
+            if self.current_player:
+                logging.info(f"[✓] 检测到 YouTube 播放器更新: {self.current_player} -> {player_id}")
+            self.current_player = player_id
+        if player_id == self.warmed_player:
+            return
+        self._warming = asyncio.get_running_loop().create_future()
+        try:
+            await self.warm(player_id)
+        finally:
+            self._warming.set_result(None)
+            self._warming = None
+
+    def request_check(self, error=None):
+        """下载出现签名相关错误时调用，提前检查播放器版本"""
+        if self._check_now is not None and (error is None or is_signature_error(error)):
+            self._check_now.set()
+
+    async def run(self):
+        self._check_now = asyncio.Event()
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                await self.check_once(session)
+                self._check_now.clear()
+                try:
+                    await asyncio.wait_for(self._check_now.wait(), PLAYER_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def before_download(self):
+        """YouTube 下载开始前调用：预热进行中时稍等，并记录缓存是否命中当前播放器"""
+        if self._warming is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._warming), WARMUP_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        if self.current_player is None:
+            result = "unknown"
+        elif self.current_player == self.warmed_player:
+            result = "hit"
+        else:
+            result = "miss"
+        self.stats[result] += 1
+        PLAYER_CACHE.labels(result).inc()
+
+    def state(self, cache_dir=None):
+        known = self.stats["hit"] + self.stats["miss"]
+        entries = {}
+        if cache_dir and os.path.isdir(cache_dir):
+            for name in sorted(os.listdir(cache_dir)):
+                path = os.path.join(cache_dir, name)
+                if os.path.isdir(path):
+                    entries[name] = len(os.listdir(path))
+        return {
+            "current_player": self.current_player,
+            "warmed_player": self.warmed_player,
+            "warmed_at": self._state.get("warmed_at"),
+            "warming": self._warming is not None,
+            "local_ejs": local_ejs_available(),
+            "downloads": dict(self.stats),
+            "hit_rate": round(self.stats["hit"] / known, 3) if known else None,
+            "cache_entries": entries,
+        }
+
+
+# 全局单例
+ytdlp_warmup = YtdlpWarmup()
@@ -1,76 +1,91 @@
 import os
 import asyncio
 import logging
+import logging.handlers
 import atexit
+import threading
+import time
 from datetime import datetime, timedelta
 from fastapi import FastAPI, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response, JSONResponse
 from contextlib import asynccontextmanager
-from asyncio import Lock
+from functools import wraps
 import json
 
-from utils.browser_manager import BrowserManager
 from utils.youtube_monitor import YoutubeMonitor
-from utils.video_downloader import AsyncVideoDownloader
-from utils.config_loader import get_time_gap, _set_main_thread_loop, config_reloader
-
-# 导入各平台上传脚本
-from utils.douyin_uploader import init_globals as douyin_init, get_queue as get_douyin_queue, worker as douyin_worker
-
-MAX_DOWNLOAD_QUEUE_SIZE = 4
-MAX_CONCURRENT_DOWNLOADS = 2
+from utils.video_downloader import AsyncVideoDownloader, preload_yt_dlp
+from utils.config_loader import get_config, _set_main_thread_loop, config_reloader
+from utils.concurrency import ResizableSemaphore
+from utils.adaptive_concurrency import AIMDController
+from utils.task_scheduler import DeadlineTaskQueue
+from utils.notifier import alert_dispatcher
+from utils.metrics import REGISTRY, CONTENT_TYPE_LATEST, Counter, Gauge, Histogram
+from utils.freshness_tracker import freshness_tracker, DEFAULT_WINDOWS, parse_timestamp
+from utils.lease_store import lease_store, channel_id_from_topic
+from utils.task_bus import SQLiteTaskBus
+from utils.feed_poller import FeedPoller, SeenVideos, SOURCE_HUB, SOURCE_POLLER, SOURCE_POLLER_STALE
+
+# 抖音多账号上传池（每个账号独立浏览器、队列与 worker）
+from utils.account_pool import account_pool
+from utils.fanout import upload_fanout, PlatformLane
+from utils.quota_governor import quota_governor
+from utils.ytdlp_warmup import ytdlp_warmup
+from utils.proxy_pool import proxy_pool
+from utils.retry_policy import circuit_breakers, THROTTLED, TRANSIENT
+from utils.loop_monitor import loop_monitor
+from utils.executors import (
+    run_blocking, executors_state, configure as configure_executors, shutdown as shutdown_executors,
+    INGEST, DISK, CONFIG,
+)
+
+# 进程角色（环境变量 YSD_ROLE）：
+# all    单进程模式（默认）：接收回调、下载、浏览器上传都在本进程
+# ingest 只接收回调，任务写入 SQLite 任务总线，可由 uvicorn 多 worker 横向扩展
+# worker 从任务总线取任务，独占下载与浏览器；崩溃重启不影响 ingest 接收回调
+ROLE_ALL, ROLE_INGEST, ROLE_WORKER = "all", "ingest", "worker"
+PROCESS_ROLE = os.environ.get("YSD_ROLE", ROLE_ALL)
+task_bus = SQLiteTaskBus() if PROCESS_ROLE != ROLE_ALL else None
+# 已接收视频（hub / poller 去重），拆分部署时改用任务总线中的记录
+seen_videos = SeenVideos() if task_bus is None else None
+bus_tasks_in_flight = set()  # worker 进程：已从任务总线领取、尚未 ack 的任务
+feed_poller = None
 
 video_id_queue = None
 download_semaphore = None
+download_controller = None
+download_aimd_task = None
 
 LAST_TIME_FILE = os.path.join(os.path.dirname(__file__), "config", "last_processed_time.json")
 last_processed_time_per_channel = {}
-channel_time_lock = Lock()
-
-youtube_monitor = YoutubeMonitor()
-log_handler = print
-
-browser_manager = None
-
-#A端单个频道限流逻辑
-#当参数设置为-1时代表该频道不处理
-
-CUSTOM_CHANNEL_IDS = {
-    "UCzSFLbvTKdcfmCo7saWZujQ": 720, 
-    "UCIbPhiNMXmko9CTUaWX8gqQ": 720,
-    "UCleXpK9Sb2MCSZeNR4CTsMQ": 720,
-    "UCwavDe8g8Mfdk0o8QVJKaog": 720,
-    "UCjWCVEhAS4LCECSMDNMnzlw": -1,
-    "UCh9xEOEmXC_FuGUarv_2HUw": 720,
-    "UCUc0c5R90Evk4zNqxO6GzHA": -1, 
-    "UCZn8dbFxfy_iOWnWEHyFfdw": 720,
-    "UCurCrjSzGWfL2MMxkzVKAIw": -1, #抄袭4oA博主
-    "UCqaBbXWyJ3-kHBb2PdkUJRw": -1,
-    "UCwUq57PDCpsvwN5DYRig2-w": 720,
-    "UCJtVPEhP9ovaD0OkVi66B2A": 720,
-    "UCnWRXcywrripPvT9SGbztjg": -1,
-    "UCM7d5JKl2mPhZdwrpVG0hnQ": -1,
-    "UCCf51KVCmk-AGJY-XrCEkjw": -1,
-    "UCqcwDHhFk17OEHuvf16kY4A": 720, 
-    "UCO9RUgHoQ-bUpfFQopCFrxw": 720,
-    "UCSr575W5pK9NmHiZ69WFp4A": -1,
-    "UCVWG-brm2sO4CYuNlQg_4oA": -1,
-    "UCiNvbjFfN4lQTNJm6P-hfzA": 720,
-    "UC-maRiqJ9Y3mBZfBk-xnb8A": 720,
-    "UCqGRYxVOmDGCZPjMD-UBGlw": 720,
-}
-
-#不推送C端的频道
-#NO_PUSH_C_IDS = set()    #空集合
-
-#不推送C端的频道ID
-NO_PUSH_C_IDS = {
-    "UC-maRiqJ9Y3mBZfBk-xnb8A",
-    "UCqGRYxVOmDGCZPjMD-UBGlw",
-}
+
+# 首次使用时才构建（读取 history.json 与 API key），启动阶段在后台线程预热
+youtube_monitor = None
+_youtube_monitor_lock = threading.Lock()
+kuaishou_lane = None
+
+# 启动就绪状态：/livez 只要进程在跑就返回 200，/readyz 要求下列组件全部就绪
+startup_state = {"started_at": None, "components": {}}
+log_handler = print if PROCESS_ROLE == ROLE_ALL else logging.info
 
 C_ENDPOINT = "https://keai.frps.miaoshark.com/youtube/callback"
 
+# ========== 运行指标（/metrics） ==========
+CALLBACK_SECONDS = Histogram("ysd_callback_seconds", "youtube_callback 处理耗时", ["method"])
+API_LOOKUP_SECONDS = Histogram("ysd_youtube_api_seconds", "YouTube Data API 查询视频详情耗时")
+DOWNLOAD_SECONDS = Histogram("ysd_download_seconds", "视频下载耗时", ["result"])
+TASKS_RATE_LIMITED = Counter("ysd_tasks_rate_limited_total", "因频道限流/禁用未处理的视频数")
+TASKS_FORWARDED_TO_C = Counter("ysd_tasks_forwarded_to_c_total", "推送给C端的视频数")
+TASKS_DROPPED = Counter("ysd_tasks_dropped_total", "被丢弃的任务数", ["reason"])
+QUEUE_SIZE = Gauge("ysd_queue_size", "队列当前长度", ["queue"])
+QUEUE_CAPACITY = Gauge("ysd_queue_capacity", "队列容量", ["queue"])
+SLOTS_IN_USE = Gauge("ysd_slots_in_use", "并发槽位占用数", ["stage"])
+SLOTS_LIMIT = Gauge("ysd_slots_limit", "并发槽位上限", ["stage"])
+VIDEOS_DISCOVERED = Counter("ysd_videos_discovered_total", "首次发现的新视频数（hub 推送 / RSS 轮询）", ["source"])
+HUB_AFTER_POLLER = Counter("ysd_hub_after_poller_total", "RSS 轮询先发现、Hub 随后才推送的视频数")
+# 拆分部署时各进程只导出自身的指标（ingest：回调与发现，worker：下载与上传），按 role 区分抓取目标
+PROCESS_INFO = Gauge("ysd_process_info", "进程角色", ["role"])
+PROCESS_INFO.labels(PROCESS_ROLE).set(1)
+
 def load_last_processed_time():
     global last_processed_time_per_channel
     try:
@@ -105,50 +120,176 @@ def save_last_processed_time():
 
 async def async_save_last_processed_time():
     try:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, save_last_processed_time)
+        await run_blocking(DISK, save_last_processed_time)
     except Exception as e:
         logging.error(f"异步保存 last_processed_time.json 失败: {e}")
 
+def register_runtime_gauges():
+    """队列长度、并发槽位占用在渲染 /metrics 时读取，热路径无额外开销"""
+    QUEUE_SIZE.labels("video_id_queue").set_function(lambda: video_id_queue.qsize())
+    QUEUE_CAPACITY.labels("video_id_queue").set_function(lambda: video_id_queue.maxsize)
+    QUEUE_SIZE.labels("upload_queue").set_function(account_pool.qsize)
+    QUEUE_CAPACITY.labels("upload_queue").set_function(account_pool.capacity)
+    SLOTS_IN_USE.labels("download").set_function(lambda: download_semaphore.in_use)
+    SLOTS_LIMIT.labels("download").set_function(lambda: download_semaphore.limit)
+    SLOTS_IN_USE.labels("upload").set_function(account_pool.slots_in_use)
+    SLOTS_LIMIT.labels("upload").set_function(account_pool.slots_limit)
+
+def setup_role_logging():
+    """拆分部署时，子进程各自写日志文件 log/webhook_<role>.log"""
+    log_dir = os.path.join(os.path.dirname(__file__), "log")
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(f"[%(asctime)s] [%(levelname)s] [{PROCESS_ROLE}:%(process)d] %(message)s", '%Y-%m-%d %H:%M:%S')
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, f"webhook_{PROCESS_ROLE}.log"),
+        maxBytes=50*1024*1024,
+        backupCount=5,
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.handlers = [file_handler, stream_handler]
+
 def cleanup_on_exit():
+    if PROCESS_ROLE != ROLE_ALL:
+        # 拆分部署时频道限流状态保存在任务总线中
+        return
     try:
         save_last_processed_time()
         logging.info("程序退出，已保存最后的时间记录")
     except Exception as e:
         logging.error(f"程序退出清理失败: {e}")
 
+if PROCESS_ROLE != ROLE_ALL:
+    setup_role_logging()
 atexit.register(cleanup_on_exit)
-load_last_processed_time()
+
+def get_youtube_monitor():
+    global youtube_monitor
+    with _youtube_monitor_lock:
+        if youtube_monitor is None:
+            youtube_monitor = YoutubeMonitor()
+    return youtube_monitor
+
+def mark_component(name, ready=True):
+    startup_state["components"][name] = ready
+    if ready and startup_state["started_at"] is not None:
+        log_handler(f"[✓] {name} 已就绪（启动后 {time.perf_counter() - startup_state['started_at']:.2f}s）")
+
+def is_ready():
+    components = startup_state["components"]
+    return bool(components) and all(components.values())
 
 async def init_async_globals():
-    global download_semaphore, video_id_queue
-    douyin_init()
+    global download_semaphore, video_id_queue, download_controller
+    cfg = get_config()
     if download_semaphore is None:
-        download_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        download_semaphore = ResizableSemaphore(cfg.max_concurrent_downloads)
     if video_id_queue is None:
-        video_id_queue = asyncio.Queue(maxsize=MAX_DOWNLOAD_QUEUE_SIZE)
+        video_id_queue = DeadlineTaskQueue(maxsize=cfg.max_download_queue_size, on_discard=discard_task)
+    if download_controller is None:
+        download_controller = AIMDController(
+            "下载", download_semaphore,
+            cfg.download_concurrency_min, cfg.download_concurrency_max,
+            latency_target=cfg.download_latency_target,
+        )
+    register_runtime_gauges()
+    if task_bus is not None:
+        QUEUE_SIZE.labels("task_bus").set_function(task_bus.pending)
+
+def sync_download_aimd(cfg):
+    """按 adaptive_concurrency 启动或停止下载并发的 AIMD 控制器"""
+    global download_aimd_task
+    running = download_aimd_task is not None and not download_aimd_task.done()
+    if cfg.adaptive_concurrency and not running:
+        download_aimd_task = asyncio.create_task(download_controller.run(), name="download_aimd")
+    elif not cfg.adaptive_concurrency and running:
+        download_aimd_task.cancel()
+        download_aimd_task = None
+        # 恢复静态并发上限，不再停留在 AIMD 最后调整的值
+        download_semaphore.resize(cfg.max_concurrent_downloads)
+
+def apply_runtime_config(old, new):
+    """配置热更新：在线调整下载并发与下载队列容量"""
+    if download_semaphore is not None and old.max_concurrent_downloads != new.max_concurrent_downloads:
+        download_semaphore.resize(new.max_concurrent_downloads)
+        log_handler(f"[✓] 下载并发已调整: {old.max_concurrent_downloads} -> {new.max_concurrent_downloads}")
+    if video_id_queue is not None and old.max_download_queue_size != new.max_download_queue_size:
+        video_id_queue.resize(new.max_download_queue_size)
+        log_handler(f"[✓] 下载队列容量已调整: {old.max_download_queue_size} -> {new.max_download_queue_size}")
+    if download_controller is not None:
+        download_controller.latency_target = new.download_latency_target
+        download_controller.set_bounds(new.download_concurrency_min, new.download_concurrency_max)
+        if old.adaptive_concurrency != new.adaptive_concurrency:
+            sync_download_aimd(new)
+            log_handler(f"[✓] 下载自适应并发已{'开启' if new.adaptive_concurrency else '关闭'}")
+    configure_executors(new)
+
+config_reloader.add_listener(apply_runtime_config)
+config_reloader.add_listener(account_pool.apply_runtime_config)
 
 @asynccontextmanager
 async def lifespan(app):
-    global browser_manager
+    global feed_poller
+    startup_state["started_at"] = time.perf_counter()
     _set_main_thread_loop()
-    config_reloader.start_watching()
+    configure_executors(get_config())
+    # 持续测量事件循环延迟，阻塞超过阈值时记录阻塞位置（/debug/loop）
+    monitor_task = asyncio.create_task(loop_monitor.run(), name="loop_monitor")
+    # 频道限流依赖上次处理时间，必须在接收回调前加载；文件监听在线程池中启动，不阻塞事件循环
+    await asyncio.gather(
+        run_blocking(DISK, load_last_processed_time),
+        run_blocking(CONFIG, config_reloader.start_watching),
+    )
+    if PROCESS_ROLE == ROLE_INGEST:
+        # ingest 进程不持有队列、浏览器，只负责把回调写入任务总线
+        mark_component("task_bus")
+        log_handler(f"[✓] ingest 进程 {os.getpid()} 初始化完成，回调任务写入任务总线")
+        yield
+        monitor_task.cancel()
+        await alert_dispatcher.close()
+        return
+
+    for name in ("queues", "youtube_monitor", "downloader", "browser"):
+        mark_component(name, False)
     await init_async_globals()
-    browser_manager = BrowserManager(log_handler=log_handler)
-    await browser_manager.start()
-
-    # 启动各平台 worker
-    worker_tasks = [
-        asyncio.create_task(douyin_worker(browser_manager.uploader_douyin, log_handler), name=f"douyin_worker_{i}")
-        for i in range(2)
+    upload_fanout.log_handler = log_handler
+    upload_fanout.on_release = ack_bus_task
+    upload_fanout.register("douyin", account_pool.submit)
+    start_kuaishou_lane()
+    mark_component("queues")
+
+    # 耗时的步骤并行放到后台：浏览器启动与登录检查、YouTube 监控初始化、yt-dlp 预加载、时效历史记录加载
+    # 浏览器就绪前上传任务在 account_pool.submit 中排队等待，回调照常接收
+    background_tasks = [
+        asyncio.create_task(start_upload_stage(), name="browser_start"),
+        asyncio.create_task(warm_up(), name="warm_up"),
+        asyncio.create_task(run_blocking(DISK, freshness_tracker.load), name="freshness_load"),
     ]
-    main_task = asyncio.create_task(async_handler_task(), name="main_handler")
-    all_tasks = [main_task] + worker_tasks
 
-    log_handler("[✓] 系统初始化完成")
+    worker_tasks = []
+    main_task = asyncio.create_task(async_handler_task(), name="main_handler")
+    if PROCESS_ROLE == ROLE_WORKER:
+        worker_tasks.append(asyncio.create_task(task_bus_pump(), name="task_bus_pump"))
+    if get_config().feed_polling:
+        # RSS 轮询兜底只在单进程或 worker 进程运行一份
+        feed_poller = FeedPoller(lambda: get_config().channels, ingest_youtube_entry, get_config, log_handler)
+        worker_tasks.append(asyncio.create_task(feed_poller.run(), name="feed_poller"))
+    sync_download_aimd(get_config())
+    # 启动时及播放器更新时预热 yt-dlp 缓存，首个下载不再承担播放器加载与签名求解
+    worker_tasks.append(asyncio.create_task(ytdlp_warmup.run(), name="ytdlp_warmup"))
+    worker_tasks.append(asyncio.create_task(proxy_pool.run(), name="proxy_probe"))
+
+    log_handler(f"[✓] 已开始接收回调（启动后 {time.perf_counter() - startup_state['started_at']:.2f}s），浏览器在后台启动")
     yield
 
     log_handler("[✓] 开始优雅关闭后台任务...")
+    all_tasks = [main_task, monitor_task] + worker_tasks + [t for t in background_tasks if not t.done()]
+    if download_aimd_task is not None:
+        all_tasks.append(download_aimd_task)
     for t in all_tasks:
         if not t.done():
             t.cancel()
@@ -161,21 +302,56 @@ async def lifespan(app):
             logging.error(f"关闭任务 {t.get_name()} 时出错: {e}")
 
     try:
-        await browser_manager.stop()
+        if kuaishou_lane is not None:
+            await kuaishou_lane.stop()
+        await account_pool.stop()
         log_handler("[✓] 浏览器及Playwright已关闭")
     except Exception as e:
         logging.error(f"关闭BrowserManager异常: {e}")
 
+    await alert_dispatcher.close()
+    await run_blocking(DISK, quota_governor.flush)
+    shutdown_executors()
+
     log_handler("[✓] 所有后台资源已释放，服务已安全退出。")
 
 app = FastAPI(lifespan=lifespan)
 
+async def start_upload_stage():
+    """并行启动各抖音账号浏览器"""
+    await account_pool.start(log_handler)
+    mark_component("browser", any(a.ready for a in account_pool.accounts.values()))
+
+def start_kuaishou_lane():
+    """
+    快手独立上传通道在启动时即注册到上传扇出：浏览器启动完成前分发的任务等待（与抖音账号池一致），
+    启动完成后快手上传器不可用时按无法入队处理
+    """
+    global kuaishou_lane
+    kuaishou_lane = PlatformLane("kuaishou", account_pool.kuaishou_uploader, log_handler)
+    kuaishou_lane.start()
+
+    async def submit(task):
+        await account_pool.started.wait()
+        if account_pool.kuaishou_uploader() is None:
+            raise asyncio.QueueFull("快手上传器不可用")
+        await kuaishou_lane.submit(task)
+
+    upload_fanout.register("kuaishou", submit)
+
+async def warm_up():
+    """后台预热：构建 YouTube 监控（读取历史与 API key）、预加载 yt-dlp，首个任务无需等待导入"""
+    await run_blocking(CONFIG, get_youtube_monitor)
+    mark_component("youtube_monitor")
+    await run_blocking(CONFIG, preload_yt_dlp)
+    mark_component("downloader")
+
 def set_uploader_log_handler(handler):
     global log_handler
     log_handler = handler
-    # 让 browser_manager 的 uploader 也同步日志（如果已初始化）
-    if browser_manager and getattr(browser_manager, "uploader_douyin", None):
-        browser_manager.uploader_douyin.log_handler = handler
+    # 让各账号的 uploader 也同步日志（如果已初始化）
+    account_pool.set_log_handler(handler)
+    upload_fanout.log_handler = handler
 
 def extract_id_from_url(platform, url):
     import re
@@ -216,11 +392,111 @@ async def forward_xml_to_c_async(video_id, channel_id):
         logging.error(f"推送XML到C端（嘟嘟总裁）失败: {e}")
 
 @app.get("/healthz")
+@app.get("/livez")
 async def health_check():
+    """存活检查：进程与事件循环正常即返回 200（启动后 1 秒内即可接收回调）"""
     return PlainTextResponse("OK", status_code=200)
 
+@app.get("/readyz")
+async def readiness_check():
+    """就绪检查：队列、YouTube 监控、下载器与浏览器全部就绪返回 200，否则 503 并列出各组件状态"""
+    return JSONResponse(
+        {"ready": is_ready(), "role": PROCESS_ROLE, "components": startup_state["components"]},
+        status_code=200 if is_ready() else 503,
+    )
+
+def worker_only(endpoint):
+    """ingest 进程不持有下载/上传状态，此类接口返回 503 并指明进程角色（请查询 worker 进程的同名接口）"""
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        if PROCESS_ROLE == ROLE_INGEST:
+            return JSONResponse(
+                {"error": "ingest 进程不持有下载/上传状态，请查询 worker 进程的同名接口", "role": PROCESS_ROLE},
+                status_code=503,
+            )
+        return await endpoint(*args, **kwargs)
+    return wrapper
+
+@app.get("/freshness")
+@worker_only
+async def freshness(window: int = None, channel_id: str = None):
+    """各频道端到端时效分位数（秒），window 为滚动窗口秒数，缺省返回 1 小时和 24 小时"""
+    windows = (window,) if window else DEFAULT_WINDOWS
+    return {
+        str(w): {
+            "outcomes": freshness_tracker.outcome_counts(w),
+            "channels": freshness_tracker.stats(w, channel_id),
+        }
+        for w in windows
+    }
+
+@app.get("/poller")
+@worker_only
+async def poller_state():
+    """RSS 轮询兜底状态：各频道轮询间隔、304 次数及只由轮询发现的视频数"""
+    if feed_poller is None:
+        return {"enabled": False}
+    return {"enabled": True, **feed_poller.state()}
+
+@app.get("/concurrency")
+@worker_only
+async def concurrency_state():
+    """下载/上传当前并发上限及自适应调整历史"""
+    return {
+        "download": download_controller.state(),
+        "upload": {name: state["concurrency"] for name, state in account_pool.state().items()},
+    }
+
+@app.get("/quota")
+@worker_only
+async def quota_state():
+    """YouTube Data API 当日配额消耗、剩余与预计耗尽时间"""
+    return quota_governor.state()
+
+@app.get("/ytdlp_cache")
+@worker_only
+async def ytdlp_cache_state():
+    """yt-dlp 播放器缓存预热状态与下载命中率"""
+    return ytdlp_warmup.state(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+@app.get("/proxies")
+@worker_only
+async def proxies_state():
+    """下载代理池各代理的延迟、错误率、吞吐与冷却状态"""
+    return proxy_pool.state()
+
+@app.get("/circuit_breakers")
+@worker_only
+async def circuit_breakers_state():
+    """各站点下载熔断状态"""
+    return circuit_breakers.state()
+
+@app.get("/executors")
+async def executors_info():
+    """各线程池的大小、正在执行与排队的任务数、最长排队等待"""
+    return executors_state()
+
+@app.get("/debug/loop")
+async def loop_state(top: int = 10):
+    """事件循环延迟分位数与阻塞最严重的位置（含调用栈）"""
+    return loop_monitor.state(top)
+
+@app.get("/accounts")
+@worker_only
+async def accounts_state():
+    """各抖音账号的健康状态、限速、队列与上传计数"""
+    return account_pool.state()
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
 @app.api_route('/youtube/callback', methods=['GET', 'POST'])
 async def youtube_callback(request: Request):
+    with CALLBACK_SECONDS.labels(request.method).time():
+        return await _handle_youtube_callback(request)
+
+async def _handle_youtube_callback(request: Request):
     global last_processed_time_per_channel
     import xml.etree.ElementTree as ET
     if request.method == 'GET':
@@ -228,6 +504,12 @@ async def youtube_callback(request: Request):
         challenge = params.get("hub.challenge", "")
         if challenge:
             logging.info(f"收到 YouTube 订阅验证 GET，challenge={challenge}")
+            channel_id = channel_id_from_topic(params.get("hub.topic"))
+            if channel_id:
+                await run_blocking(
+                    DISK, lease_store.record_verification,
+                    channel_id, params.get("hub.mode", "subscribe"), params.get("hub.lease_seconds")
+                )
             return PlainTextResponse(challenge, status_code=200)
         else:
             logging.warning("收到 YouTube 订阅验证 GET，但没有 challenge 参数")
@@ -246,17 +528,17 @@ async def youtube_callback(request: Request):
                 local_path = data.get("local_path")  # 新增，没这个字段就是 None
                 if video_url or (platform.startswith("douyin") and local_path):  # 支持混剪场景
                     logging.info(f"[✓] 收到新{platform}手动提交视频: {video_url or local_path}")
-                    try:
-                        await video_id_queue.put({
-                            "platform": platform,
-                            "video_url": video_url,
-                            "video_id": video_id,
-                            "channel_id": channel_id,
-                            "manual": True,
-                            "path": local_path
-                        })
-                    except asyncio.QueueFull:
-                        logging.warning(f"[!] 下载队列已满（容量: {MAX_DOWNLOAD_QUEUE_SIZE}），丢弃本次推送: {video_url or local_path}")
+                    task = {
+                        "platform": platform,
+                        "video_url": video_url,
+                        "video_id": video_id,
+                        "channel_id": channel_id,
+                        "manual": True,
+                        "path": local_path,
+                        "priority": get_config().channel_priority.get(channel_id, 0),
+                        "stages": {"callback_received": now.timestamp()},
+                    }
+                    await submit_task(task)
 
             else:
                 xml_data = (await request.body()).decode("utf-8")
@@ -274,159 +556,362 @@ async def youtube_callback(request: Request):
                     video_id_elem = entry.find("yt:videoId", ns)
                     channel_id_elem = entry.find("yt:channelId", ns)
                     if video_id_elem is not None and video_id_elem.text:
-                        video_id = video_id_elem.text
-                        channel_id = channel_id_elem.text if channel_id_elem is not None else "youtube"
-                        video_url = f"https://www.youtube.com/watch?v={video_id}"
-                        
-                        #白名单单个频道ID限流逻辑
-                        is_disabled_channel = False
-                        should_process = True
-
-                        async with channel_time_lock:
-                            custom_time_gap_min = CUSTOM_CHANNEL_IDS.get(channel_id)
-                            if custom_time_gap_min is not None:
-                                if custom_time_gap_min == -1:   # 当设置为-1时代表该频道不处理
-                                    should_process = False
-                                    is_disabled_channel = True
-                                    logging.info(
-                                        f"[!] 频道 {channel_id} 已设置为永久禁用，本次新视频{video_id}不处理，推送给C端（嘟嘟总裁）"
-                                    )
-                                elif custom_time_gap_min == 0:
-                                    last_processed_time_per_channel[channel_id] = now
-                                    should_process = True
-                                else:
-                                    current_time_gap = timedelta(minutes=custom_time_gap_min)
-                                    last_time = last_processed_time_per_channel.get(channel_id)
-                                    if last_time is None or now - last_time >= current_time_gap:
-                                        last_processed_time_per_channel[channel_id] = now
-                                        should_process = True
-                                    else:
-                                        should_process = False
-                            else:
-                                current_time_gap = await get_time_gap()
-                                last_time = last_processed_time_per_channel.get(channel_id)
-                                if last_time is None or now - last_time >= current_time_gap:
-                                    last_processed_time_per_channel[channel_id] = now
-                                    should_process = True
-                                else:
-                                    should_process = False
-
-                        if not should_process:
-                            if not is_disabled_channel:
-                                logging.info(
-                                    f"[!] 频道 {channel_id} {current_time_gap.total_seconds()//60:.0f}分钟内已推送过其它视频，本次新视频{video_id}不处理，推送给C端（嘟嘟总裁）"
-                                )
-                            
-                            if channel_id in NO_PUSH_C_IDS:
-                                logging.info(f"[!] 频道 {channel_id} 已设置不推送C端（嘟嘟总裁），本次新视频{video_id}已丢弃")
-                                return PlainTextResponse("Channel limited, not pushed", status_code=200)
-
-                            asyncio.create_task(forward_xml_to_c_async(video_id, channel_id))
+                        published_elem = entry.find("atom:published", ns)
+                        updated_elem = entry.find("atom:updated", ns)
+                        result = await ingest_youtube_entry({
+                            "video_id": video_id_elem.text,
+                            "channel_id": channel_id_elem.text if channel_id_elem is not None else "youtube",
+                            "published": published_elem.text if published_elem is not None else None,
+                            "updated": updated_elem.text if updated_elem is not None else None,
+                        }, SOURCE_HUB, now)
+                        if result == "dropped":
+                            return PlainTextResponse("Channel limited, not pushed", status_code=200)
+                        if result == "forwarded":
                             return PlainTextResponse("Channel limited, pushed to C", status_code=200)
 
-                        asyncio.create_task(async_save_last_processed_time())
-
-                        logging.info(f"[✓] 收到YouTube订阅视频通知: {video_id}")
-                        try:
-                            await video_id_queue.put({
-                                "platform": "youtube",
-                                "video_url": video_url,
-                                "video_id": video_id,
-                                "channel_id": channel_id
-                            })
-                        except asyncio.QueueFull:
-                            logging.warning(f"[!] 下载队列已满（容量: {MAX_DOWNLOAD_QUEUE_SIZE}），丢弃本次推送: {video_url}")
-
         except Exception as e:
             logging.error(f"解析 POST 回调出错: {e}")
             logging.exception("详细错误信息")
 
         return PlainTextResponse("OK", status_code=200)
 
+async def ingest_youtube_entry(entry, source, now=None):
+    """
+    hub 回调与 RSS 轮询共用的入队路径：去重 -> 频道禁用/限流（推送C端或丢弃） -> 入队
+    返回 duplicate / dropped / forwarded / queued
+    """
+    now = now or datetime.now()
+    video_id = entry["video_id"]
+    channel_id = entry["channel_id"]
+    video_url = f"https://www.youtube.com/watch?v={video_id}"
+    cfg = get_config()
+
+    # 以 Atom 中的发布时间计算截止时间，错过时效窗口的任务不会占用下载槽位
+    published_ts = parse_timestamp(entry.get("published"))
+    deadline = published_ts + cfg.freshness_window_minutes * 60 if published_ts is not None else None
+    # 轮询发现时已超出时效窗口：不占用频道限流名额、不更新上次处理时间，直接推送C端；
+    # 记为 poller_stale，Hub 随后推送同一视频时以 Hub 为准
+    stale = source == SOURCE_POLLER and deadline is not None and deadline <= now.timestamp()
+    first_source = await mark_video_seen(
+        video_id, SOURCE_POLLER_STALE if stale else source,
+        replace=(SOURCE_POLLER_STALE,) if source == SOURCE_HUB else (),
+    )
+    if first_source is not None:
+        if source == SOURCE_HUB and first_source in (SOURCE_POLLER, SOURCE_POLLER_STALE):
+            HUB_AFTER_POLLER.inc()
+            if feed_poller is not None:
+                feed_poller.hub_delivered(video_id)
+        if not (source == SOURCE_HUB and first_source == SOURCE_POLLER_STALE):
+            logging.info(f"[-] 视频 {video_id} 已由 {first_source} 接收过，本次 {source} 通知忽略")
+            return "duplicate"
+        logging.info(f"[-] 视频 {video_id} 此前由轮询发现时已超出时效窗口，以本次 Hub 推送为准")
+    else:
+        VIDEOS_DISCOVERED.labels(source).inc()
+
+    if stale:
+        logging.info(f"[!] RSS 轮询发现的视频 {video_id} 已超出时效窗口，不占用频道 {channel_id} 限流名额，推送给C端（嘟嘟总裁）")
+        return forward_to_c(video_id, channel_id, cfg)
+
+    #白名单单个频道ID限流逻辑
+    is_disabled_channel = False
+    should_process = True
+
+    custom_time_gap_min = cfg.custom_channel_ids.get(channel_id)
+    if custom_time_gap_min == -1:   # 当设置为-1时代表该频道不处理
+        should_process = False
+        is_disabled_channel = True
+        logging.info(
+            f"[!] 频道 {channel_id} 已设置为永久禁用，本次新视频{video_id}不处理，推送给C端（嘟嘟总裁）"
+        )
+    else:
+        # 单频道自定义间隔（0 代表不限流）优先，否则使用全局 time_gap_minutes
+        if custom_time_gap_min is not None:
+            current_time_gap = timedelta(minutes=custom_time_gap_min)
+        else:
+            current_time_gap = cfg.time_gap
+        should_process = await acquire_channel_slot(channel_id, current_time_gap, now)
+
+    if not should_process:
+        TASKS_RATE_LIMITED.inc()
+        if not is_disabled_channel:
+            logging.info(
+                f"[!] 频道 {channel_id} {current_time_gap.total_seconds()//60:.0f}分钟内已推送过其它视频，本次新视频{video_id}不处理，推送给C端（嘟嘟总裁）"
+            )
+
+        return forward_to_c(video_id, channel_id, cfg)
+
+    if task_bus is None:
+        asyncio.create_task(async_save_last_processed_time())
+
+    logging.info(f"[✓] 收到YouTube订阅视频通知（{source}）: {video_id}")
+    task = {
+        "platform": "youtube",
+        "video_url": video_url,
+        "video_id": video_id,
+        "channel_id": channel_id,
+        "priority": cfg.channel_priority.get(channel_id, 0),
+        # stages 在入队时交给时效跟踪后移除；发布时间另存一份，供配额不足时按 Atom 发布时间判断时效
+        "published": entry.get("published"),
+        "stages": {
+            "published": entry.get("published"),
+            "hub_delivered": entry.get("updated") if source == SOURCE_HUB else None,
+            "callback_received": now.timestamp(),
+        },
+    }
+    if deadline is not None:
+        task["deadline"] = deadline
+    await submit_task(task)
+    return "queued"
+
+def forward_to_c(video_id, channel_id, cfg):
+    """不处理的视频推送给C端；频道设置了不推送时丢弃"""
+    if channel_id in cfg.no_push_c_ids:
+        TASKS_DROPPED.labels("no_push_c").inc()
+        logging.info(f"[!] 频道 {channel_id} 已设置不推送C端（嘟嘟总裁），本次新视频{video_id}已丢弃")
+        return "dropped"
+    TASKS_FORWARDED_TO_C.inc()
+    asyncio.create_task(forward_xml_to_c_async(video_id, channel_id))
+    return "forwarded"
+
+async def mark_video_seen(video_id, source, replace=()):
+    """
+    记录视频已被发现，返回最先发现它的来源（首次发现返回 None）；拆分部署时经任务总线在进程间共享
+    已有记录的来源在 replace 中时改记为本次来源
+    """
+    if task_bus is None:
+        return seen_videos.mark(video_id, source, replace)
+    return await run_blocking(INGEST, task_bus.mark_seen, video_id, source, replace=replace)
+
+async def submit_task(task):
+    """回调收到的任务：单进程模式直接进入下载调度队列，ingest 模式写入任务总线"""
+    if PROCESS_ROLE == ROLE_INGEST:
+        await run_blocking(INGEST, task_bus.publish, task)
+        return
+    enqueue_local(task)
+
+def enqueue_local(task):
+    stages = task.pop("stages", None) or {}
+    freshness_tracker.start(task.get("video_id"), task.get("channel_id"), **stages)
+    try:
+        video_id_queue.put_nowait(task)
+    except asyncio.QueueFull:
+        discard_task(task, "queue_full")
+
+async def task_bus_pump(batch_size=20, poll_interval=0.2, heartbeat_interval=60):
+    """
+    worker 进程：把 ingest 进程写入任务总线的任务领取到本地调度队列，并为处理中的任务续期
+    每次最多领取本地队列的空余容量，其余任务留在总线中，不在领取时就被挤出或推送C端
+    """
+    released = await run_blocking(DISK, task_bus.release_claims)
+    if released:
+        log_handler(f"[!] 任务总线中有 {released} 个上次未处理完的任务，重新投递")
+    log_handler("[✓] 正在从任务总线接收回调任务...")
+    last_heartbeat = time.monotonic()
+    while True:
+        try:
+            if time.monotonic() - last_heartbeat >= heartbeat_interval:
+                await run_blocking(DISK, task_bus.touch, list(bus_tasks_in_flight))
+                last_heartbeat = time.monotonic()
+            free = video_id_queue.maxsize - video_id_queue.qsize()
+            tasks = await run_blocking(DISK, task_bus.claim, min(batch_size, free)) if free > 0 else []
+            for task in tasks:
+                bus_tasks_in_flight.add(task["bus_id"])
+                enqueue_local(task)
+            if not tasks:
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"[!] 读取任务总线失败: {e}")
+            await asyncio.sleep(1)
+
+async def acquire_channel_slot(channel_id, time_gap, now):
+    """频道限流：距上次处理超过 time_gap 时记录本次时间并返回 True"""
+    if task_bus is not None:
+        # 多个 ingest 进程共享限流状态，在 SQLite 事务中原子检查并更新
+        last_time = last_processed_time_per_channel.get(channel_id)
+        return await run_blocking(
+            INGEST, task_bus.try_acquire_channel, channel_id, time_gap.total_seconds(),
+            now.timestamp(), last_time.timestamp() if last_time else None
+        )
+    # 单进程：检查与更新之间没有 await，在事件循环内是原子的
+    last_time = last_processed_time_per_channel.get(channel_id)
+    if last_time is None or now - last_time >= time_gap:
+        last_processed_time_per_channel[channel_id] = now
+        return True
+    return False
+
+def ack_bus_task(task):
+    """worker 进程：任务处理结束（上传结束、丢弃或失败）后从任务总线删除"""
+    bus_id = task.get("bus_id")
+    if bus_id is None or task_bus is None:
+        return
+    bus_tasks_in_flight.discard(bus_id)
+    asyncio.create_task(run_blocking(DISK, task_bus.ack, bus_id))
+
+def discard_task(task, reason):
+    """
+    处理未能进入下载的任务：reason 为 expired（错过时效窗口）/ evicted（被更紧急的任务挤出）/ queue_full
+    自动推送的视频转给C端（不推送C端的频道直接丢弃），手动任务直接丢弃
+    """
+    ack_bus_task(task)
+    video_id = task.get("video_id")
+    channel_id = task.get("channel_id")
+    freshness_tracker.finish(video_id, reason)
+    if task.get("manual") or task.get("platform") != "youtube":
+        TASKS_DROPPED.labels(reason).inc()
+        logging.warning(f"[!] 下载队列无法处理（{reason}，容量: {video_id_queue.maxsize}），丢弃本次推送: {task.get('video_url') or task.get('path')}")
+        return
+    if channel_id in get_config().no_push_c_ids:
+        TASKS_DROPPED.labels(reason).inc()
+        logging.info(f"[!] 视频 {video_id} 无法及时处理（{reason}），频道 {channel_id} 已设置不推送C端（嘟嘟总裁），已丢弃")
+        return
+    TASKS_FORWARDED_TO_C.inc()
+    logging.info(f"[!] 视频 {video_id} 无法及时处理（{reason}），推送给C端（嘟嘟总裁）")
+    asyncio.create_task(forward_xml_to_c_async(video_id, channel_id))
+
 async def async_handler_task():
+    """先拿到下载槽位再出队，保证每个空闲槽位都分给当前截止时间最早的任务"""
     log_handler("[✓] 正在监控YouTube视频推送... ")
     while True:
         try:
-            task = await get_video_task_async()
-            asyncio.create_task(handle_video(task))
+            await download_semaphore.acquire()
+            try:
+                task = await get_video_task_async()
+            except BaseException:
+                download_semaphore.release()
+                raise
+            asyncio.create_task(_handle_video_with_slot(task))
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             log_handler(f"[!] 异步处理任务异常: {e}")
             logging.exception("异步处理任务异常")
             await asyncio.sleep(5)
 
+async def _handle_video_with_slot(task):
+    try:
+        await _handle_video(task)
+    finally:
+        download_semaphore.release()
+        finish_local_task(task)
+
 async def handle_video(task):
-    async with download_semaphore:
-        platform = task.get("platform", "youtube")
-        video_url = task.get("video_url")
-        video_id = task.get("video_id") or extract_id_from_url(platform, video_url)
-        channel_id = task.get("channel_id", platform)
-        manual = task.get("manual", False)
-        path = task.get("path")
-
-        # ---- 优先处理本地混剪/人工任务（如 main.py 混剪上传、path 不为空） ----
-        if platform in ("douyin", "douyinmix") and manual and path:
-            try:
-                await get_douyin_queue().put({
-                    "video_id": video_id,
-                    "channel_id": channel_id,
-                    "path": path,
-                    "platform": "douyin"
-                })
-                log_handler(f"[✓] 混剪视频已直接入队抖音上传...")
-            except asyncio.QueueFull:
-                log_handler(f"[!] 抖音上传队列已满，丢弃本次任务: {path}")
+    try:
+        async with download_semaphore:
+            await _handle_video(task)
+    finally:
+        finish_local_task(task)
+
+def finish_local_task(task):
+    """已交给上传扇出的任务在所有平台上传结束后 ack（见 upload_fanout.on_release），其余在这里 ack"""
+    if not task.get("dispatched"):
+        ack_bus_task(task)
+
+async def _handle_video(task):
+    platform = task.get("platform", "youtube")
+    video_url = task.get("video_url")
+    video_id = task.get("video_id") or extract_id_from_url(platform, video_url)
+    channel_id = task.get("channel_id", platform)
+    manual = task.get("manual", False)
+    path = task.get("path")
+
+    # ---- 优先处理本地混剪/人工任务（如 main.py 混剪上传、path 不为空） ----
+    if platform in ("douyin", "douyinmix") and manual and path:
+        queued = await upload_fanout.dispatch({
+            "video_id": video_id,
+            "channel_id": channel_id,
+            "path": path,
+            "bus_id": task.get("bus_id"),
+        }, platforms=("douyin",))
+        task["dispatched"] = bool(queued)
+        if queued:
+            log_handler(f"[✓] 混剪视频已直接入队抖音上传...")
+        else:
+            TASKS_DROPPED.labels("upload_queue_full").inc()
+            freshness_tracker.finish(video_id, "dropped")
+            log_handler(f"[!] 抖音上传队列已满，丢弃本次任务: {path}")
+        return
+
+    # ---- 普通YouTube自动推送视频逻辑 ----
+    if platform == "youtube" and not manual:
+        youtube_monitor = get_youtube_monitor()
+        checked_videos = youtube_monitor.checked_videos
+        if video_id in checked_videos.values():
+            log_handler(f"[-] 视频 {video_id} 已处理过，跳过。")
+            freshness_tracker.finish(video_id, "duplicate")
             return
-
-        # ---- 普通YouTube自动推送视频逻辑 ----
-        if platform == "youtube" and not manual:
-            checked_videos = youtube_monitor.checked_videos
-            if video_id in checked_videos.values():
-                log_handler(f"[-] 视频 {video_id} 已处理过，跳过。")
+        try:
+            freshness_window = get_config().freshness_window_minutes
+            with API_LOOKUP_SECONDS.time():
+                # API 配额不足时自动改用 Atom 发布时间 + yt-dlp 元数据（见 utils/quota_governor.py）
+                info = await youtube_monitor.get_video_info(
+                    video_id, task.get("published"), freshness_window
+                )
+            if not info:
+                log_handler(f"[!] 获取视频信息失败: {video_id}")
+                freshness_tracker.finish(video_id, "lookup_failed")
                 return
-            try:
-                info = await youtube_monitor.fetch_video_details(video_id)
-                if not info:
-                    log_handler(f"[!] 获取视频信息失败: {video_id}")
-                    return
-                if not youtube_monitor.is_recent(info['published_at'], minutes=2):
-                    log_handler(
-                        f"[-] 跳过：该作品发布时间已超过2分钟，发布于（北京时间）："
-                        f"{(datetime.strptime(info['published_at'], '%Y-%m-%dT%H:%M:%SZ') + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')}"
-                    )
-                    return
-                if info['duration'] is None or info['duration'] > 120:
-                    log_handler(f"[-] 跳过：非 Shorts 视频（时长 {info['duration']} 秒）")
-                    return
-            except Exception as e:
-                log_handler(f"[!] 获取YouTube视频详情失败: {e}")
+            freshness_tracker.mark(video_id, "published", info['published_at'])
+            if not youtube_monitor.is_recent(info['published_at'], minutes=freshness_window):
+                log_handler(
+                    f"[-] 跳过：该作品发布时间已超过{freshness_window}分钟，发布于（北京时间）："
+                    f"{(datetime.strptime(info['published_at'], '%Y-%m-%dT%H:%M:%SZ') + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')}"
+                )
+                freshness_tracker.finish(video_id, "stale")
+                return
+            if info['duration'] is None or info['duration'] > 120:
+                log_handler(f"[-] 跳过：非 Shorts 视频（时长 {info['duration']} 秒）")
+                freshness_tracker.finish(video_id, "not_shorts")
                 return
-
-        # ---- 需要下载的视频（如普通YouTube/TikTok/Instagram推送） ----
-        try:
-            downloader = AsyncVideoDownloader()
-            downloaded_path = await downloader.download_video(channel_id, video_url, video_id)
         except Exception as e:
-            logging.info(f"[!] 调用 video_downloader.py 失败: {e}")
-            downloaded_path = None
+            log_handler(f"[!] 获取YouTube视频详情失败: {e}")
+            freshness_tracker.finish(video_id, "lookup_failed")
+            return
 
-        if downloaded_path:
-            # 抖音分发（不再判断频道是否在白名单里）
+    # ---- 需要下载的视频（如普通YouTube/TikTok/Instagram推送） ----
+    download_start = time.perf_counter()
+    freshness_tracker.mark(video_id, "download_start")
+    error_kind = None
+    try:
+        downloader = AsyncVideoDownloader()
+        downloaded_path = await downloader.download_video(channel_id, video_url, video_id)
+        error_kind = downloader.last_error_kind
+    except Exception as e:
+        logging.info(f"[!] 调用 video_downloader.py 失败: {e}")
+        downloaded_path = None
+    download_elapsed = time.perf_counter() - download_start
+    DOWNLOAD_SECONDS.labels("ok" if downloaded_path else "failed").observe(download_elapsed)
+    # 只有成功与临时性/限流失败反映下载负载；永久性错误（私享/删除）和熔断跳过不参与并发调整
+    if downloaded_path or error_kind in (None, TRANSIENT, THROTTLED):
+        download_controller.record(
+            bool(downloaded_path), download_elapsed,
+            os.path.getsize(downloaded_path) if downloaded_path and os.path.exists(downloaded_path) else 0
+        )
+    freshness_tracker.mark(video_id, "download_end")
+
+    if downloaded_path:
+        upload_task = {
+            "video_id": video_id,
+            "channel_id": channel_id,
+            "path": downloaded_path,
+            "bus_id": task.get("bus_id"),
+        }
+        # 同一文件同时分发到各上传平台（不再判断频道是否在白名单里）
+        queued = await upload_fanout.dispatch(upload_task)
+        task["dispatched"] = bool(queued)
+        if not queued:
+            TASKS_DROPPED.labels("upload_queue_full").inc()
+            freshness_tracker.finish(video_id, "dropped")
+            log_handler(f"[!] 各平台上传队列均无法接收，丢弃本次任务: {downloaded_path}")
             try:
-                await get_douyin_queue().put({
-                    "video_id": video_id,
-                    "channel_id": channel_id,
-                    "path": downloaded_path,
-                    "platform": "douyin"
-                })
-            except asyncio.QueueFull:
-                log_handler(f"[!] 抖音上传队列已满，丢弃本次任务: {downloaded_path}")
-                try:
-                    os.remove(downloaded_path)
-                    log_handler(f"[x] 抖音上传队列溢出，已删除未入队本地文件: {downloaded_path}")
-                except Exception as e:
-                    log_handler(f"[!] 删除本地文件失败: {e}")
-        else:
-            log_handler(f"[!] 视频下载失败: {video_url}")
+                os.remove(downloaded_path)
+                log_handler(f"[x] 上传队列溢出，已删除未入队本地文件: {downloaded_path}")
+            except Exception as e:
+                log_handler(f"[!] 删除本地文件失败: {e}")
+    else:
+        freshness_tracker.finish(video_id, "download_failed")
+        log_handler(f"[!] 视频下载失败: {video_url}")
 
 __all__ = [
     'app',